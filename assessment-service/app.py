@@ -3,11 +3,22 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-import google.generativeai as genai
+from typing import Any, List
+import asyncio
+import logging
 import os
+import sys
 import json
 import re
-import time
+
+# Shared LLM runtime lives in services/llm_runtime (copied next to app.py in the Docker image)
+_SERVICES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services")
+if os.path.isdir(_SERVICES_DIR) and _SERVICES_DIR not in sys.path:
+    sys.path.append(_SERVICES_DIR)
+
+from llm_runtime import LLMRuntime, MicroBatcher
+
+logger = logging.getLogger("assessment-service")
 
 app = FastAPI()
 
@@ -35,48 +46,16 @@ API_KEYS = [key for key in API_KEYS if key is not None]
 if not API_KEYS:
     raise ValueError("No Gemini API keys found! Set GEMINI_API_KEY_1 through GEMINI_API_KEY_5")
 
-# Rate limiting tracking
-key_usage = {i: {"requests": 0, "last_reset": time.time()} for i in range(len(API_KEYS))}
+# Token-bucket key scheduling (15 requests/minute per key)
 RATE_LIMIT = 15  # requests per minute
-RESET_INTERVAL = 60  # seconds
-
-def get_available_key():
-    """Get an available API key with rate limiting"""
-    current_time = time.time()
-    
-    # Reset counters if needed
-    for i, usage in key_usage.items():
-        if current_time - usage["last_reset"] >= RESET_INTERVAL:
-            usage["requests"] = 0
-            usage["last_reset"] = current_time
-    
-    # Find available key
-    for i, usage in key_usage.items():
-        if usage["requests"] < RATE_LIMIT:
-            usage["requests"] += 1
-            return API_KEYS[i]
-    
-    # If all keys are rate limited, wait and retry
-    print("All API keys rate limited, waiting...")
-    time.sleep(5)
-    return get_available_key()
-
-def get_gemini_model():
-    """Get Gemini model with current available key"""
-    key = get_available_key()
-    genai.configure(api_key=key)
-    return genai.GenerativeModel('gemini-1.5-flash')
+llm = LLMRuntime("assessment-service", API_KEYS, rate_per_minute=RATE_LIMIT)
 
-class GenerateRequest(BaseModel):
-    text: str
+# Concurrent /generate calls within BATCH_MAX_WAIT_MS are evaluated together in one prompt
+BATCH_MAX_SIZE = int(os.getenv("ASSESSMENT_BATCH_SIZE", 8))
+BATCH_MAX_WAIT_MS = float(os.getenv("ASSESSMENT_BATCH_WAIT_MS", 25))
+MODEL_NAME = 'gemini-1.5-flash'
 
-@app.post("/generate")
-async def generate_endpoint(req: GenerateRequest):
-    """
-    Evaluate candidate's answer transcript.
-    """
-    try:
-        sys_prompt = """
+EVALUATION_INSTRUCTIONS = """
 You are an expert technical interviewer and evaluator. 
 You are excellent at judging answers given by candidates in technical interviews 
 (SDE, Data Science, Analytics, PM, BA, etc). 
@@ -94,7 +73,9 @@ For each answer:
 2. Provide **strengths** (good points in the answer).
 3. Provide **weaknesses** (where the answer fell short).
 4. Provide **improvements** (how the candidate can do better).
+"""
 
+SINGLE_FORMAT = """
 Return your response in **strict JSON** format like this:
 
 {
@@ -113,24 +94,104 @@ Return your response in **strict JSON** format like this:
 Only return the JSON. Do not add explanations outside the JSON.
 """
 
-        prompt = f"{sys_prompt}\n\nAnswer to evaluate:\n{req.text}"
-        
-        model = get_gemini_model()
-        response = model.generate_content(prompt)
-        output = response.text.strip()
-        
-        # Try to parse JSON from response
-        try:
-            # Look for JSON in the response
-            json_match = re.search(r'\{.*\}', output, re.DOTALL)
-            if json_match:
-                eval_json = json.loads(json_match.group())
-                return JSONResponse(content=eval_json)
-            else:
-                # Fallback: return raw response
-                return PlainTextResponse(output)
-        except:
-            return PlainTextResponse(output)
+BATCH_FORMAT = """
+You will receive several independent answers, each marked with an id. Evaluate every
+answer on its own merits; never compare answers with each other.
+
+Return your response in **strict JSON** format like this, with exactly one entry per id:
+
+{
+  "results": [
+    {
+      "id": 1,
+      "scores": {
+        "relevance": 0-10,
+        "correctness": 0-10,
+        "depth": 0-10,
+        "clarity": 0-10,
+        "specificity": 0-10
+      },
+      "strengths": ["point1", "point2"],
+      "weaknesses": ["point1", "point2"],
+      "improvements": ["point1", "point2"]
+    }
+  ]
+}
+
+Only return the JSON. Do not add explanations outside the JSON.
+"""
+
+batch_fallbacks = {"items": 0}
+
+async def evaluate_one(text: str):
+    """Single-answer prompt; returns the evaluation dict, or the raw model output if it isn't JSON"""
+    prompt = f"{EVALUATION_INSTRUCTIONS}{SINGLE_FORMAT}\n\nAnswer to evaluate:\n{text}"
+    response = await llm.agenerate(MODEL_NAME, prompt)
+    output = response.text.strip()
+    try:
+        json_match = re.search(r'\{.*\}', output, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group())
+    except ValueError:
+        pass
+    return output
+
+async def evaluate_batch(texts: List[str]) -> List[Any]:
+    """
+    Evaluate several answers with one multi-item prompt. Answers the model skipped or
+    mangled are re-evaluated one by one, so every caller still gets its own result.
+    """
+    unique = list(dict.fromkeys(texts))
+    if len(unique) == 1:
+        result = await evaluate_one(unique[0])
+        return [result] * len(texts)
+
+    answers = "\n\n".join(f"Answer id={i}:\n<<<\n{text}\n>>>" for i, text in enumerate(unique, 1))
+    prompt = f"{EVALUATION_INSTRUCTIONS}{BATCH_FORMAT}\n\nAnswers to evaluate:\n\n{answers}"
+    by_id = {}
+    try:
+        response = await llm.agenerate(MODEL_NAME, prompt)
+        json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
+        for item in (json.loads(json_match.group()).get("results", []) if json_match else []):
+            if isinstance(item, dict) and isinstance(item.get("scores"), dict):
+                # Models often quote the id ("1"); anything that isn't a number matches no answer
+                try:
+                    by_id[int(item.pop("id", None))] = item
+                except (TypeError, ValueError):
+                    continue
+    except Exception as e:
+        logger.warning("Batch of %d evaluations failed (%s); falling back to single calls", len(unique), e)
+
+    results = {text: by_id[i] for i, text in enumerate(unique, 1) if i in by_id}
+    missing = [text for text in unique if text not in results]
+    if missing:
+        batch_fallbacks["items"] += len(missing)
+        singles = await asyncio.gather(*(evaluate_one(text) for text in missing), return_exceptions=True)
+        results.update(zip(missing, singles))
+    return [results[text] for text in texts]
+
+batcher = MicroBatcher(evaluate_batch, max_size=BATCH_MAX_SIZE, max_wait=BATCH_MAX_WAIT_MS / 1000)
+
+@app.get("/llm-stats")
+def llm_stats():
+    """Key scheduler state: queue depth, queue wait percentiles, per-key budget; plus micro-batching"""
+    return {**llm.stats(), "batching": {**batcher.stats(), "fallback_items": batch_fallbacks["items"]}}
+
+class GenerateRequest(BaseModel):
+    text: str
+
+@app.post("/generate")
+async def generate_endpoint(req: GenerateRequest):
+    """
+    Evaluate candidate's answer transcript.
+    Concurrent requests are micro-batched into one Gemini call.
+    """
+    try:
+        result = await batcher.submit(req.text)
+        if isinstance(result, dict):
+            return JSONResponse(content=result)
+        # Fallback: return raw response
+        return PlainTextResponse(result)
 
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
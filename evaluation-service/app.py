@@ -1,10 +1,16 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
 from fastapi.middleware.cors import CORSMiddleware
-import httpx, uuid, os
+import httpx, uuid, os, sys
 from pydantic import BaseModel
-import google.generativeai as genai
-import time
-import random
+import json
+import re
+
+# Shared LLM runtime lives in services/llm_runtime (copied next to app.py in the Docker image)
+_SERVICES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services")
+if os.path.isdir(_SERVICES_DIR) and _SERVICES_DIR not in sys.path:
+    sys.path.append(_SERVICES_DIR)
+
+from llm_runtime import LLMRuntime
 
 app = FastAPI()
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
@@ -22,37 +28,12 @@ API_KEYS = [key for key in API_KEYS if key is not None]
 if not API_KEYS:
     raise ValueError("No Gemini API keys found! Set GEMINI_API_KEY_1 through GEMINI_API_KEY_3 in your environment variables.")
 
-# Rate limiting tracking
-key_usage = {i: {"requests": 0, "last_reset": time.time()} for i in range(len(API_KEYS))}
+# Token-bucket key scheduling (15 requests/minute per key)
 RATE_LIMIT = 15  # requests per minute
-RESET_INTERVAL = 60  # seconds
-
-def get_available_key():
-    """Get an available API key with rate limiting"""
-    current_time = time.time()
-    
-    # Reset counters if needed
-    for i, usage in key_usage.items():
-        if current_time - usage["last_reset"] >= RESET_INTERVAL:
-            usage["requests"] = 0
-            usage["last_reset"] = current_time
-    
-    # Find available key
-    for i, usage in key_usage.items():
-        if usage["requests"] < RATE_LIMIT:
-            usage["requests"] += 1
-            return API_KEYS[i]
-    
-    # If all keys are rate limited, wait and retry
-    print("All API keys rate limited, waiting...")
-    time.sleep(5)
-    return get_available_key()
+llm = LLMRuntime("evaluation-service", API_KEYS, rate_per_minute=RATE_LIMIT)
 
-def get_gemini_model():
-    """Get Gemini model with current available key"""
-    key = get_available_key()
-    genai.configure(api_key=key)
-    return genai.GenerativeModel('gemini-1.5-flash')
+# Per-session fan-out for /evaluate; unset means as many as the keys can take at once
+EVALUATION_CONCURRENCY = int(os.getenv("EVALUATION_CONCURRENCY", 0)) or None
 
 # In-memory session store
 sessions = {}
@@ -67,6 +48,11 @@ class SubmitAnswerRequest(BaseModel):
     question_type: str = "general"
     answer_text: str  # Transcribed answer from frontend
 
+@app.get("/llm-stats")
+def llm_stats():
+    """Key scheduler state: queue depth, queue wait percentiles, per-key budget"""
+    return llm.stats()
+
 @app.post("/start-session")
 def start_session(req: StartSessionRequest):
     sid = req.session_id or str(uuid.uuid4())
@@ -86,6 +72,33 @@ async def submit(session_id: str, meta: SubmitAnswerRequest):
     })
     return {"status": "answer submitted"}
 
+async def evaluate_answer(role: str, qa: dict) -> dict:
+    """Score one answer; raises if the model call fails or its output has no usable score"""
+    prompt = f"""You are an expert {role} interviewer.
+Question: {qa['question']}
+Answer: {qa['answer']}
+
+Rate this answer 1–10, then explain briefly.
+Return JSON: {{ "score":X, "feedback":"..." }}"""
+    
+    response = await llm.agenerate('gemini-1.5-flash', prompt)
+    eval_text = response.text.strip()
+    
+    # Look for JSON in the response
+    json_match = re.search(r'\{.*\}', eval_text, re.DOTALL)
+    if json_match:
+        try:
+            eval_json = json.loads(json_match.group())
+            if isinstance(eval_json.get("score"), (int, float)):
+                return eval_json
+        except ValueError:
+            pass
+    # Fallback: the score alone is enough, keep the raw text as feedback
+    score_match = re.search(r'"score"\s*:\s*(\d+(?:\.\d+)?)', eval_text)
+    if score_match:
+        return {"score": float(score_match.group(1)), "feedback": eval_text}
+    raise ValueError("Could not parse evaluation")
+
 @app.post("/evaluate/{session_id}")
 async def evaluate(session_id: str):
     if session_id not in sessions:
@@ -95,44 +108,24 @@ async def evaluate(session_id: str):
     if not answers:
         raise HTTPException(400, "No answers submitted")
     
+    # All answers are evaluated concurrently (capped by EVALUATION_CONCURRENCY, default: key burst capacity)
+    evaluations = await llm.amap(lambda qa: evaluate_answer(data["role"], qa), answers, limit=EVALUATION_CONCURRENCY)
+    
     results = []
-    for qa in answers:
-        prompt = f"""You are an expert {data['role']} interviewer.
-Question: {qa['question']}
-Answer: {qa['answer']}
-
-Rate this answer 1–10, then explain briefly.
-Return JSON: {{ "score":X, "feedback":"..." }}"""
-        
-        try:
-            model = get_gemini_model()
-            response = model.generate_content(prompt)
-            eval_text = response.text.strip()
-            
-            # Try to parse JSON from response
-            import json
-            import re
-            try:
-                # Look for JSON in the response
-                json_match = re.search(r'\{.*\}', eval_text, re.DOTALL)
-                if json_match:
-                    eval_json = json.loads(json_match.group())
-                else:
-                    # Fallback: extract score and create feedback
-                    score_match = re.search(r'"score":\s*(\d+)', eval_text)
-                    score = int(score_match.group(1)) if score_match else 5
-                    eval_json = {"score": score, "feedback": eval_text}
-            except:
-                eval_json = {"score": 5, "feedback": "Could not parse evaluation"}
-                
-        except Exception as e:
-            eval_json = {"score": 5, "feedback": f"Evaluation error: {str(e)}"}
-            
-        results.append({"question": qa["question"], "evaluation": eval_json})
+    for qa, evaluation in zip(answers, evaluations):
+        if isinstance(evaluation, BaseException):
+            results.append({"question": qa["question"], "status": "failed", "evaluation": None,
+                            "error": str(evaluation) or type(evaluation).__name__})
+        else:
+            results.append({"question": qa["question"], "status": "ok", "evaluation": evaluation})
     
-    avg = sum(e.get("score", 0) for e in results) / len(results)
+    # Failed items are reported, not counted as a score
+    scores = [r["evaluation"]["score"] for r in results if r["status"] == "ok"]
+    avg = round(sum(scores) / len(scores), 1) if scores else None
     return {"session_id": session_id,
             "role": data["role"],
             "level": data["level"],
             "individual": results,
-            "overall_score": round(avg, 1)}
+            "evaluated": len(scores),
+            "failed": len(results) - len(scores),
+            "overall_score": avg}
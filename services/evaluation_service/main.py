@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from google import genai
+from llm_runtime import LLMRuntime
 from dotenv import load_dotenv
 import os
 import copy
@@ -15,14 +15,11 @@ if os.path.exists(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env
 # Get API key from environment
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY_1', '')
 
-# Initialize Gemini client
+# Initialize Gemini runtime
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY_1 not found in environment variables")
 
-try:
-    client = genai.Client(api_key=GEMINI_API_KEY)
-except Exception as e:
-    raise ValueError(f"Failed to initialize Gemini client: {str(e)}")
+llm = LLMRuntime("evaluation", [GEMINI_API_KEY])
 
 # ==================== Pydantic Models for Request ====================
 
@@ -181,10 +178,12 @@ async def test_gemini():
     """Test Gemini client connection"""
     try:
         # Simple test call
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-exp",
-            contents="Say 'Hello, Gemini is working!'",
-            config={"temperature": 0.1}
+        response = await llm.agenerate(
+            "gemini-2.0-flash-exp",
+            "Say 'Hello, Gemini is working!'",
+            config={"temperature": 0.1},
+            coalesce=False,
+            use_cache=False,
         )
         return {
             "status": "success",
@@ -320,9 +319,9 @@ Be thorough, specific, and constructive in your evaluation. Focus on both streng
         print("pachu",EvaluationResponse.model_json_schema())
         # Call Gemini with structured output
         try:
-            response = client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=prompt,
+            response = await llm.agenerate(
+                "gemini-2.0-flash-exp",
+                prompt,
                 config={
                     "response_mime_type": "application/json",
                     "response_schema": get_dereferenced_schema(EvaluationResponse),
@@ -0,0 +1,173 @@
+"""
+Shared LLM runtime (and URL fetcher) used by every router in services/ and by the standalone services.
+"""
+from .batcher import MicroBatcher
+from .budget import DEFAULT_BUDGETS, BudgetReport, PromptBudget, compact, estimate_tokens, pack, split_sections
+from .cache import CachedResponse, LRUCache, ResponseCache, SQLiteCache, cache_from_env, shared_cache
+from .cascade import DEFAULT_ROUTES, RouteStats, ValidationError, json_object, require_keys, route_models
+from .clients import ClientPool, GeminiModel, get_client, get_model, key_id, load_api_keys, pool
+from .contacts import CONTACT_FIELDS, Contacts, extract_contacts, with_contacts
+from .docstore import Document, DocumentStore, HostPolicy, URLEntry, docstore_from_env, shared_docstore
+from .fetch import (
+    NOT_MODIFIED,
+    Fetcher,
+    FetchError,
+    FetchResult,
+    ResponseTooLarge,
+    Spool,
+    UnsupportedDocument,
+    fetcher_from_env,
+    shared_fetcher,
+    sniff,
+)
+from .htmltext import HTMLTextExtractor, html_buffer_text, html_text
+from .jsonstream import JSONArrayStream
+from .keys import content_key, normalize_prompt, request_key
+from .normalize import NormalizationReport, normalize, normalize_text
+from .pdf import PDFError, PDFExtractor, PDFResult, PDFTimeout, pdf_extractor_from_env, shared_pdf_extractor
+from .providers import (
+    Cassette,
+    GeminiProvider,
+    LatencyModel,
+    Provider,
+    RecordingProvider,
+    StubProvider,
+    StubRateLimitError,
+    provider_from_env,
+    shared_provider,
+)
+from .quota import HTTPQuota, MemoryQuota, QuotaBackend, SQLiteQuota, quota_from_env, shared_quota
+from .resilience import CircuitBreaker, CircuitOpen, DeadlineExceeded, Resilience, is_retryable, resilience_from_env
+from .runtime import LLMRuntime, runtime_stats
+from .scheduler import KeyLease, KeyScheduler, NoKeyAvailable, TokenBucket, is_rate_limit_error
+from .scoring import (
+    SKILL_TAXONOMY,
+    MatchScore,
+    MatchScorer,
+    Profile,
+    find_skills,
+    normalize_skill,
+    scorer_from_env,
+    shared_scorer,
+)
+from .segment import PARSE_SECTIONS, SECTION_TYPES, Section, focus, segment, segment_stats, segments_for, technical_highlights
+from .singleflight import SingleFlight
+from .skillindex import Bitmap, QueryError, SearchResult, SkillIndex, parse_query, shared_skill_index, skill_index_from_env
+
+__all__ = [
+    "Bitmap",
+    "BudgetReport",
+    "CachedResponse",
+    "Cassette",
+    "CircuitBreaker",
+    "CircuitOpen",
+    "CONTACT_FIELDS",
+    "ClientPool",
+    "Contacts",
+    "DEFAULT_BUDGETS",
+    "DEFAULT_ROUTES",
+    "DeadlineExceeded",
+    "Document",
+    "DocumentStore",
+    "FetchError",
+    "FetchResult",
+    "Fetcher",
+    "GeminiModel",
+    "GeminiProvider",
+    "HTMLTextExtractor",
+    "HostPolicy",
+    "HTTPQuota",
+    "JSONArrayStream",
+    "KeyLease",
+    "KeyScheduler",
+    "LLMRuntime",
+    "LRUCache",
+    "LatencyModel",
+    "MatchScore",
+    "MatchScorer",
+    "MemoryQuota",
+    "MicroBatcher",
+    "NOT_MODIFIED",
+    "NoKeyAvailable",
+    "NormalizationReport",
+    "PARSE_SECTIONS",
+    "PDFError",
+    "PDFExtractor",
+    "PDFResult",
+    "PDFTimeout",
+    "Profile",
+    "PromptBudget",
+    "Provider",
+    "QuotaBackend",
+    "QueryError",
+    "RecordingProvider",
+    "Resilience",
+    "ResponseCache",
+    "ResponseTooLarge",
+    "RouteStats",
+    "SECTION_TYPES",
+    "SKILL_TAXONOMY",
+    "SQLiteCache",
+    "SQLiteQuota",
+    "SearchResult",
+    "Section",
+    "SingleFlight",
+    "SkillIndex",
+    "Spool",
+    "StubProvider",
+    "StubRateLimitError",
+    "TokenBucket",
+    "URLEntry",
+    "UnsupportedDocument",
+    "ValidationError",
+    "cache_from_env",
+    "compact",
+    "content_key",
+    "docstore_from_env",
+    "estimate_tokens",
+    "extract_contacts",
+    "focus",
+    "fetcher_from_env",
+    "find_skills",
+    "get_client",
+    "get_model",
+    "html_buffer_text",
+    "html_text",
+    "is_rate_limit_error",
+    "is_retryable",
+    "json_object",
+    "key_id",
+    "load_api_keys",
+    "normalize",
+    "normalize_prompt",
+    "normalize_skill",
+    "normalize_text",
+    "pack",
+    "parse_query",
+    "pdf_extractor_from_env",
+    "pool",
+    "provider_from_env",
+    "quota_from_env",
+    "request_key",
+    "require_keys",
+    "resilience_from_env",
+    "route_models",
+    "runtime_stats",
+    "scorer_from_env",
+    "segment",
+    "segment_stats",
+    "segments_for",
+    "shared_cache",
+    "shared_docstore",
+    "shared_fetcher",
+    "shared_pdf_extractor",
+    "shared_provider",
+    "shared_quota",
+    "shared_scorer",
+    "shared_skill_index",
+    "skill_index_from_env",
+    "sniff",
+    "split_sections",
+    "technical_highlights",
+    "with_contacts",
+]
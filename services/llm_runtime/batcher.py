@@ -0,0 +1,92 @@
+import asyncio
+import collections
+import time
+from typing import Any, Awaitable, Callable, List, Optional
+
+
+class MicroBatcher:
+    """
+    Collects concurrent submit() calls for up to `max_wait` seconds (or until
+    `max_size` items are waiting) and hands them to `run_batch` as one list.
+
+    run_batch returns one result per item, in order; an Exception in a slot is
+    raised to that item's caller only. If run_batch itself raises, every
+    caller in the batch gets the error. Batches run concurrently with each
+    other, so a slow batch never holds up the next one.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_size: int = 8,
+        max_wait: float = 0.025,
+    ):
+        self.run_batch = run_batch
+        self.max_size = max(1, max_size)
+        self.max_wait = max_wait
+        self._pending: List[tuple] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.batches = 0
+        self.items = 0
+        self.sizes = collections.Counter()
+        self.batch_seconds = collections.deque(maxlen=256)
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result"""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((item, fut))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending[:self.max_size], self._pending[self.max_size:]
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        # Callers that gave up (cancelled) while waiting don't need a slot in the prompt
+        batch = [(item, fut) for item, fut in batch if not fut.done()]
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[tuple]):
+        self.batches += 1
+        self.items += len(batch)
+        self.sizes[len(batch)] += 1
+        started = time.monotonic()
+        try:
+            results = await self.run_batch([item for item, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        if len(results) != len(batch):
+            error = RuntimeError(f"run_batch returned {len(results)} results for {len(batch)} items")
+            results = [error] * len(batch)
+        self.batch_seconds.append(time.monotonic() - started)
+        for (_, fut), result in zip(batch, results):
+            if fut.done():
+                continue
+            if isinstance(result, BaseException):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
+
+    def stats(self) -> dict:
+        seconds = list(self.batch_seconds)
+        return {
+            "max_size": self.max_size,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "batch_sizes": dict(sorted(self.sizes.items())),
+            "mean_batch_seconds": round(sum(seconds) / len(seconds), 4) if seconds else 0.0,
+        }
@@ -0,0 +1,280 @@
+"""
+Prompt budgeting for resume / JD inputs.
+
+fit() compacts each input (normalize.py's page-edge cleanup, whitespace, "Page N"
+counters, boilerplate such as EEO statements), splits it into sections, ranks the sections
+by type and by overlap with the other inputs (resume vs JD), and packs the best
+ones into the endpoint's token budget in their original order. Nothing is cut
+mid-word: whole sections, then whole lines, then whole words are dropped.
+
+Budgets are input tokens per endpoint; override with LLM_TOKEN_BUDGETS, a JSON
+object of endpoint -> tokens.
+"""
+import collections
+import json
+import logging
+import math
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from .normalize import normalize_text
+
+logger = logging.getLogger("llm_runtime")
+
+DEFAULT_BUDGETS: Dict[str, int] = {
+    "test-generation/free": 400,
+    "test-generation/freemium": 1500,
+    "test-generation/premium": 3000,
+    "user-test/free": 400,
+    "user-test/freemium": 1500,
+    "user-test/premium": 3000,
+    "resume-jd-matcher/parse-resume": 4000,
+    "resume-jd-matcher/parse-jd": 3000,
+    "resume-jd-matcher/explain": 2500,
+    "unified/parse-resume": 4000,
+    "unified/parse-jd": 3000,
+}
+
+_TOKEN_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+_TERM_RE = re.compile(r"[a-z][a-z0-9+#./-]*[a-z0-9+#]|[a-z]")
+
+# Relative value of a section by heading (resumes and JDs); unknown headings get 1.0
+SECTION_PRIORS = {
+    "header": 2.5,
+    "skills": 3.0, "technical skills": 3.0, "core competencies": 2.5,
+    "experience": 3.0, "work experience": 3.0, "professional experience": 3.0, "employment": 3.0,
+    "internships": 2.5, "projects": 2.5, "personal projects": 2.0,
+    "summary": 1.5, "profile": 1.5, "objective": 1.0, "about me": 1.0,
+    "education": 1.5, "certifications": 1.5, "achievements": 1.0, "awards": 1.0, "publications": 0.8,
+    "languages": 0.5, "activities": 0.5, "extracurricular activities": 0.5, "volunteering": 0.5,
+    "interests": 0.2, "hobbies": 0.2, "references": 0.1, "declaration": 0.05,
+    "requirements": 3.0, "qualifications": 3.0, "what we're looking for": 3.0, "must have": 3.0,
+    "responsibilities": 2.5, "what you'll do": 2.5, "role": 2.0, "nice to have": 2.0, "preferred qualifications": 2.0,
+    "about us": 0.4, "about the company": 0.4, "who we are": 0.4, "benefits": 0.2, "perks": 0.2,
+    "what we offer": 0.2, "compensation": 0.3, "how to apply": 0.1,
+}
+
+_BOILERPLATE = [
+    re.compile(p, re.I) for p in (
+        r"^page \d+( of \d+)?$",
+        r"references (are )?available (up)?on request",
+        r"^i hereby declare",
+        r"equal (employment )?opportunity employer",
+        r"without regard to (race|color|religion)",
+        r"^(apply now|click here to apply|share this job)\.?$",
+        r"^curriculum vitae$|^resume$",
+    )
+]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough local token count: one per word or number (long words count extra), one per symbol"""
+    count = 0
+    for match in _TOKEN_RE.finditer(text or ""):
+        piece = match.group()
+        if piece[0].isalpha():
+            count += 1 + (len(piece) - 1) // 6
+        elif piece[0].isdigit():
+            count += 1 + (len(piece) - 1) // 3
+        else:
+            count += 1
+    return count
+
+
+def terms(text: str) -> Set[str]:
+    return set(_TERM_RE.findall(text.lower()))
+
+
+def compact(text: str) -> str:
+    """
+    Drop page furniture and boilerplate; collapse whitespace. Repeated headers/footers are
+    left to normalize(), which only removes exact repeats at page edges: a line that recurs
+    in the body (a job title, a bullet under several roles) is content.
+    """
+    lines = [re.sub(r"[ \t\u00a0]+", " ", line).strip(" \t•▪●◦-*|") for line in normalize_text(text).splitlines()]
+    out: List[str] = []
+    for line in lines:
+        if not line:
+            if out and out[-1]:
+                out.append("")
+            continue
+        if any(p.search(line) for p in _BOILERPLATE):
+            continue
+        out.append(line)
+    return "\n".join(out).strip()
+
+
+def _heading(line: str, known_only: bool) -> Optional[str]:
+    """Normalized section name if the line looks like a heading"""
+    name = line.strip().rstrip(":").strip().lower()
+    if not name or len(name) > 40:
+        return None
+    if name in SECTION_PRIORS:
+        return name
+    # Short all-caps lines are headings in most resume templates (but at the top it's usually the name)
+    if not known_only and line.isupper() and len(name.split()) <= 4 and not re.search(r"[\d@]", name):
+        return name
+    return None
+
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """[(section name, body)] in document order; text before the first heading is the header section"""
+    sections: List[Tuple[str, List[str]]] = [("header", [])]
+    for line in text.splitlines():
+        name = _heading(line, known_only=len(sections) == 1 and len(sections[0][1]) < 3)
+        if name is not None:
+            sections.append((name, [line]))
+        else:
+            sections[-1][1].append(line)
+    out = []
+    for i, (name, body) in enumerate(sections):
+        content = [line for line in body[0 if i == 0 else 1:] if line.strip()]
+        if content:  # a heading with nothing under it is not worth a token
+            out.append((name, "\n".join(body).strip()))
+    return out
+
+
+def _truncate(text: str, budget: int) -> str:
+    """Longest prefix of whole lines (then whole words) within budget"""
+    kept: List[str] = []
+    used = 0
+    for line in text.splitlines():
+        cost = estimate_tokens(line) + 1
+        if used + cost <= budget:
+            kept.append(line)
+            used += cost
+            continue
+        words = []
+        for word in line.split():
+            cost = estimate_tokens(word)
+            if used + cost > budget:
+                break
+            words.append(word)
+            used += cost
+        if words:
+            kept.append(" ".join(words) + " ...")
+        break
+    return "\n".join(kept)
+
+
+def pack(text: str, budget: int, query: Optional[Set[str]] = None) -> Tuple[str, List[str]]:
+    """Best sections of `text` within `budget` tokens, in original order; also returns the dropped section names"""
+    sections = split_sections(text)
+    query = query or set()
+    scored = []
+    for i, (name, body) in enumerate(sections):
+        body_terms = terms(body)
+        overlap = len(body_terms & query) / math.sqrt(len(body_terms) + 1) if query else 0.0
+        scored.append((SECTION_PRIORS.get(name, 1.0) + overlap, i))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+
+    chosen: Dict[int, str] = {}
+    dropped: List[str] = []
+    remaining = budget
+    for _, i in scored:
+        name, body = sections[i]
+        cost = estimate_tokens(body) + 1
+        if cost <= remaining:
+            chosen[i] = body
+            remaining -= cost
+        elif remaining >= 40:
+            # Not enough room for the whole section; keep its first lines rather than skipping it
+            chosen[i] = _truncate(body, remaining - 1)
+            remaining = 0
+        else:
+            dropped.append(name)
+    return "\n\n".join(chosen[i] for i in sorted(chosen)), dropped
+
+
+class BudgetReport:
+    """What fit() did to one request's inputs"""
+
+    __slots__ = ("endpoint", "budget", "tokens_before", "tokens_after", "dropped")
+
+    def __init__(self, endpoint: str, budget: int, tokens_before: int, tokens_after: int, dropped: Dict[str, List[str]]):
+        self.endpoint = endpoint
+        self.budget = budget
+        self.tokens_before = tokens_before
+        self.tokens_after = tokens_after
+        self.dropped = dropped
+
+    @property
+    def saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def as_dict(self) -> dict:
+        return {
+            "endpoint": self.endpoint,
+            "budget": self.budget,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": self.saved,
+            "dropped_sections": self.dropped,
+        }
+
+
+class PromptBudget:
+    """Per-endpoint input budgets plus running totals of tokens saved"""
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None):
+        self.budgets = dict(DEFAULT_BUDGETS)
+        overrides = os.getenv("LLM_TOKEN_BUDGETS")
+        if overrides:
+            self.budgets.update({k: int(v) for k, v in json.loads(overrides).items()})
+        if budgets:
+            self.budgets.update(budgets)
+        self._lock = threading.Lock()
+        self._totals: Dict[str, collections.Counter] = {}
+
+    def fit(self, endpoint: str, **inputs: Optional[str]) -> Tuple[Dict[str, str], BudgetReport]:
+        """
+        Compact and pack named inputs (e.g. resume=..., jd=...) into the endpoint's budget.
+
+        The budget is shared: small inputs keep everything and leave their unused
+        share to the larger ones. Each input is ranked against the others' terms.
+        """
+        budget = self.budgets.get(endpoint)
+        present = {name: text for name, text in inputs.items() if text}
+        before = sum(estimate_tokens(text) for text in present.values())
+        compacted = {name: compact(text) for name, text in present.items()}
+        sizes = {name: estimate_tokens(text) for name, text in compacted.items()}
+
+        packed: Dict[str, str] = {name: "" for name in inputs}
+        dropped: Dict[str, List[str]] = {}
+        remaining = budget
+        for n, name in enumerate(sorted(compacted, key=sizes.get)):
+            text = compacted[name]
+            share = None if remaining is None else remaining // (len(compacted) - n)
+            if share is None or sizes[name] <= share:
+                packed[name] = text
+            else:
+                query = set().union(*(terms(other) for key, other in compacted.items() if key != name))
+                packed[name], lost = pack(text, share, query)
+                if lost:
+                    dropped[name] = lost
+            if remaining is not None:
+                remaining -= min(share, estimate_tokens(packed[name]))
+
+        report = BudgetReport(endpoint, budget, before, sum(estimate_tokens(t) for t in packed.values()), dropped)
+        with self._lock:
+            totals = self._totals.setdefault(endpoint, collections.Counter())
+            totals["requests"] += 1
+            totals["tokens_before"] += report.tokens_before
+            totals["tokens_after"] += report.tokens_after
+        logger.info("prompt budget %s: %d -> %d tokens (saved %d)", endpoint, report.tokens_before, report.tokens_after, report.saved)
+        return packed, report
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                endpoint: {
+                    "budget": self.budgets.get(endpoint),
+                    "requests": t["requests"],
+                    "tokens_before": t["tokens_before"],
+                    "tokens_after": t["tokens_after"],
+                    "tokens_saved": t["tokens_before"] - t["tokens_after"],
+                }
+                for endpoint, t in self._totals.items()
+            }
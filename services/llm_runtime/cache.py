@@ -0,0 +1,254 @@
+"""
+Tiered cache for LLM responses, keyed by request_key() (SHA-256 of model + prompt + config).
+
+    L1  LRUCache     in-process, TTL + byte budget
+    L2  SQLiteCache  on disk, shared by every worker/process pointing at the same file
+
+Configured from the environment:
+    LLM_CACHE=off                 disable entirely
+    LLM_CACHE_PATH                L2 file (default: <tmp>/llm_cache.sqlite; "" disables L2)
+    LLM_CACHE_TTL                 seconds (default 86400)
+    LLM_CACHE_L1_MAX_BYTES        default 32 MB
+    LLM_CACHE_L2_MAX_BYTES        default 512 MB
+"""
+import collections
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from typing import Optional
+
+
+def _size_of(value) -> int:
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return len(json.dumps(value, default=str))
+
+
+class LRUCache:
+    """Thread-safe in-process LRU with a per-entry TTL and a total byte budget"""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl: Optional[float] = None, max_items: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_items = max_items
+        self._data = collections.OrderedDict()  # key -> (value, size, expires)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, size, expires = entry
+            if expires is not None and expires < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size: Optional[int] = None):
+        size = _size_of(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, expires)
+            self._bytes += size
+            while self._bytes > self.max_bytes or (self.max_items is not None and len(self._data) > self.max_items):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and (entry[2] is None or entry[2] >= time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def items(self, prefix: Optional[str] = None) -> list:
+        """Unexpired (key, value) pairs, least recently used first; not counted as hits"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value) for key, (value, _, expires) in self._data.items()
+                if (expires is None or expires >= now) and (prefix is None or str(key).startswith(prefix))
+            ]
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteCache:
+    """Disk-backed text cache; WAL mode lets many processes read and write the same file"""
+
+    # Re-check the total size every this many writes rather than on each one
+    EVICT_CHECK_EVERY = 64
+
+    def __init__(self, path: str, ttl: Optional[float] = 86400, max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.ttl is not None and row[1] < now - self.ttl):
+            self.misses += 1
+            return None
+        conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def set(self, key: str, text: str):
+        blob = zlib.compress(text.encode("utf-8"))
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (key, blob, len(blob), now, now),
+        )
+        self._writes += 1
+        if self._writes % self.EVICT_CHECK_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least-recently-used ones until under 90% of max_bytes"""
+        conn = self._conn()
+        if self.ttl is not None:
+            self.evictions += conn.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            if total <= target:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {"path": self.path, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class CachedResponse:
+    """Stand-in for an SDK response served from cache (exposes .text and .parsed)"""
+
+    __slots__ = ("text", "cache_tier")
+
+    def __init__(self, text: str, cache_tier: str):
+        self.text = text
+        self.cache_tier = cache_tier
+
+    @property
+    def parsed(self):
+        try:
+            return json.loads(self.text)
+        except ValueError:
+            return None
+
+
+class ResponseCache:
+    """L1 in front of an optional L2; L2 hits are promoted into L1"""
+
+    def __init__(self, l1: LRUCache, l2: Optional[SQLiteCache] = None):
+        self.l1 = l1
+        self.l2 = l2
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        text = self.l1.get(key)
+        if text is not None:
+            return CachedResponse(text, "l1")
+        if self.l2 is not None:
+            try:
+                text = self.l2.get(key)
+            except sqlite3.Error:
+                text = None
+            if text is not None:
+                self.l1.set(key, text)
+                return CachedResponse(text, "l2")
+        return None
+
+    def set(self, key: str, text: str):
+        self.l1.set(key, text)
+        if self.l2 is not None:
+            try:
+                self.l2.set(key, text)
+            except sqlite3.Error:
+                pass
+
+    def stats(self) -> dict:
+        return {"l1": self.l1.stats(), "l2": self.l2.stats() if self.l2 is not None else None}
+
+
+def cache_from_env() -> Optional[ResponseCache]:
+    """Build the response cache described by the LLM_CACHE* variables (None when disabled)"""
+    if os.getenv("LLM_CACHE", "on").lower() in ("off", "0", "false", "no"):
+        return None
+    ttl = float(os.getenv("LLM_CACHE_TTL", 86400))
+    l1 = LRUCache(int(os.getenv("LLM_CACHE_L1_MAX_BYTES", 32 * 1024 * 1024)), ttl=ttl)
+    path = os.getenv("LLM_CACHE_PATH", os.path.join(tempfile.gettempdir(), "llm_cache.sqlite"))
+    l2 = SQLiteCache(path, ttl=ttl, max_bytes=int(os.getenv("LLM_CACHE_L2_MAX_BYTES", 512 * 1024 * 1024))) if path else None
+    return ResponseCache(l1, l2)
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_cache() -> Optional[ResponseCache]:
+    """Process-wide response cache, created once from the environment"""
+    with _shared_lock:
+        if "cache" not in _shared:
+            _shared["cache"] = cache_from_env()
+        return _shared["cache"]
@@ -0,0 +1,131 @@
+"""
+Model routing: each endpoint/tier names a route, and a route is a list of models
+tried fastest first. LLMRuntime.cascade() validates every stage's output and only
+escalates to the next (larger) model when the call fails or validation rejects it.
+
+Routes can be overridden without a deploy through LLM_ROUTES, a JSON object of
+route -> [model, ...], e.g. LLM_ROUTES='{"test-generation/premium": ["gemini-2.5-pro"]}'.
+"""
+import collections
+import json
+import os
+import re
+import threading
+from typing import Dict, List
+
+from .scheduler import percentile
+
+DEFAULT_ROUTES: Dict[str, List[str]] = {
+    "test-generation/free": ["gemini-2.5-flash", "gemini-2.5-pro"],
+    "test-generation/freemium": ["gemini-2.5-flash", "gemini-2.5-pro"],
+    "test-generation/premium": ["gemini-2.5-flash", "gemini-2.5-pro"],
+    "resume-jd-matcher/parse-resume": ["gemini-2.0-flash-exp", "gemini-2.5-pro"],
+    "resume-jd-matcher/parse-jd": ["gemini-2.0-flash-exp", "gemini-2.5-pro"],
+    "resume-jd-matcher/explain": ["gemini-2.0-flash-exp", "gemini-2.5-pro"],
+    "unified/parse-resume": ["gemini-1.5-flash", "gemini-1.5-pro"],
+    "unified/parse-jd": ["gemini-1.5-flash", "gemini-1.5-pro"],
+    "unified/compare": ["gemini-1.5-flash", "gemini-1.5-pro"],
+}
+
+
+class ValidationError(ValueError):
+    """Model output that parsed badly or failed a quality check; triggers escalation"""
+
+
+def route_models(route: str) -> List[str]:
+    """Models for a route, fastest first (LLM_ROUTES overrides DEFAULT_ROUTES)"""
+    overrides = os.getenv("LLM_ROUTES")
+    if overrides:
+        models = json.loads(overrides).get(route)
+        if models:
+            return list(models)
+    if route not in DEFAULT_ROUTES:
+        raise KeyError(f"Unknown LLM route: {route}")
+    return list(DEFAULT_ROUTES[route])
+
+
+def json_object(text: str) -> dict:
+    """First {...} block in model output as a dict, or ValidationError"""
+    obj = re.search(r"\{.*\}", text or "", re.S)
+    if not obj:
+        raise ValidationError("No JSON object in model output")
+    try:
+        data = json.loads(obj.group(0))
+    except ValueError as e:
+        raise ValidationError(f"Malformed JSON in model output: {e}")
+    if not isinstance(data, dict) or not data:
+        raise ValidationError("Model output is not a non-empty JSON object")
+    return data
+
+
+def require_keys(data: dict, *keys: str) -> dict:
+    """Raise ValidationError unless every key is present and non-empty"""
+    missing = [key for key in keys if data.get(key) in (None, "", [], {})]
+    if missing:
+        raise ValidationError(f"Missing fields: {', '.join(missing)}")
+    return data
+
+
+class RouteStats:
+    """How often each route escalates, which model ends up serving it, and what escalation costs in latency"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, dict] = {}
+
+    def _route(self, route: str) -> dict:
+        entry = self._routes.get(route)
+        if entry is None:
+            entry = self._routes[route] = {
+                "calls": 0,
+                "escalated": 0,
+                "failed": 0,
+                "served_by": collections.Counter(),
+                "reasons": collections.Counter(),
+                "latency": collections.deque(maxlen=512),
+                "added_latency": collections.deque(maxlen=512),
+            }
+        return entry
+
+    def escalation(self, route: str, model_name: str, exc: BaseException):
+        with self._lock:
+            reason = "invalid" if isinstance(exc, ValidationError) else type(exc).__name__
+            self._route(route)["reasons"][f"{model_name}: {reason}"] += 1
+
+    def served(self, route: str, model_name: str, stage: int, total: float, added: float):
+        with self._lock:
+            entry = self._route(route)
+            entry["calls"] += 1
+            entry["served_by"][model_name] += 1
+            entry["latency"].append(total)
+            if stage > 0:
+                entry["escalated"] += 1
+                entry["added_latency"].append(added)
+
+    def failed(self, route: str, stage: int, total: float):
+        with self._lock:
+            entry = self._route(route)
+            entry["calls"] += 1
+            entry["failed"] += 1
+            entry["escalated"] += stage > 0
+            entry["latency"].append(total)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {}
+            for route, entry in self._routes.items():
+                added = list(entry["added_latency"])
+                out[route] = {
+                    "calls": entry["calls"],
+                    "escalation_rate": round(entry["escalated"] / entry["calls"], 4) if entry["calls"] else 0.0,
+                    "failed": entry["failed"],
+                    "served_by": dict(entry["served_by"]),
+                    "escalation_reasons": dict(entry["reasons"]),
+                    "latency_p50_s": round(percentile(list(entry["latency"]), 50), 4),
+                    "added_latency_s": {
+                        "mean": round(sum(added) / len(added), 4) if added else 0.0,
+                        "p95": round(percentile(added, 95), 4),
+                    },
+                }
+            return out
+
@@ -0,0 +1,102 @@
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from google import genai
+
+
+class GeminiModel:
+    """A model name bound to one pooled client (and therefore one API key)"""
+
+    def __init__(self, client, model_name: str, key_id: str):
+        self.client = client
+        self.model_name = model_name
+        self.key_id = key_id
+
+    def generate_content(self, contents, config: Optional[dict] = None):
+        """Same call shape as GenerativeModel.generate_content, without touching global state"""
+        return self.client.models.generate_content(
+            model=self.model_name,
+            contents=contents,
+            config=config,
+        )
+
+    def generate_content_stream(self, contents, config: Optional[dict] = None):
+        """Iterator of partial responses as the model produces them"""
+        return self.client.models.generate_content_stream(
+            model=self.model_name,
+            contents=contents,
+            config=config,
+        )
+
+    def __repr__(self):
+        return f"GeminiModel({self.model_name!r}, key={self.key_id})"
+
+
+class ClientPool:
+    """
+    Keeps one google-genai Client per API key and one GeminiModel per (key, model).
+
+    Each Client owns its own HTTP session, so connections stay warm between
+    requests and concurrent calls never share or overwrite an API key the way
+    genai.configure() does.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, genai.Client] = {}
+        self._models: Dict[Tuple[str, str], GeminiModel] = {}
+        self._lock = threading.Lock()
+
+    def client(self, api_key: str) -> genai.Client:
+        """Get (or lazily create) the client for an API key"""
+        if not api_key:
+            raise ValueError("API key is required")
+        client = self._clients.get(api_key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(api_key)
+                if client is None:
+                    client = genai.Client(api_key=api_key)
+                    self._clients[api_key] = client
+        return client
+
+    def model(self, api_key: str, model_name: str) -> GeminiModel:
+        """Get (or lazily create) the model handle for an API key and model name"""
+        handle = self._models.get((api_key, model_name))
+        if handle is None:
+            client = self.client(api_key)
+            with self._lock:
+                handle = self._models.get((api_key, model_name))
+                if handle is None:
+                    handle = GeminiModel(client, model_name, key_id(api_key))
+                    self._models[(api_key, model_name)] = handle
+        return handle
+
+    def stats(self) -> dict:
+        """Number of pooled clients and model handles"""
+        return {"clients": len(self._clients), "models": len(self._models)}
+
+
+def key_id(api_key: str) -> str:
+    """Short, log-safe identifier for an API key"""
+    return f"...{api_key[-4:]}" if api_key else "<none>"
+
+
+def load_api_keys(*env_names: str) -> List[str]:
+    """Read API keys from the given env vars (defaults to GEMINI_API_KEY_1..5), skipping unset ones"""
+    names = env_names or tuple(f"GEMINI_API_KEY_{i}" for i in range(1, 6))
+    return [os.getenv(name) for name in names if os.getenv(name)]
+
+
+# Process-wide pool shared by every router and service
+pool = ClientPool()
+
+
+def get_client(api_key: str) -> genai.Client:
+    """Pooled google-genai client for an API key"""
+    return pool.client(api_key)
+
+
+def get_model(model_name: str, api_key: str) -> GeminiModel:
+    """Pooled model handle for an API key and model name"""
+    return pool.model(api_key, model_name)
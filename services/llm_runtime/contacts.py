@@ -0,0 +1,187 @@
+"""
+Deterministic contact extraction.
+
+Emails, phone numbers, GitHub and LinkedIn profiles are found with one
+precompiled pattern (named alternatives, so the text is scanned once); a number
+behind an ID label ("Employee ID:", "Aadhaar No.") is never the phone. The
+candidate's name is taken from the first lines of the resume. Resume parsers
+run extract_contacts() on the extracted text before prompting, leave those
+fields out of the schema they ask the model for, and fill them in afterwards
+with with_contacts(): fewer output tokens, and an email or profile URL is
+only ever one that appears in the document.
+
+The name is a heuristic (a short line of words near the top that is not a
+heading, a job title, a status line like "Open to Work", a location or a
+contact line). It only answers when exactly one line near the top looks like
+a name; when it finds none, or more than one, the parser still asks the model
+for "Full Name".
+"""
+import collections
+import re
+from typing import Dict, Optional
+
+from .segment import HEADINGS
+
+# Parsed-resume keys filled from Contacts, in the order they lead the parse
+CONTACT_FIELDS = ("Full Name", "Email", "Phone", "GitHub", "LinkedIn")
+
+_CONTACT = re.compile(
+    r"(?P<email>[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,24})"
+    r"|(?P<linkedin>(?:https?://)?(?:[a-z]{2,3}\.)?linkedin\.com/in/(?P<linkedin_id>[\w%-]{2,100})/?)"
+    r"|(?P<github>(?:https?://)?(?:www\.)?github\.com/(?P<github_id>[A-Za-z0-9](?:[A-Za-z0-9-]{0,38}))(?:/[\w.-]+)*/?)"
+    r"|(?P<phone>(?<![\w+])(?:\+\d{1,3}[ .-]?)?(?:\(\d{1,4}\)[ .-]?)?\d{2,5}(?:[ .-]?\d{2,5}){1,4}(?![\w@]))",
+    re.I,
+)
+# "jane [at] example [dot] com"
+_OBFUSCATED_AT = re.compile(r"\s*[\[(]\s*at\s*[\])]\s*", re.I)
+_OBFUSCATED_DOT = re.compile(r"\s*[\[(]\s*dot\s*[\])]\s*", re.I)
+_YEAR = re.compile(r"(19|20)\d\d$")
+# Labels in front of a number on its line: "Phone No.: ..." is a phone, "Employee ID: ..." is not
+_PHONE_LABEL = re.compile(r"\b(phone|mobile|mob|cell|tel|telephone|contact|whatsapp)\b", re.I)
+_ID_LABEL = re.compile(
+    r"\b(id|no|number|aadhaa?r|passport|roll|reg|registration|enrol?lment|license|licence|pan|ssn|account|acct)\b",
+    re.I,
+)
+_FIELD_SEPARATORS = re.compile(r"[|•·,;\t]|\s{3,}")
+
+# github.com/<segment> pages that are not profiles
+_GITHUB_RESERVED = {
+    "about", "apps", "collections", "enterprise", "explore", "features", "join", "login", "marketplace",
+    "orgs", "pricing", "settings", "sponsors", "topics", "trending",
+}
+
+# Lines near the top that look like a name but are not one
+_NAME_PREFIX = re.compile(r"^(full\s+)?name\s*[:\-]\s*", re.I)
+_NAME_SEPARATORS = re.compile(r"\s*(?:[|•·,\t]|\s{3,}|\s[-–—]\s)\s*")
+_NAME_WORD = re.compile(r"^[^\W\d_][^\W\d_.'’-]*\.?$|^[^\W\d_]\.$")
+_NOT_NAME = {
+    "resume", "curriculum", "vitae", "cv", "profile", "engineer", "developer", "manager", "intern",
+    "student", "analyst", "scientist", "designer", "consultant", "architect", "lead", "senior", "junior",
+    "university", "college", "institute", "school", "address", "phone", "email", "mobile",
+    # status lines: "Open to Work", "Available for Hire", "Seeking New Opportunities"
+    "open", "work", "available", "hire", "hiring", "seeking", "looking", "opportunities", "remote",
+    "relocate", "relocation", "freelance", "contract",
+    # connectives that don't appear in names ("Head of Data", "Open to Work")
+    "a", "an", "and", "at", "for", "in", "of", "or", "the", "to", "with",
+}
+# "San Francisco, CA", "Austin, Texas, USA": the part before the comma is a place
+_LOCATION = re.compile(
+    r",\s*(?:(?-i:[A-Z]{2})\b|u\.?s\.?a?\b\.?|united\s+states|united\s+kingdom|uk\b|canada|india|germany|"
+    r"france|australia|remote\b|alabama|alaska|arizona|california|colorado|florida|georgia|illinois|"
+    r"massachusetts|michigan|new\s+york|new\s+jersey|north\s+carolina|ohio|oregon|pennsylvania|texas|"
+    r"virginia|washington)",
+    re.I,
+)
+# How many non-empty lines from the top are searched for a name
+NAME_LINES = 6
+
+
+class Contacts:
+    """Contact fields found in a document; None where nothing was found"""
+
+    __slots__ = ("name", "email", "phone", "github", "linkedin")
+
+    def __init__(self, name: Optional[str] = None, email: Optional[str] = None, phone: Optional[str] = None,
+                 github: Optional[str] = None, linkedin: Optional[str] = None):
+        self.name = name
+        self.email = email
+        self.phone = phone
+        self.github = github
+        self.linkedin = linkedin
+
+    def fields(self) -> Dict[str, Optional[str]]:
+        """Parsed-resume keys (CONTACT_FIELDS) and their values"""
+        return dict(zip(CONTACT_FIELDS, (self.name, self.email, self.phone, self.github, self.linkedin)))
+
+    def __repr__(self):
+        return "Contacts(" + ", ".join(f"{k}={getattr(self, k)!r}" for k in self.__slots__) + ")"
+
+
+def _labelled_id(text: str, start: int) -> bool:
+    """True if the number at `start` follows an ID-style label in its field of the line"""
+    line = text[text.rfind("\n", 0, start) + 1:start]
+    label = _FIELD_SEPARATORS.split(line)[-1]
+    return not _PHONE_LABEL.search(label) and bool(_ID_LABEL.search(label))
+
+
+def _phone(match: str) -> Optional[str]:
+    digits = re.sub(r"\D", "", match)
+    if not 10 <= len(digits) <= 15:
+        return None
+    # "2019 2020 2021" is a list of years, not a number
+    groups = re.findall(r"\d+", match)
+    if all(len(g) == 4 and _YEAR.match(g) for g in groups):
+        return None
+    return match.strip()
+
+
+def _name(text: str) -> Optional[str]:
+    found = None
+    seen = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        seen += 1
+        if seen > NAME_LINES:
+            break
+        key = " ".join(re.sub(r"[^a-z& ]+", " ", line.lower()).replace("&", "and").split())
+        if key in HEADINGS:
+            break
+        # "Jane Doe | jane@example.com | +1 555 ..." -> "Jane Doe"
+        line = _NAME_PREFIX.sub("", _CONTACT.sub(" ", line)).strip()
+        candidate = _NAME_SEPARATORS.split(line)[0]
+        words = candidate.split()
+        if not 2 <= len(words) <= 4 or len(candidate) > 40:
+            continue
+        if not all(_NAME_WORD.match(w) for w in words) or {w.lower().strip(".") for w in words} & _NOT_NAME:
+            continue
+        if _LOCATION.match(line, len(candidate)):
+            continue
+        if found is not None and found != candidate:
+            # Two lines that both look like names: leave it to the model
+            return None
+        found = candidate
+    if found is None:
+        return None
+    return found.title() if found.isupper() else found
+
+
+def extract_contacts(text: str) -> Contacts:
+    """Contact fields of a resume, from one scan of its text (no model call)"""
+    if not text:
+        return Contacts()
+    text = _OBFUSCATED_DOT.sub(".", _OBFUSCATED_AT.sub("@", text))
+    email = phone = linkedin = None
+    github = collections.Counter()
+    for match in _CONTACT.finditer(text):
+        if match.group("email"):
+            email = email or match.group("email").rstrip(".")
+        elif match.group("linkedin"):
+            linkedin = linkedin or f"https://www.linkedin.com/in/{match.group('linkedin_id')}"
+        elif match.group("github"):
+            user = match.group("github_id")
+            if user.lower() not in _GITHUB_RESERVED:
+                github[user] += 1
+        elif phone is None and not _labelled_id(text, match.start()):
+            phone = _phone(match.group("phone"))
+    # Repository links count towards their owner; the most linked account is the candidate's
+    owner = github.most_common(1)[0][0] if github else None
+    return Contacts(
+        name=_name(text),
+        email=email,
+        phone=phone,
+        github=f"https://github.com/{owner}" if owner else None,
+        linkedin=linkedin,
+    )
+
+
+def with_contacts(parsed: dict, contacts: Contacts) -> dict:
+    """
+    A model's resume parse with the contact fields filled from `contacts` (leading, in
+    CONTACT_FIELDS order); the model's "Full Name" is kept only when no name was found
+    """
+    fields = contacts.fields()
+    if fields["Full Name"] is None and parsed.get("Full Name"):
+        fields["Full Name"] = parsed["Full Name"]
+    return {**fields, **{k: v for k, v in parsed.items() if k not in fields}}
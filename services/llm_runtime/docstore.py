@@ -0,0 +1,552 @@
+"""
+Content-addressed store of extracted document text.
+
+Every ingestion path (resume/JD URLs in the matcher and test generation, PDF
+uploads in unified-service) goes through one DocumentStore, so the same file
+is downloaded and extracted once no matter which endpoint sees it first.
+
+    documents   SHA-256 of the raw bytes -> normalized text + metadata
+    urls        URL -> digest plus the server's ETag / Last-Modified validators
+
+A URL seen within its host's freshness window is answered without touching the
+network. After that it is revalidated with a conditional GET (If-None-Match /
+If-Modified-Since): a 304 reuses the stored text, and every parse cached by its
+digest, with no download or extraction. A full response whose bytes hash to a
+digest we already hold also skips extraction. Like the LLM response cache there
+are two tiers: an in-process LRU and a SQLite file shared by every worker
+pointing at it.
+
+Configured from the environment:
+    DOCSTORE=off                  keep nothing (every call fetches and extracts)
+    DOCSTORE_PATH                 SQLite file (default: <tmp>/docstore.sqlite; "" keeps memory only)
+    DOCSTORE_TTL                  seconds an extracted document is kept (default 604800)
+    DOCSTORE_URL_TTL              seconds a URL is trusted before revalidating (default 3600)
+    DOCSTORE_L1_MAX_BYTES         in-process budget (default 64 MB)
+    DOCSTORE_HOST_POLICY          JSON of host -> {"fresh": seconds, "conditional": bool};
+                                  a host entry also covers its subdomains, e.g.
+                                  {"drive.google.com": {"fresh": 0}, "cdn.example.com": {"conditional": false}}
+"""
+import asyncio
+import collections
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+from urllib.parse import urlparse
+
+from .cache import LRUCache
+from .htmltext import html_buffer_text
+from .fetch import (
+    EXTRACTABLE,
+    NOT_MODIFIED,
+    FetchError,
+    FetchResult,
+    Fetcher,
+    Spool,
+    UnsupportedDocument,
+    decode,
+    shared_fetcher,
+    sniff,
+)
+from .normalize import normalize
+from .pdf import PDFExtractor, shared_pdf_extractor
+from .segment import Section, remember as remember_segments, section_text, segment
+from .singleflight import SingleFlight
+
+class Document:
+    """Extracted text of one file plus how it was extracted"""
+
+    __slots__ = ("digest", "kind", "text", "size", "page_count", "pages_read", "truncated", "extract_s",
+                 "normalization", "_sections", "created", "source")
+
+    def __init__(self, digest: str, kind: str, text: str, size: int, page_count: Optional[int] = None,
+                 pages_read: Optional[int] = None, truncated: bool = False, extract_s: float = 0.0,
+                 normalization: Optional[dict] = None, sections: Optional[List[Section]] = None,
+                 created: Optional[float] = None, source: str = "extracted"):
+        self.digest = digest
+        self.kind = kind
+        self.text = text
+        self.size = size
+        self.page_count = page_count
+        self.pages_read = pages_read
+        self.truncated = truncated
+        self.extract_s = extract_s
+        # NormalizationReport.to_dict(): characters removed between extraction and storage
+        self.normalization = normalization or {}
+        self._sections = sections
+        self.created = created if created is not None else time.time()
+        # extracted | memory | disk: where this copy came from (not persisted)
+        self.source = source
+
+    @property
+    def sections(self) -> List[Section]:
+        """Typed resume sections with offsets into text (segmented once, stored with the document)"""
+        if self._sections is None:
+            self._sections = segment(self.text)
+        return self._sections
+
+    def section_text(self, *types: str) -> str:
+        """Text of the sections of the given types (see segment.SECTION_TYPES)"""
+        return section_text(self.text, self.sections, types)
+
+    def meta(self) -> dict:
+        """Everything but the text"""
+        return {
+            "digest": self.digest,
+            "kind": self.kind,
+            "size": self.size,
+            "chars": len(self.text),
+            "page_count": self.page_count,
+            "pages_read": self.pages_read,
+            "truncated": self.truncated,
+            "extract_s": round(self.extract_s, 4),
+            "normalization": self.normalization,
+            "sections": [s.to_dict() for s in self.sections],
+            "created": self.created,
+        }
+
+    @classmethod
+    def from_meta(cls, meta: dict, text: str, source: str) -> "Document":
+        return cls(meta["digest"], meta["kind"], text, meta["size"], meta.get("page_count"), meta.get("pages_read"),
+                   meta.get("truncated", False), meta.get("extract_s", 0.0), meta.get("normalization"),
+                   [Section.from_dict(s) for s in meta["sections"]] if "sections" in meta else None,
+                   meta.get("created"), source)
+
+
+class URLEntry:
+    """What a URL last served: its digest, the validators to revalidate it with, and when it was checked"""
+
+    __slots__ = ("digest", "etag", "last_modified", "checked")
+
+    def __init__(self, digest: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+                 checked: Optional[float] = None):
+        self.digest = digest
+        self.etag = etag
+        self.last_modified = last_modified
+        self.checked = checked if checked is not None else time.time()
+
+    @classmethod
+    def from_headers(cls, digest: str, headers: Mapping[str, str]) -> "URLEntry":
+        return cls(digest, headers.get("etag") or None, headers.get("last-modified") or None)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def _pdf_source(body: Spool) -> dict:
+    # Workers open a spooled body by path; only small in-memory bodies are sent over
+    if body.path is not None:
+        return {"path": body.path}
+    return {"data": body.getvalue()}
+
+
+class HostPolicy:
+    """
+    Per-host revalidation: a URL is used without asking for `fresh` seconds after
+    it was last checked, then revalidated with a conditional GET when
+    `conditional` (hosts with broken validators get full downloads instead).
+    """
+
+    __slots__ = ("fresh", "conditional")
+
+    def __init__(self, fresh: Optional[float] = 3600, conditional: bool = True):
+        self.fresh = fresh
+        self.conditional = conditional
+
+    def is_fresh(self, entry: URLEntry) -> bool:
+        return self.fresh is None or entry.checked >= time.time() - self.fresh
+
+    def to_dict(self) -> dict:
+        return {"fresh": self.fresh, "conditional": self.conditional}
+
+
+def parse_host_policies(raw: str, default: HostPolicy) -> Dict[str, HostPolicy]:
+    """DOCSTORE_HOST_POLICY JSON -> {host: HostPolicy}; missing fields fall back to the default policy"""
+    policies = {}
+    for host, spec in (json.loads(raw) if raw else {}).items():
+        spec = spec or {}
+        policies[host.lower().lstrip(".")] = HostPolicy(
+            fresh=float(spec["fresh"]) if spec.get("fresh") is not None else default.fresh,
+            conditional=bool(spec.get("conditional", default.conditional)),
+        )
+    return policies
+
+
+class SQLiteDocuments:
+    """Disk tier: compressed text by digest and URL -> digest mappings, shared by every process on the file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " digest TEXT PRIMARY KEY, meta TEXT NOT NULL, text BLOB NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            " url TEXT PRIMARY KEY, digest TEXT NOT NULL, seen REAL NOT NULL, etag TEXT, last_modified TEXT)"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(urls)")}
+        for column in ("etag", "last_modified"):
+            if column not in columns:  # files written before validators were stored
+                conn.execute(f"ALTER TABLE urls ADD COLUMN {column} TEXT")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, digest: str, ttl: Optional[float]) -> Optional[Document]:
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute("SELECT meta, text, created FROM documents WHERE digest = ?", (digest,)).fetchone()
+        if row is None or (ttl is not None and row[2] < now - ttl):
+            return None
+        conn.execute("UPDATE documents SET accessed = ? WHERE digest = ?", (now, digest))
+        return Document.from_meta(json.loads(row[0]), zlib.decompress(row[1]).decode("utf-8"), "disk")
+
+    def put(self, doc: Document):
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO documents (digest, meta, text, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            (doc.digest, json.dumps(doc.meta()), zlib.compress(doc.text.encode("utf-8")), doc.created, now),
+        )
+
+    def url_entry(self, url: str) -> Optional[URLEntry]:
+        row = self._conn().execute("SELECT digest, etag, last_modified, seen FROM urls WHERE url = ?", (url,)).fetchone()
+        return URLEntry(*row) if row is not None else None
+
+    def remember(self, url: str, entry: URLEntry):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO urls (url, digest, seen, etag, last_modified) VALUES (?, ?, ?, ?, ?)",
+            (url, entry.digest, entry.checked, entry.etag, entry.last_modified),
+        )
+
+    def evict(self, ttl: Optional[float]) -> int:
+        """Drop documents and URL entries older than ttl (a URL entry is useless once its document is gone)"""
+        if ttl is None:
+            return 0
+        conn = self._conn()
+        cutoff = time.time() - ttl
+        removed = conn.execute("DELETE FROM documents WHERE created < ?", (cutoff,)).rowcount
+        conn.execute("DELETE FROM urls WHERE seen < ?", (cutoff,))
+        return removed
+
+
+class DocumentStore:
+    """
+    load()/load_all() for async handlers, load_sync()/load_all_sync() for sync
+    handlers and worker threads, load_bytes() for uploads. Each returns a
+    Document whose text is ready for budgeting and prompting.
+    """
+
+    # Expire old rows every this many writes rather than on each one
+    EVICT_CHECK_EVERY = 64
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: Optional[float] = 7 * 86400,
+        url_ttl: Optional[float] = 3600,
+        l1_max_bytes: int = 64 * 1024 * 1024,
+        fetcher: Optional[Fetcher] = None,
+        extractor: Optional[PDFExtractor] = None,
+        host_policies: Optional[Dict[str, HostPolicy]] = None,
+    ):
+        self.ttl = ttl
+        self.url_ttl = url_ttl
+        self.default_policy = HostPolicy(url_ttl)
+        self.host_policies = host_policies or {}
+        self.documents = LRUCache(l1_max_bytes, ttl=ttl)
+        # Entries outlive their freshness window: their validators are what make revalidation cheap
+        self.urls = LRUCache(4 * 1024 * 1024, ttl=ttl)
+        self.disk = SQLiteDocuments(path) if path else None
+        self._fetcher = fetcher
+        self._extractor = extractor
+        self.flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counters = collections.Counter()
+
+    @property
+    def fetcher(self) -> Fetcher:
+        return self._fetcher if self._fetcher is not None else shared_fetcher()
+
+    @property
+    def extractor(self) -> PDFExtractor:
+        return self._extractor if self._extractor is not None else shared_pdf_extractor()
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    # ---- lookups ----
+
+    def get(self, digest: str) -> Optional[Document]:
+        """Stored document for a digest (memory first, then disk)"""
+        doc = self.documents.get(digest)
+        if doc is not None:
+            return Document.from_meta(doc.meta(), doc.text, "memory")
+        if self.disk is not None:
+            try:
+                doc = self.disk.get(digest, self.ttl)
+            except sqlite3.Error:
+                doc = None
+            if doc is not None:
+                self.documents.set(digest, doc, size=len(doc.text) + 256)
+                return doc
+        return None
+
+    def policy_for(self, url: str) -> HostPolicy:
+        """Revalidation policy of the URL's host (or its closest configured parent domain)"""
+        host = (urlparse(url).hostname or "").lower()
+        while host:
+            policy = self.host_policies.get(host)
+            if policy is not None:
+                return policy
+            host = host.partition(".")[2]
+        return self.default_policy
+
+    def url_entry(self, url: str) -> Optional[URLEntry]:
+        """What the URL served last time, fresh or not"""
+        entry = self.urls.get(url)
+        if entry is None and self.disk is not None:
+            try:
+                entry = self.disk.url_entry(url)
+            except sqlite3.Error:
+                entry = None
+            if entry is not None:
+                self.urls.set(url, entry, size=256)
+        return entry
+
+    def digest_for(self, url: str) -> Optional[str]:
+        """Digest last downloaded from a URL, while the host's policy says it is fresh"""
+        entry = self.url_entry(url)
+        return entry.digest if entry is not None and self.policy_for(url).is_fresh(entry) else None
+
+    def cached_url(self, url: str) -> Optional[Document]:
+        """Stored document behind a URL without any network or extraction work"""
+        digest = self.digest_for(url)
+        return self.get(digest) if digest is not None else None
+
+    def _revalidation(self, url: str) -> Tuple[Optional[Document], Optional[Dict[str, str]]]:
+        """(stored document, conditional headers) for a stale URL; headers are only sent when a 304 can be served"""
+        entry = self.url_entry(url)
+        if entry is None or not self.policy_for(url).conditional:
+            return None, None
+        headers = entry.conditional_headers()
+        doc = self.get(entry.digest) if headers else None
+        if doc is None:
+            return None, None
+        self._count("conditional_requests")
+        return doc, headers
+
+    def _reuse(self, url: str, result: FetchResult, stored: Optional[Document]) -> Optional[Document]:
+        """Stored document for a response that needs no extraction: a 304, or bytes we already hold"""
+        if result.kind == NOT_MODIFIED:
+            if stored is None:
+                raise FetchError(f"{url} answered 304 to an unconditional request", status=304)
+            self._count("not_modified")
+            previous = self.url_entry(url)
+            # A 304 may carry updated validators; keep the old ones otherwise
+            entry = URLEntry.from_headers(stored.digest, result.headers)
+            if previous is not None:
+                entry.etag = entry.etag or previous.etag
+                entry.last_modified = entry.last_modified or previous.last_modified
+            self.remember(url, entry)
+            return stored
+        self._count("downloads")
+        doc = self.get(result.digest)
+        if doc is not None:
+            self._count("digest_hits")
+            self.remember(url, URLEntry.from_headers(doc.digest, result.headers))
+        return doc
+
+    def _store(self, url: str, result: FetchResult, doc: Document):
+        self.put(doc)
+        self.remember(url, URLEntry.from_headers(doc.digest, result.headers))
+
+    def put(self, doc: Document):
+        self.documents.set(doc.digest, doc, size=len(doc.text) + 256)
+        if self.disk is not None:
+            try:
+                self.disk.put(doc)
+                with self._lock:
+                    self._writes += 1
+                    evict = self._writes % self.EVICT_CHECK_EVERY == 0
+                if evict:
+                    self._count("evicted", self.disk.evict(self.ttl))
+            except sqlite3.Error:
+                pass
+
+    def remember(self, url: str, entry: URLEntry):
+        self.urls.set(url, entry, size=256)
+        if self.disk is not None:
+            try:
+                self.disk.remember(url, entry)
+            except sqlite3.Error:
+                pass
+
+    # ---- extraction ----
+
+    def _extract(self, digest: str, kind: str, body: Spool, charset: str = "utf-8") -> Document:
+        started = time.monotonic()
+        page_count = pages_read = None
+        truncated = False
+        if kind == "pdf":
+            result = self.extractor.extract(**_pdf_source(body))
+            text, page_count, pages_read, truncated = result.text, result.page_count, result.pages_read, result.truncated
+        elif kind == "html":
+            text = html_buffer_text(body.view(), charset)
+        elif kind == "text":
+            text = decode(body.view(), charset)
+        else:
+            raise FetchError(f"Cannot extract text from a {kind} document")
+        text, report = normalize(text)
+        with self._lock:
+            self.counters[f"extracted:{kind}"] += 1
+            self.counters["normalized_chars_removed"] += report.chars_removed
+        sections = segment(text)
+        remember_segments(text, sections)
+        return Document(digest, kind, text, body.size, page_count, pages_read, truncated,
+                        time.monotonic() - started, report.to_dict(), sections)
+
+    async def _aextract(self, digest: str, kind: str, body: Spool, charset: str = "utf-8") -> Document:
+        # PDFs wait on the process pool, HTML is parsed on a thread: the event loop is never blocked
+        return await asyncio.get_running_loop().run_in_executor(None, self._extract, digest, kind, body, charset)
+
+    # ---- loading ----
+
+    async def load(self, url: str) -> Document:
+        """Document behind a URL: fresh from the URL map, else revalidated or downloaded, extracting only new bytes"""
+        doc = self.cached_url(url)
+        if doc is not None:
+            self._count("url_hits")
+            return doc
+        return await self.flights.ado(url, lambda: self._load(url))
+
+    async def _load(self, url: str) -> Document:
+        stored, headers = self._revalidation(url)
+        with await self.fetcher.fetch(url, headers) as result:
+            doc = self._reuse(url, result, stored)
+            if doc is None:
+                doc = await self._aextract(result.digest, result.kind, result.body, result.charset)
+                self._store(url, result, doc)
+        return doc
+
+    async def load_all(self, urls: Iterable[str]) -> List[Document]:
+        """load() several URLs concurrently; documents are in the order given"""
+        return list(await asyncio.gather(*(self.load(url) for url in urls)))
+
+    def load_sync(self, url: str) -> Document:
+        """Blocking load() for sync handlers and worker threads"""
+        doc = self.cached_url(url)
+        if doc is not None:
+            self._count("url_hits")
+            return doc
+        return self.flights.do(url, lambda: self._load_sync(url))
+
+    def _load_sync(self, url: str) -> Document:
+        stored, headers = self._revalidation(url)
+        with self.fetcher.fetch_sync(url, headers) as result:
+            doc = self._reuse(url, result, stored)
+            if doc is None:
+                doc = self._extract(result.digest, result.kind, result.body, result.charset)
+                self._store(url, result, doc)
+        return doc
+
+    def load_all_sync(self, urls: Iterable[str]) -> List[Document]:
+        """Blocking load_all(): fresh URLs are answered locally, the rest are revalidated or downloaded together"""
+        urls = list(urls)
+        docs = {url: self.cached_url(url) for url in urls}
+        self._count("url_hits", sum(doc is not None for doc in docs.values()))
+        missing = list(dict.fromkeys(url for url, doc in docs.items() if doc is None))
+        if missing:
+            revalidations = [self._revalidation(url) for url in missing]
+            results = self.fetcher.fetch_all_sync(missing, headers=[headers for _, headers in revalidations])
+            try:
+                for url, (stored, _), result in zip(missing, revalidations, results):
+                    doc = self._reuse(url, result, stored)
+                    if doc is None:
+                        doc = self._extract(result.digest, result.kind, result.body, result.charset)
+                        self._store(url, result, doc)
+                    docs[url] = doc
+            finally:
+                for result in results:
+                    result.close()
+        return [docs[url] for url in urls]
+
+    def load_bytes(self, data: bytes, content_type: str = "") -> Document:
+        """Document for uploaded bytes (format sniffed from the bytes)"""
+        body = Spool(max_memory=len(data) + 1)
+        body.write(data)
+        try:
+            doc = self.get(body.digest)
+            if doc is not None:
+                self._count("digest_hits")
+                return doc
+            kind = sniff(body.head(), content_type)
+            if kind not in EXTRACTABLE:
+                raise UnsupportedDocument(f"Upload is a {kind} file, not a PDF, HTML or text document")
+            doc = self.flights.do(body.digest, lambda: self._extract(body.digest, kind, body))
+            self.put(doc)
+            return doc
+        finally:
+            body.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            "ttl_s": self.ttl,
+            "url_ttl_s": self.url_ttl,
+            "host_policies": {host: policy.to_dict() for host, policy in self.host_policies.items()},
+            "path": self.disk.path if self.disk is not None else None,
+            "documents": self.documents.stats(),
+            "urls": self.urls.stats(),
+            "coalescing": self.flights.stats(),
+            "counters": counters,
+        }
+
+
+def docstore_from_env() -> DocumentStore:
+    """Build the DocumentStore described by the DOCSTORE* variables"""
+    if os.getenv("DOCSTORE", "on").lower() in ("off", "0", "false", "no"):
+        return DocumentStore(ttl=0, url_ttl=0, l1_max_bytes=0)
+    path = os.getenv("DOCSTORE_PATH", os.path.join(tempfile.gettempdir(), "docstore.sqlite"))
+    url_ttl = float(os.getenv("DOCSTORE_URL_TTL", 3600))
+    return DocumentStore(
+        path=path or None,
+        ttl=float(os.getenv("DOCSTORE_TTL", 7 * 86400)),
+        url_ttl=url_ttl,
+        l1_max_bytes=int(os.getenv("DOCSTORE_L1_MAX_BYTES", 64 * 1024 * 1024)),
+        host_policies=parse_host_policies(os.getenv("DOCSTORE_HOST_POLICY", ""), HostPolicy(url_ttl)),
+    )
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_docstore() -> DocumentStore:
+    """Process-wide document store, created once from the environment"""
+    with _shared_lock:
+        if "docstore" not in _shared:
+            _shared["docstore"] = docstore_from_env()
+        return _shared["docstore"]
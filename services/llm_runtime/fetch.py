@@ -0,0 +1,494 @@
+"""
+Pooled async HTTP fetcher for resume / JD URLs.
+
+One httpx client (HTTP/2 when the h2 package is installed) is shared by every
+router in the process. It lives on its own event-loop thread, so async handlers,
+sync handlers and worker threads all reuse the same keep-alive connections and
+never block a request loop while a download is in progress.
+
+Bodies are streamed into a Spool (memory up to FETCH_SPOOL_BYTES, then a temporary
+file) instead of being joined into one bytes object, and the size cap is checked
+on every chunk. The real format is sniffed from the first bytes; images, archives
+and other formats we cannot extract are abandoned as soon as they are recognised.
+Callers may pass request headers (e.g. If-None-Match); a 304 comes back as a
+FetchResult with kind "not-modified" and an empty body.
+
+Configured from the environment:
+    FETCH_CONNECT_TIMEOUT   seconds to establish a connection (default 5)
+    FETCH_READ_TIMEOUT      seconds to wait for the next bytes from the server (default 15)
+    FETCH_DEADLINE          seconds a fetch may take end to end, including queueing (default 30)
+    FETCH_MAX_BYTES         largest (decoded) body accepted (default 10485760)
+    FETCH_SPOOL_BYTES       bodies larger than this are spooled to a temporary file (default 1048576)
+    FETCH_PER_HOST          requests in flight per host (default 4)
+    FETCH_MAX_CONNECTIONS   pooled connections across all hosts (default 64)
+    FETCH_HTTP2=off         stick to HTTP/1.1
+"""
+import asyncio
+import collections
+import hashlib
+import io
+import mmap
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+from .scheduler import percentile
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+)
+
+
+class FetchError(ValueError):
+    """A URL could not be fetched (bad URL, HTTP error, timeout, oversized body)"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class ResponseTooLarge(FetchError):
+    """The body is bigger than the fetcher's max_bytes"""
+
+
+class UnsupportedDocument(FetchError):
+    """The body is an image, archive or other format we cannot extract text from"""
+
+
+SNIFF_BYTES = 1024
+
+# Leading bytes of formats we recognise; PDFs may have junk before the header, so it's searched for
+_MAGIC = [
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF8", "gif"),
+    (b"RIFF", "riff"),
+    (b"PK\x03\x04", "zip"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "ole"),
+    (b"\x1f\x8b", "gzip"),
+    (b"{\\rtf", "rtf"),
+]
+_TEXT_BOMS = (b"\xef\xbb\xbf", b"\xff\xfe", b"\xfe\xff")
+_HTML_RE = re.compile(rb"^\s*(<\?xml[^>]*>\s*)?(<!--.*?-->\s*)*<(!doctype\s+html|html|head|body|meta|title)\b", re.I | re.S)
+EXTRACTABLE = ("pdf", "html", "text")
+NOT_MODIFIED = "not-modified"
+
+
+def sniff(head: bytes, content_type: str = "") -> str:
+    """Document format from its first bytes: pdf, html, text, or the name of a format we can't extract"""
+    if b"%PDF-" in head[:SNIFF_BYTES]:
+        return "pdf"
+    for magic, kind in _MAGIC:
+        if head.startswith(magic):
+            return kind
+    if head.startswith(_TEXT_BOMS):
+        return "html" if "html" in content_type else "text"
+    if _HTML_RE.match(head):
+        return "html"
+    sample = head[:SNIFF_BYTES]
+    if b"\x00" in sample:
+        return "binary"
+    if "html" in content_type and b"<" in sample:
+        return "html"
+    return "text"
+
+
+class Spool:
+    """
+    Write-once body buffer: in memory up to `max_memory` bytes, then a named
+    temporary file. view() exposes the data without copying (the BytesIO buffer
+    or an mmap of the file); path is set once the data is on disk. The SHA-256
+    of the body is computed as it is written.
+    """
+
+    def __init__(self, max_memory: int = 1024 * 1024):
+        self.max_memory = max_memory
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._memory: Optional[io.BytesIO] = io.BytesIO()
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+
+    @property
+    def path(self) -> Optional[str]:
+        """Temporary file holding the body once it outgrew memory (flushed, so other readers see it all)"""
+        if self._file is None:
+            return None
+        self._file.flush()
+        return self._file.name
+
+    def write(self, chunk: bytes):
+        if self._memory is not None and self.size + len(chunk) > self.max_memory:
+            self._file = tempfile.NamedTemporaryFile(prefix="fetch-", suffix=".body")
+            self._file.write(self._memory.getbuffer())
+            self._memory = None
+        (self._memory if self._memory is not None else self._file).write(chunk)
+        self._sha256.update(chunk)
+        self.size += len(chunk)
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 hex digest of everything written so far (same as content_key() of the body)"""
+        return self._sha256.hexdigest()
+
+    def head(self, n: int = SNIFF_BYTES) -> bytes:
+        with self.view() as view:
+            return bytes(view[:n])
+
+    def view(self) -> memoryview:
+        """Zero-copy read-only view of everything written so far"""
+        if self._memory is not None:
+            return self._memory.getbuffer().toreadonly()
+        if self.size == 0:
+            return memoryview(b"")
+        if self._mmap is None or len(self._mmap) != self.size:
+            self._file.flush()
+            self._unmap()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)
+
+    def _unmap(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # a view is still alive; the map is released with it
+            self._mmap = None
+
+    def getvalue(self) -> bytes:
+        """The body as bytes (no copy while it is in memory)"""
+        if self._memory is not None:
+            return self._memory.getvalue()
+        return bytes(self.view())
+
+    def close(self):
+        self._unmap()
+        if self._file is not None:
+            self._file.close()
+        self._memory = None
+
+
+class FetchResult:
+    """One downloaded document; close() it (or use `with`) to drop a spooled body early"""
+
+    __slots__ = ("url", "final_url", "status", "headers", "body", "kind", "elapsed", "http_version")
+
+    def __init__(self, url: str, final_url: str, status: int, headers: Dict[str, str], body: Spool,
+                 kind: str, elapsed: float, http_version: str = "HTTP/1.1"):
+        self.url = url
+        self.final_url = final_url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.kind = kind
+        self.elapsed = elapsed
+        self.http_version = http_version
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.body.close()
+
+    @property
+    def size(self) -> int:
+        return self.body.size
+
+    @property
+    def content(self) -> bytes:
+        return self.body.getvalue()
+
+    @property
+    def digest(self) -> str:
+        return self.body.digest
+
+    @property
+    def content_type(self) -> str:
+        """Media type from the content-type header, lower-cased and without parameters"""
+        return self.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    @property
+    def charset(self) -> str:
+        match = re.search(r"charset=[\"']?([\w.:-]+)", self.headers.get("content-type", ""), re.I)
+        return match.group(1) if match else "utf-8"
+
+    @property
+    def text(self) -> str:
+        """Body decoded as text (BOM first, then the declared charset, then UTF-8)"""
+        return decode(self.body.view(), self.charset)
+
+
+def decode(data, charset: str = "utf-8") -> str:
+    """Decode bytes or a buffer without copying it first"""
+    data = memoryview(data)
+    for bom, encoding in ((b"\xef\xbb\xbf", "utf-8-sig"), (b"\xff\xfe", "utf-16"), (b"\xfe\xff", "utf-16")):
+        if data[:len(bom)] == bom:
+            return str(data, encoding, "replace")
+    try:
+        return str(data, charset, "replace")
+    except LookupError:
+        return str(data, "utf-8", "replace")
+
+
+class Fetcher:
+    """
+    Shared connection pool with per-host concurrency limits, connect/read
+    timeouts, an end-to-end deadline and a body size cap.
+
+    Use fetch()/fetch_all() from async code and fetch_sync()/fetch_all_sync()
+    from sync handlers (never from inside an event loop: they block until done).
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 15.0,
+        deadline: Optional[float] = 30.0,
+        max_bytes: int = 10 * 1024 * 1024,
+        spool_bytes: int = 1024 * 1024,
+        per_host: int = 4,
+        max_connections: int = 64,
+        http2: bool = True,
+        user_agent: str = USER_AGENT,
+    ):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline or None
+        self.max_bytes = max_bytes
+        self.spool_bytes = spool_bytes
+        self.per_host = max(1, per_host)
+        self.max_connections = max(1, max_connections)
+        self.http2 = http2
+        self.user_agent = user_agent
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client = None
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight = collections.Counter()
+        self._latencies = collections.deque(maxlen=512)
+        self.counters = collections.Counter()
+
+    # ---- event loop and client ----
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-runtime-fetcher", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def _make_client(self):
+        try:
+            import httpx
+        except ImportError:
+            raise FetchError("httpx is required for fetching URLs (pip install 'httpx[http2]')")
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                http2 = False
+        return httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections, keepalive_expiry=30),
+            headers={"User-Agent": self.user_agent},
+            follow_redirects=True,
+            max_redirects=5,
+        )
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    # ---- fetching (runs on the fetcher's loop) ----
+
+    async def _fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.netloc:
+            raise FetchError(f"Invalid URL format: {url}")
+        if self._client is None:
+            self._client = self._make_client()
+        host = parsed.netloc.lower()
+        self._count("requests")
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self._gated(host, url, start, headers), self.deadline)
+        except asyncio.TimeoutError:
+            self._count("deadline_exceeded")
+            raise FetchError(f"Fetching {url} took longer than {self.deadline}s")
+        except ResponseTooLarge:
+            self._count("too_large")
+            raise
+        except UnsupportedDocument:
+            self._count("unsupported")
+            raise
+        except FetchError:
+            self._count("errors")
+            raise
+        except Exception as e:
+            self._count("errors")
+            raise FetchError(f"Failed to fetch {url}: {type(e).__name__}: {e}")
+        with self._lock:
+            self.counters["ok"] += 1
+            self.counters["bytes"] += result.size
+            self.counters["spooled_to_disk"] += result.body.path is not None
+            self.counters[result.http_version] += 1
+            self.counters[f"kind:{result.kind}"] += 1
+            self._latencies.append(result.elapsed)
+        return result
+
+    async def _gated(self, host: str, url: str, start: float, headers: Optional[Dict[str, str]]) -> FetchResult:
+        gate = self._hosts.get(host)
+        if gate is None:
+            gate = self._hosts[host] = asyncio.Semaphore(self.per_host)
+        async with gate:
+            with self._lock:
+                self._in_flight[host] += 1
+            try:
+                return await self._download(url, start, headers)
+            finally:
+                with self._lock:
+                    self._in_flight[host] -= 1
+                    if not self._in_flight[host]:
+                        del self._in_flight[host]
+
+    async def _download(self, url: str, start: float, headers: Optional[Dict[str, str]]) -> FetchResult:
+        async with self._client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304:
+                return FetchResult(
+                    url, str(response.url), 304, dict(response.headers), Spool(0), NOT_MODIFIED,
+                    time.monotonic() - start, response.http_version,
+                )
+            if response.status_code >= 400:
+                raise FetchError(f"HTTP {response.status_code} fetching {url}", status=response.status_code)
+            length = response.headers.get("content-length", "")
+            if length.isdigit() and int(length) > self.max_bytes:
+                raise ResponseTooLarge(f"{url} is {int(length)} bytes (limit {self.max_bytes})", status=response.status_code)
+            content_type = response.headers.get("content-type", "").lower()
+            body = Spool(self.spool_bytes)
+            kind = None
+            try:
+                async for chunk in response.aiter_bytes():
+                    if body.size + len(chunk) > self.max_bytes:
+                        raise ResponseTooLarge(f"{url} is larger than {self.max_bytes} bytes", status=response.status_code)
+                    body.write(chunk)
+                    if kind is None and body.size >= SNIFF_BYTES:
+                        kind = self._check_kind(url, body, content_type)
+                if kind is None:
+                    kind = self._check_kind(url, body, content_type)
+            except BaseException:
+                body.close()
+                raise
+            return FetchResult(
+                url, str(response.url), response.status_code, dict(response.headers), body, kind,
+                time.monotonic() - start, response.http_version,
+            )
+
+    @staticmethod
+    def _check_kind(url: str, body: Spool, content_type: str) -> str:
+        """Sniff the format as soon as enough bytes are in; stop downloading formats we can't use"""
+        kind = sniff(body.head(), content_type)
+        if kind not in EXTRACTABLE:
+            raise UnsupportedDocument(f"{url} is a {kind} file, not a PDF, HTML or text document")
+        return kind
+
+    # ---- public API ----
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        """Download one URL without blocking the caller's event loop"""
+        future = asyncio.run_coroutine_threadsafe(self._fetch(url, headers), self._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+    async def fetch_all(self, urls: Iterable[str], return_exceptions: bool = False,
+                        headers: Optional[Iterable[Optional[Dict[str, str]]]] = None) -> list:
+        """Download several URLs concurrently (with optional per-URL headers); results are in the order given"""
+        urls = list(urls)
+        headers = list(headers) if headers is not None else [None] * len(urls)
+        return await asyncio.gather(*(self.fetch(url, h) for url, h in zip(urls, headers)), return_exceptions=return_exceptions)
+
+    def fetch_sync(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        """Blocking fetch() for sync handlers and worker threads"""
+        return asyncio.run_coroutine_threadsafe(self._fetch(url, headers), self._ensure_loop()).result()
+
+    def fetch_all_sync(self, urls: Iterable[str], return_exceptions: bool = False,
+                       headers: Optional[Iterable[Optional[Dict[str, str]]]] = None) -> list:
+        """Blocking fetch_all() for sync handlers and worker threads"""
+        urls = list(urls)
+        headers = list(headers) if headers is not None else [None] * len(urls)
+        futures = [asyncio.run_coroutine_threadsafe(self._fetch(url, h), self._ensure_loop()) for url, h in zip(urls, headers)]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                if not return_exceptions:
+                    for other in futures:
+                        other.cancel()
+                    raise
+                results.append(e)
+        return results
+
+    def close(self):
+        """Close pooled connections and stop the fetcher thread"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result()
+            self._client = None
+        loop.call_soon_threadsafe(loop.stop)
+        self._hosts.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            latencies = list(self._latencies)
+            in_flight = dict(self._in_flight)
+        return {
+            "per_host_limit": self.per_host,
+            "max_connections": self.max_connections,
+            "max_bytes": self.max_bytes,
+            "spool_bytes": self.spool_bytes,
+            "deadline_s": self.deadline,
+            "counters": counters,
+            "in_flight": in_flight,
+            "latency_s": {p: round(percentile(latencies, q), 4) for p, q in (("p50", 50), ("p95", 95), ("p99", 99))},
+        }
+
+
+def fetcher_from_env() -> Fetcher:
+    """Build a Fetcher from the FETCH_* variables"""
+    return Fetcher(
+        connect_timeout=float(os.getenv("FETCH_CONNECT_TIMEOUT", 5)),
+        read_timeout=float(os.getenv("FETCH_READ_TIMEOUT", 15)),
+        deadline=float(os.getenv("FETCH_DEADLINE", 30)),
+        max_bytes=int(os.getenv("FETCH_MAX_BYTES", 10 * 1024 * 1024)),
+        spool_bytes=int(os.getenv("FETCH_SPOOL_BYTES", 1024 * 1024)),
+        per_host=int(os.getenv("FETCH_PER_HOST", 4)),
+        max_connections=int(os.getenv("FETCH_MAX_CONNECTIONS", 64)),
+        http2=os.getenv("FETCH_HTTP2", "on").lower() not in ("off", "0", "false", "no"),
+    )
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_fetcher() -> Fetcher:
+    """Process-wide fetcher, created once from the environment"""
+    with _shared_lock:
+        if "fetcher" not in _shared:
+            _shared["fetcher"] = fetcher_from_env()
+        return _shared["fetcher"]
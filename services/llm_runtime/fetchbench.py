@@ -0,0 +1,130 @@
+"""
+Benchmark URL ingestion against local HTTP stand-ins (no internet needed).
+
+    python -m llm_runtime.fetchbench --requests 200 --concurrency 32 --hosts 4 \
+        --latency-ms 50 --size-kb 200 [--per-host 4] [--no-baseline]
+
+Starts one threaded HTTP/1.1 server per "host" (each on its own port), then
+downloads the same documents two ways: the old path (sequential blocking GETs,
+a new connection per request) and the pooled Fetcher (concurrent, keep-alive,
+per-host limits). Reports throughput, p50/p95/p99 and connections opened.
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .fetch import Fetcher
+from .scheduler import percentile
+
+
+class StandIn:
+    """A local HTTP server that serves `size` bytes after `latency` seconds and counts connections"""
+
+    def __init__(self, latency: float, size: int):
+        self.connections = 0
+        self.requests = 0
+        body = (b"Senior Python engineer. Skills: FastAPI, asyncio, PostgreSQL.\n" * (size // 62 + 1))[:size]
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                stand_in.connections += 1
+
+            def do_GET(self):
+                stand_in.requests += 1
+                time.sleep(latency)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+def summarize(latencies: list, errors: dict, elapsed: float, connections: int) -> dict:
+    return {
+        "ok": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_s": {p: round(percentile(latencies, q), 4) for p, q in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "connections_opened": connections,
+    }
+
+
+def run_baseline(urls: list) -> dict:
+    """The previous behaviour: one blocking GET at a time, a fresh connection each"""
+    latencies, errors = [], {}
+    start = time.perf_counter()
+    for url in urls:
+        t = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                response.read()
+            latencies.append(time.perf_counter() - t)
+        except Exception as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+    return latencies, errors, time.perf_counter() - start
+
+
+async def run_pooled(fetcher: Fetcher, urls: list, concurrency: int) -> tuple:
+    gate = asyncio.Semaphore(concurrency)
+    latencies, errors = [], {}
+
+    async def one(url: str):
+        async with gate:
+            t = time.perf_counter()
+            try:
+                await fetcher.fetch(url)
+                latencies.append(time.perf_counter() - t)
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(url) for url in urls))
+    return latencies, errors, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pooled URL fetcher against local HTTP stand-ins")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--size-kb", type=int, default=200)
+    parser.add_argument("--per-host", type=int, default=4)
+    parser.add_argument("--max-connections", type=int, default=64)
+    parser.add_argument("--no-baseline", action="store_true", help="skip the sequential blocking run")
+    args = parser.parse_args()
+
+    servers = [StandIn(args.latency_ms / 1000, args.size_kb * 1024) for _ in range(args.hosts)]
+    urls = [f"{servers[i % len(servers)].url}/doc/{i}" for i in range(args.requests)]
+    report = {"requests": args.requests, "hosts": args.hosts, "latency_ms": args.latency_ms, "size_kb": args.size_kb}
+
+    if not args.no_baseline:
+        before = sum(s.connections for s in servers)
+        latencies, errors, elapsed = run_baseline(urls)
+        report["baseline_sequential"] = summarize(latencies, errors, elapsed, sum(s.connections for s in servers) - before)
+
+    fetcher = Fetcher(per_host=args.per_host, max_connections=args.max_connections,
+                      max_bytes=max(args.size_kb * 1024 * 2, 1024 * 1024))
+    before = sum(s.connections for s in servers)
+    latencies, errors, elapsed = asyncio.run(run_pooled(fetcher, urls, args.concurrency))
+    report["pooled"] = summarize(latencies, errors, elapsed, sum(s.connections for s in servers) - before)
+    report["fetcher"] = fetcher.stats()
+    fetcher.close()
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,135 @@
+"""
+Benchmark HTML text extraction on real-size profile pages (no internet needed).
+
+    python -m llm_runtime.htmlbench --pages 20 --size-kb 1500 [--no-baseline]
+
+Generates LinkedIn / GitHub-style pages: large inline script and JSON state
+blobs, navigation, footers, cookie banners and link lists around a few KB of
+actual profile text. Each page is extracted two ways: the previous function
+(BeautifulSoup with html.parser, or its regex fallback when bs4 is missing)
+and the streaming extractor. Reports time per page, peak Python memory
+(tracemalloc), output size, and whether the profile text survived (on those
+pages and on EDGE_PAGES: a name in a header, a row of skill links).
+"""
+import argparse
+import json
+import random
+import re
+import time
+import tracemalloc
+
+from .htmltext import html_buffer_text
+from .scheduler import percentile
+
+PROFILE = [
+    "Senior Backend Engineer at Acme Payments",
+    "Built a Kafka-based ledger processing 40k events per second with exactly-once delivery.",
+    "Led the migration of 30 services from Flask to FastAPI and cut p99 latency by 60%.",
+    "Skills: Python, Go, PostgreSQL, Kafka, Kubernetes, Terraform, AWS",
+    "Education: B.Tech Computer Science, IIT Delhi, 2016",
+    "Projects: open-source rate limiter (2.1k stars), async PDF extraction service",
+]
+
+_ABOUT = "<p>" + "Backend engineer building payment systems in Python and Go. " * 5 + "</p>"
+# Small pages where the profile sits in markup that looks like furniture, and the text that must survive
+EDGE_PAGES = [
+    ("<body><div class='profile-header'><h1>Jane Doe</h1><p>Senior Engineer</p></div>" + _ABOUT + "</body>",
+     ["Jane Doe", "Senior Engineer"]),
+    ("<body><header><h1>Jane Doe</h1></header>" + _ABOUT + "</body>", ["Jane Doe"]),
+    ("<body><header><h1>Jane Doe</h1><nav><a href='/'>Home</a></nav></header><main>" + _ABOUT + "</main></body>",
+     ["Jane Doe"]),
+    ("<body><p>Skills: <a href='/t/py'>Python</a> <a href='/t/go'>Go</a> <a href='/t/kafka'>Kafka</a></p>" + _ABOUT
+     + "</body>", ["Skills: Python Go Kafka"]),
+]
+
+
+def baseline_html_text(html: str) -> str:
+    """html_text() as it was before the streaming extractor"""
+    try:
+        from bs4 import BeautifulSoup
+    except ImportError:
+        text = re.sub(r"<(script|style)\b.*?</\1>", " ", html, flags=re.I | re.S)
+        text = re.sub(r"<[^>]+>", " ", text)
+        return re.sub(r"\s+", " ", text).strip()
+    soup = BeautifulSoup(html, "html.parser")
+    for script in soup(["script", "style"]):
+        script.decompose()
+    lines = (line.strip() for line in soup.get_text().splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return " ".join(chunk for chunk in chunks if chunk)
+
+
+def profile_page(size: int, rng: random.Random) -> str:
+    """A profile page of roughly `size` bytes, mostly scripts, state and page furniture"""
+    nav = "<nav class='global-nav'><ul>" + "".join(
+        f"<li><a href='/feed/{i}'>Menu item {i}</a></li>" for i in range(40)) + "</ul></nav>"
+    banner = "<div id='cookie-consent' class='banner'>We use cookies to improve your experience. <button>Accept</button></div>"
+    footer = "<footer><ul>" + "".join(f"<li><a href='/legal/{i}'>Legal link {i}</a></li>" for i in range(60)) + "</ul></footer>"
+    main = "<main><section><h1>Jane Doe</h1>" + "".join(f"<p>{line}</p>" for line in PROFILE) + "</section>"
+    main += "<section class='experience'>" + "".join(
+        f"<div class='entry'><h3>Role {i}</h3><p>Shipped feature {i} using Python and PostgreSQL for {rng.randint(2, 90)} teams.</p></div>"
+        for i in range(25)) + "</section></main>"
+    aside = "<aside class='sidebar'><h2>People also viewed</h2>" + "".join(
+        f"<div class='card'><a href='/in/user{i}'>Someone {i}</a><span>Engineer at Company {i}</span></div>" for i in range(50)) + "</aside>"
+    head = "<head><title>Jane Doe | Profile</title>" + "".join(
+        f"<link rel='stylesheet' href='/static/{i}.css'>" for i in range(20)) + "<style>" + ".c{color:red}" * 2000 + "</style></head>"
+    page = ["<!DOCTYPE html><html>", head, "<body>", banner, nav, main, aside, footer]
+    # Inline state and bundles make up the bulk of real profile pages
+    used = sum(len(part) for part in page)
+    while used < size:
+        state = json.dumps({"entities": [{"id": rng.random(), "name": "x" * 40, "urn": f"urn:li:{i}"} for i in range(200)]})
+        blob = f"<script type='application/json'>{state}</script><script>var a{used}=function(){{return {rng.random()}}};</script>"
+        page.append(blob)
+        used += len(blob)
+    page.append("</body></html>")
+    return "".join(page)
+
+
+def measure(fn, html: str):
+    tracemalloc.start()
+    start = time.perf_counter()
+    text = fn(html)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return text, elapsed, peak
+
+
+def edge_pages_kept(fn) -> bool:
+    """True if `fn` (bytes -> text) keeps the profile text of every EDGE_PAGES page"""
+    return all(all(line in fn(html.encode("utf-8")) for line in expected) for html, expected in EDGE_PAGES)
+
+
+def summarize(runs: list, edge_kept: bool = True) -> dict:
+    times = [elapsed for _, elapsed, _ in runs]
+    return {
+        "latency_ms": {p: round(percentile(times, q) * 1000, 2) for p, q in (("p50", 50), ("p95", 95))},
+        "peak_mem_kb": round(max(peak for _, _, peak in runs) / 1024, 1),
+        "output_chars": round(sum(len(text) for text, _, _ in runs) / len(runs)),
+        "profile_kept": edge_kept and all(all(line in text for line in PROFILE) for text, _, _ in runs),
+        "nav_dropped": all("Menu item 7" not in text for text, _, _ in runs),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark HTML text extraction on profile-sized pages")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--size-kb", type=int, default=1500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-baseline", action="store_true", help="skip the previous extractor")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pages = [profile_page(args.size_kb * 1024, rng).encode("utf-8") for _ in range(args.pages)]
+    report = {"pages": args.pages, "page_kb": round(sum(map(len, pages)) / len(pages) / 1024)}
+    if not args.no_baseline:
+        try:
+            import bs4  # noqa: F401
+            report["baseline"] = "bs4/html.parser"
+        except ImportError:
+            report["baseline"] = "regex fallback (bs4 not installed)"
+        # The previous path decoded the whole body to one str first
+        baseline = lambda b: baseline_html_text(b.decode("utf-8"))  # noqa: E731
+        report["previous"] = summarize([measure(baseline, page) for page in pages], edge_pages_kept(baseline))
+    report["streaming"] = summarize([measure(html_buffer_text, page) for page in pages], edge_pages_kept(html_buffer_text))
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,248 @@
+"""
+Streaming HTML-to-text extraction.
+
+HTMLTextExtractor is an html.parser event handler: it keeps a stack of open
+tag names and the text blocks it has kept so far, never a DOM. Script, style,
+SVG, forms and other non-content subtrees are skipped as they stream past;
+navigation, footers, sidebars and cookie banners (by tag, ARIA role, or
+whole-word id/class hints) are dropped. Page headers and blocks that are mostly
+link text (menus, link farms) are dropped only once the page is known to have
+main content (<main>, <article>, role="main") and they don't hold the page's
+<h1>: on a profile the header is often where the name is, and a skill list is
+often a row of links. When the main content is substantial, only it (and a
+header holding the <h1>) is returned.
+
+Memory is bounded: bodies are decoded and fed in chunks, the tag stack is
+capped, and parsing stops once max_chars of text has been kept.
+"""
+import codecs
+import re
+from html.parser import HTMLParser
+from typing import List, Optional
+
+# Subtrees whose text is never content
+SKIP_TAGS = frozenset({
+    "script", "style", "noscript", "template", "svg", "math", "canvas", "iframe", "object",
+    "head", "select", "button", "form", "dialog",
+})
+# Page furniture: dropped unless it is inside the main content
+BOILERPLATE_TAGS = frozenset({"nav", "header", "footer", "aside"})
+BOILERPLATE_ROLES = frozenset({"navigation", "banner", "contentinfo", "complementary", "search", "menu", "menubar", "dialog", "alert"})
+MAIN_TAGS = frozenset({"main", "article"})
+# Tags that end a block of text
+BLOCK_TAGS = frozenset({
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "dl", "dt", "dd", "tr", "td", "th", "table",
+    "h1", "h2", "h3", "h4", "h5", "h6", "br", "hr", "blockquote", "pre", "figcaption", "address", "summary",
+    "details", "header", "footer", "nav", "aside",
+})
+VOID_TAGS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr",
+})
+# Whole id/class tokens (so "profile-header" and "navigation-tips" are not hints)
+BOILERPLATE_HINTS = frozenset({
+    "nav", "navbar", "menu", "breadcrumb", "breadcrumbs", "footer", "sidebar", "cookie", "cookies", "consent",
+    "banner", "share", "social", "subscribe", "newsletter", "signup", "login", "related", "recommended",
+    "recommendations", "promo", "ad", "ads", "advert",
+})
+HEADER_HINTS = frozenset({"header", "masthead"})
+_SPACE = re.compile(r"\s+")
+
+MAX_DEPTH = 256
+# Main content is used on its own only if it has at least this much text
+MIN_MAIN_CHARS = 200
+
+
+class HTMLTextExtractor(HTMLParser):
+    """feed() chunks of HTML, then close() for the text; no tree is built"""
+
+    def __init__(self, max_chars: int = 200_000, main_content: bool = True, max_link_density: float = 0.6):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.main_content = main_content
+        self.max_link_density = max_link_density
+        # (tag, skipped, boilerplate, main, link, header, h1) per open element
+        self._stack: List[tuple] = []
+        self._skip = 0
+        self._boilerplate = 0
+        self._main = 0
+        self._links = 0
+        self._header = 0
+        self._h1 = 0
+        self._block: List[str] = []
+        self._block_chars = 0
+        self._block_link_chars = 0
+        self._block_main = False
+        self._block_header: Optional[int] = None
+        self._block_h1 = False
+        # Kept blocks: (text, in main content, header group or None, mostly links, holds the <h1>)
+        self._entries: List[tuple] = []
+        # Per page header (outermost <header> / role="banner"): whether it holds an <h1>
+        self._header_h1: List[bool] = []
+        self._has_main = False
+        self.chars = 0
+        self.full = False
+
+    # ---- parser events ----
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            # <head> is often left unclosed; the body must not inherit its skip
+            self.handle_endtag("head")
+        if tag in VOID_TAGS:
+            if tag in ("br", "hr"):
+                self._end_block()
+            return
+        if tag in BLOCK_TAGS:
+            self._end_block()
+        skip = tag in SKIP_TAGS
+        boilerplate = False
+        main = False
+        header = False
+        if not skip:
+            attrs = dict(attrs)
+            role = (attrs.get("role") or "").lower()
+            hints = set(f"{attrs.get('id') or ''} {attrs.get('class') or ''}".lower().split())
+            hinted = tag in ("div", "section", "ul", "table", "span")
+            if "hidden" in attrs or attrs.get("aria-hidden") == "true":
+                skip = True
+            elif tag in MAIN_TAGS or role == "main":
+                main = True
+            elif self._main:
+                # Inside the main content only navigation is furniture (an article's header is content)
+                boilerplate = tag == "nav" or role == "navigation"
+            elif tag == "header" or role == "banner" or (hinted and hints & HEADER_HINTS):
+                # Decided in text(), once we know where the <h1> is and whether there is main content
+                header = True
+            elif tag in BOILERPLATE_TAGS or role in BOILERPLATE_ROLES:
+                boilerplate = True
+            elif hinted and hints & BOILERPLATE_HINTS:
+                boilerplate = True
+        if len(self._stack) >= MAX_DEPTH:
+            # Runaway nesting (unclosed tags): stop tracking rather than grow without bound
+            return
+        link = tag == "a"
+        h1 = tag == "h1"
+        if main:
+            self._has_main = True
+        if header and not self._header:
+            self._header_h1.append(False)
+        if h1 and self._header:
+            self._header_h1[-1] = True
+        self._stack.append((tag, skip, boilerplate, main, link, header, h1))
+        self._skip += skip
+        self._boilerplate += boilerplate
+        self._main += main
+        self._links += link
+        self._header += header
+        self._h1 += h1
+
+    def handle_endtag(self, tag):
+        if tag in BLOCK_TAGS:
+            self._end_block()
+        # Close up to the matching open tag; unmatched end tags are ignored
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self._stack[depth][0] == tag:
+                for _, skip, boilerplate, main, link, header, h1 in self._stack[depth:]:
+                    self._skip -= skip
+                    self._boilerplate -= boilerplate
+                    self._main -= main
+                    self._links -= link
+                    self._header -= header
+                    self._h1 -= h1
+                del self._stack[depth:]
+                return
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in ("br", "hr"):
+            self._end_block()
+
+    def handle_data(self, data):
+        if self._skip or self._boilerplate or self.full:
+            return
+        text = _SPACE.sub(" ", data)
+        if not text.strip():
+            if self._block and not self._block[-1].endswith(" "):
+                self._block.append(" ")
+            return
+        self._block.append(text)
+        self._block_chars += len(text)
+        if self._links:
+            self._block_link_chars += len(text)
+        if self._main:
+            self._block_main = True
+        if self._header:
+            self._block_header = len(self._header_h1) - 1
+        if self._h1:
+            self._block_h1 = True
+
+    # ---- blocks ----
+
+    def _end_block(self):
+        if not self._block:
+            return
+        text = "".join(self._block).strip()
+        chars, link_chars = self._block_chars, self._block_link_chars
+        entry = (text, self._block_main, self._block_header,
+                 bool(chars) and link_chars / chars > self.max_link_density and len(text.split()) > 2, self._block_h1)
+        self._block = []
+        self._block_chars = self._block_link_chars = 0
+        self._block_main = self._block_h1 = False
+        self._block_header = None
+        if not text:
+            return
+        self._entries.append(entry)
+        self.chars += len(text) + 1
+        if self.chars >= self.max_chars:
+            self.full = True
+
+    def _keep(self, entry: tuple) -> bool:
+        _, main, header, links, h1 = entry
+        if main or h1 or not self._has_main:
+            return True
+        # The page has main content: its header counts only if it holds the <h1>, and menus and link lists go
+        if header is not None and not self._header_h1[header]:
+            return False
+        return not links
+
+    def text(self) -> str:
+        """Text kept so far (main content alone, plus a header holding the <h1>, when it is substantial)"""
+        self._end_block()
+        entries = [entry for entry in self._entries if self._keep(entry)]
+        if self.main_content and sum(len(e[0]) for e in entries if e[1]) >= MIN_MAIN_CHARS:
+            entries = [e for e in entries if e[1] or e[4] or (e[2] is not None and self._header_h1[e[2]])]
+        return "\n".join(e[0] for e in entries)[:self.max_chars]
+
+    def close(self) -> str:
+        super().close()
+        return self.text()
+
+
+def html_text(html: str, max_chars: int = 200_000, chunk_size: int = 64 * 1024) -> str:
+    """Visible main text of an HTML page"""
+    parser = HTMLTextExtractor(max_chars)
+    for start in range(0, len(html), chunk_size):
+        parser.feed(html[start:start + chunk_size])
+        if parser.full:
+            break
+    return parser.close()
+
+
+def html_buffer_text(data, charset: str = "utf-8", max_chars: int = 200_000, chunk_size: int = 64 * 1024) -> str:
+    """html_text() of an undecoded buffer, decoded chunk by chunk so the page is never held as one str"""
+    data = memoryview(data)
+    encoding = charset
+    for bom, name in ((b"\xef\xbb\xbf", "utf-8-sig"), (b"\xff\xfe", "utf-16"), (b"\xfe\xff", "utf-16")):
+        if data[:len(bom)] == bom:
+            encoding = name
+            break
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)("replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    parser = HTMLTextExtractor(max_chars)
+    for start in range(0, len(data), chunk_size):
+        parser.feed(decoder.decode(data[start:start + chunk_size]))
+        if parser.full:
+            return parser.close()
+    parser.feed(decoder.decode(b"", final=True))
+    return parser.close()
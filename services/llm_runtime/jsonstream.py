@@ -0,0 +1,120 @@
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+
+class JSONArrayStream:
+    """
+    Incremental parser for a streamed JSON object of the form {"key": [item, item, ...], ...}.
+
+    feed() takes the next chunk of model output and returns (key, item) for
+    every array element that became complete, so callers can forward items
+    before the whole object has arrived. Text before the first '{' (e.g. a
+    ```json fence) is ignored.
+    """
+
+    def __init__(self, keys: Optional[Iterable[str]] = None):
+        self.keys = set(keys) if keys is not None else None
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._string_is_key = False
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._item_start: Optional[int] = None
+        self.emitted = 0
+
+    @property
+    def done(self) -> bool:
+        """True once the top-level object has been closed"""
+        return self._done
+
+    def _in_top_array(self) -> bool:
+        return len(self._stack) == 2 and self._stack[0] == "{" and self._stack[1] == "["
+
+    def _emit(self, end: int, out: List[Tuple[str, Any]]):
+        raw = self._text[self._item_start:end].strip()
+        self._item_start = None
+        if not raw or (self.keys is not None and self._key not in self.keys):
+            return
+        try:
+            out.append((self._key, json.loads(raw)))
+            self.emitted += 1
+        except ValueError:
+            pass
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        out: List[Tuple[str, Any]] = []
+        self._text += chunk
+        text = self._text
+        i = self._pos
+        n = len(text)
+        while i < n and not self._done:
+            c = text[i]
+            if not self._started:
+                if c != "{":
+                    i += 1
+                    continue
+                self._started = True
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._string_is_key:
+                        try:
+                            self._key = json.loads(text[self._string_start:i + 1])
+                        except ValueError:
+                            self._key = None
+                    elif self._in_top_array() and self._item_start == self._string_start:
+                        self._emit(i + 1, out)
+                i += 1
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+                self._string_is_key = len(self._stack) == 1 and self._expect_key
+                if self._in_top_array() and self._item_start is None:
+                    self._item_start = i
+            elif c in "{[":
+                if self._in_top_array() and self._item_start is None:
+                    self._item_start = i
+                self._stack.append(c)
+                if len(self._stack) == 1:
+                    self._expect_key = True
+            elif c in "}]":
+                if self._in_top_array() and self._item_start is not None:
+                    self._emit(i, out)  # trailing number/true/false/null
+                if self._stack:
+                    self._stack.pop()
+                if self._in_top_array() and self._item_start is not None:
+                    self._emit(i + 1, out)  # an object/array item just closed
+                if not self._stack:
+                    self._done = True
+            elif c == ",":
+                if self._in_top_array() and self._item_start is not None:
+                    self._emit(i, out)
+                if len(self._stack) == 1:
+                    self._expect_key = True
+            elif c == ":":
+                if len(self._stack) == 1:
+                    self._expect_key = False
+            elif not c.isspace():
+                if self._in_top_array() and self._item_start is None:
+                    self._item_start = i
+            i += 1
+        self._pos = i
+        return out
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        return self._text
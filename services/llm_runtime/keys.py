@@ -0,0 +1,32 @@
+import hashlib
+import json
+import re
+from typing import Optional
+
+_TRAILING_SPACE = re.compile(r"[ \t]+\n")
+
+
+def content_key(data) -> str:
+    """SHA-256 hex digest of a str or bytes value (stable across processes, unlike hash())"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def normalize_prompt(contents) -> str:
+    """Canonical text for a prompt: unified newlines, no trailing spaces, stripped ends"""
+    if not isinstance(contents, str):
+        contents = json.dumps(contents, sort_keys=True, default=str)
+    text = contents.replace("\r\n", "\n").replace("\r", "\n")
+    return _TRAILING_SPACE.sub("\n", text).strip()
+
+
+def request_key(model_name: str, contents, config: Optional[dict] = None) -> str:
+    """SHA-256 over (model, normalized prompt, generation config)"""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_prompt(contents).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(config or {}, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
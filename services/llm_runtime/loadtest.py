@@ -0,0 +1,87 @@
+"""
+Drive an LLMRuntime against the stub provider and report throughput and tail latency.
+
+    python -m llm_runtime.loadtest --requests 200 --concurrency 20 --keys 3 \
+        --latency lognormal:0.8:0.6 --rate-429 0.05 [--cassette tmp/gemini.jsonl]
+
+Measures our own stack (scheduler, quota, coalescing, cache) with no network
+and no real quota, so numbers are comparable between runs with the same seed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from .cache import LRUCache, ResponseCache
+from .providers import Cassette, LatencyModel, StubProvider
+from .quota import MemoryQuota
+from .runtime import LLMRuntime
+from .scheduler import percentile
+
+
+async def run(runtime: LLMRuntime, requests: int, concurrency: int, unique: int, model_name: str) -> dict:
+    """Send `requests` prompts (cycling over `unique` distinct ones) with at most `concurrency` in flight"""
+    gate = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = {}
+
+    async def one(i: int):
+        async with gate:
+            start = time.perf_counter()
+            try:
+                await runtime.agenerate(model_name, f"load test prompt {i % unique}")
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "ok": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_s": {p: round(percentile(latencies, q), 4) for p, q in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "latency_max_s": round(max(latencies), 4) if latencies else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the LLM runtime against the local stub provider")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--unique", type=int, default=None, help="distinct prompts (default: all unique)")
+    parser.add_argument("--keys", type=int, default=3)
+    parser.add_argument("--rpm", type=float, default=600, help="per-key requests per minute")
+    parser.add_argument("--latency", default="lognormal:0.8:0.6")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--truncate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cassette", help="replay recorded responses from this JSONL file")
+    parser.add_argument("--cache", action="store_true", help="enable an in-memory response cache")
+    parser.add_argument("--model", default="gemini-2.0-flash-exp")
+    args = parser.parse_args()
+
+    if not args.cache:
+        os.environ["LLM_CACHE"] = "off"
+    provider = StubProvider(
+        cassette=Cassette(args.cassette) if args.cassette else None,
+        latency=LatencyModel(args.latency),
+        rate_limit_rate=args.rate_429,
+        truncate_rate=args.truncate,
+        seed=args.seed,
+    )
+    runtime = LLMRuntime(
+        "loadtest",
+        [f"stub-key-{i}" for i in range(args.keys)],
+        rate_per_minute=args.rpm,
+        quota=MemoryQuota(),
+        cache=ResponseCache(LRUCache()) if args.cache else None,
+        provider=provider,
+    )
+    report = asyncio.run(run(runtime, args.requests, args.concurrency, args.unique or args.requests, args.model))
+    report["runtime"] = runtime.stats()
+    print(json.dumps(report, indent=2))
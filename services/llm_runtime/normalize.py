@@ -0,0 +1,138 @@
+"""
+Text normalization between extraction and prompting.
+
+Extracted PDFs repeat their running headers, footers, page numbers and
+contact lines on every page, break words across lines with hyphens, and
+carry typographic ligatures and odd whitespace. normalize() removes all of
+that once, when a document enters the store, and reports how many characters
+each step removed (every one of them is an input token no prompt pays for).
+
+Pages are separated by form feeds ("\f") in extractor output; text without
+them is treated as a single page and only gets the per-line steps.
+"""
+import collections
+import re
+import unicodedata
+from typing import Dict, List, Tuple
+
+LIGATURES = {
+    "\ufb00": "ff", "\ufb01": "fi", "\ufb02": "fl", "\ufb03": "ffi", "\ufb04": "ffl", "\ufb05": "st", "\ufb06": "st",
+    "\u0132": "IJ", "\u0133": "ij",
+}
+# Invisible characters PDFs leave behind (soft hyphen, zero-width space/joiners, word joiner, BOM)
+INVISIBLE = "\u00ad\u200b\u200c\u200d\u2060\ufeff\x00"
+# Non-breaking and fixed-width spaces
+SPACES = "\u00a0\u2002\u2003\u2007\u2009\u202f"
+_CHAR_MAP = {
+    **{ord(k): v for k, v in LIGATURES.items()},
+    **{ord(c): None for c in INVISIBLE},
+    **{ord(c): " " for c in SPACES},
+}
+
+# Explicit page counters only ("Page 2", "Page 2 of 5", "Page 2/5", "- 2 -"); a bare number may be content
+_PAGE_NUMBER = re.compile(r"^page\s*\d{1,3}(\s*(/|of)\s*\d{1,3})?$|^-\s*\d{1,3}\s*-$", re.I)
+_HYPHEN_BREAK = re.compile(r"([a-z])-\n[ \t]*([a-z])")
+_SPACES = re.compile(r"[ \t\v]+")
+_BLANK_RUNS = re.compile(r"\n{3,}")
+
+# Lines this close to a page's top or bottom are candidates for running headers/footers
+EDGE_LINES = 4
+
+
+class NormalizationReport:
+    """Characters in and out, how many each step removed, and how many ligatures were expanded"""
+
+    __slots__ = ("chars_in", "chars_out", "pages", "ligatures", "removed")
+
+    def __init__(self, chars_in: int, pages: int):
+        self.chars_in = chars_in
+        self.chars_out = chars_in
+        self.pages = pages
+        self.ligatures = 0
+        self.removed: Dict[str, int] = collections.Counter()
+
+    @property
+    def chars_removed(self) -> int:
+        return self.chars_in - self.chars_out
+
+    def to_dict(self) -> dict:
+        return {
+            "chars_in": self.chars_in,
+            "chars_out": self.chars_out,
+            "chars_removed": self.chars_removed,
+            "pages": self.pages,
+            "ligatures": self.ligatures,
+            "removed": dict(self.removed),
+        }
+
+
+def _edges(lines: List[str]) -> List[int]:
+    """Indices of the first and last EDGE_LINES non-empty lines of a page"""
+    content = [i for i, line in enumerate(lines) if line]
+    return sorted(set(content[:EDGE_LINES] + content[-EDGE_LINES:]))
+
+
+def _repeated_edges(pages: List[List[str]]) -> set:
+    """
+    Lines that appear, exactly, at the edge of at least half the pages (and at least two);
+    lines that differ only in their digits ("2012 - 2014", "2016 - 2020") are different lines
+    """
+    seen = collections.Counter()
+    for lines in pages:
+        seen.update({lines[i] for i in _edges(lines)})
+    threshold = max(2, (len(pages) + 1) // 2)
+    return {key for key, count in seen.items() if count >= threshold}
+
+
+def _join(pages: List[List[str]]) -> str:
+    return "\n".join("\n".join(lines) for lines in pages)
+
+
+def normalize(text: str) -> Tuple[str, NormalizationReport]:
+    """Normalized text and a report of what was removed"""
+    text = text or ""
+    report = NormalizationReport(len(text), text.count("\f") + 1)
+
+    report.ligatures = sum(text.count(c) for c in LIGATURES)
+    report.removed["invisible"] += sum(text.count(c) for c in INVISIBLE)
+    text = unicodedata.normalize("NFC", text.translate(_CHAR_MAP))
+    before = len(text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    report.removed["whitespace"] += before - len(text)
+
+    pages = [[_SPACES.sub(" ", line).strip() for line in page.split("\n")] for page in text.split("\f")]
+    report.removed["whitespace"] += len(text) - len(_join(pages))
+
+    # Running headers/footers and contact lines: keep the first copy only; drop page numbers
+    if len(pages) > 1:
+        repeated = _repeated_edges(pages)
+        kept_once = set()
+        for lines in pages:
+            for i in _edges(lines):
+                line = lines[i]
+                if _PAGE_NUMBER.match(line):
+                    report.removed["page_numbers"] += len(line) + 1
+                    lines[i] = ""
+                elif line in repeated:
+                    if line in kept_once:
+                        report.removed["repeated_lines"] += len(line) + 1
+                        lines[i] = ""
+                    kept_once.add(line)
+
+    text = _join(pages)
+    before = len(text)
+    text = _HYPHEN_BREAK.sub(r"\1\2", text)
+    report.removed["hyphenation"] += before - len(text)
+
+    before = len(text)
+    text = _BLANK_RUNS.sub("\n\n", text).strip()
+    report.removed["whitespace"] += before - len(text)
+
+    report.removed = collections.Counter({k: v for k, v in report.removed.items() if v})
+    report.chars_out = len(text)
+    return text, report
+
+
+def normalize_text(text: str) -> str:
+    """normalize() without the report"""
+    return normalize(text)[0]
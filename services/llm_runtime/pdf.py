@@ -0,0 +1,377 @@
+"""
+PDF text extraction off the request thread.
+
+PyMuPDF runs in warm worker processes, so a slow or hostile PDF costs a worker
+process, not the API server's event loop or GIL. The first task extracts the
+first page range and reports the page count; if there is more to read, the rest
+of the document is split into page ranges that run on the other workers in
+parallel. Extraction stops at PDF_MAX_PAGES pages or PDF_MAX_CHARS characters.
+Pages are joined with form feeds so later stages can tell them apart.
+
+Each worker runs one task at a time over its own pipe. A task has a CPU-time
+limit (SIGPROF interval timer in the worker, checked between pages) and a
+wall-clock limit that starts when a worker picks it up, so time spent waiting
+for a free worker never counts against a document. A worker stuck inside a
+single page past the wall clock is killed and replaced on its own; tasks on
+the other workers are not affected.
+
+Configured from the environment:
+    PDF_WORKERS         worker processes (default: CPU count, at most 4)
+    PDF_PAGES_PER_TASK  pages per task (default 8)
+    PDF_MAX_PAGES       pages read per document (default 50)
+    PDF_MAX_CHARS       characters kept per document (default 200000)
+    PDF_CPU_TIMEOUT     CPU seconds per task (default 10)
+    PDF_TIMEOUT         wall-clock seconds per task, from when a worker starts it (default 30)
+"""
+import asyncio
+import collections
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent import futures
+from typing import List, Optional, Tuple
+
+from .scheduler import percentile
+
+
+class PDFError(ValueError):
+    """A PDF could not be opened or extracted"""
+
+
+class PDFTimeout(PDFError):
+    """Extraction ran past its CPU or wall-clock limit"""
+
+
+# ---- worker side (runs in the pool's processes) ----
+
+class _CPUExpired(Exception):
+    pass
+
+
+def _on_cpu_expired(signum, frame):
+    raise _CPUExpired()
+
+
+def _warm():
+    """Worker start-up: import PyMuPDF once per worker, not once per document"""
+    try:
+        import fitz  # noqa: F401  PyMuPDF
+    except ImportError:
+        pass
+    if hasattr(signal, "SIGPROF"):
+        signal.signal(signal.SIGPROF, _on_cpu_expired)
+    # Ctrl-C goes to the server, which shuts the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _extract_range(source, start: int, stop: int, max_chars: int, cpu_timeout: float) -> Tuple[int, List[str], bool]:
+    """(page count, text of pages [start, stop), timed out) read from a path or bytes"""
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        raise PDFError("PyMuPDF not available for PDF processing")
+    timer = cpu_timeout > 0 and hasattr(signal, "setitimer")
+    if timer:
+        signal.setitimer(signal.ITIMER_PROF, cpu_timeout)
+    pages: List[str] = []
+    chars = 0
+    try:
+        if isinstance(source, str):
+            doc = fitz.open(source, filetype="pdf")
+        else:
+            doc = fitz.open(stream=source, filetype="pdf")
+        with doc:
+            count = doc.page_count
+            for number in range(start, min(stop, count)):
+                text = doc.load_page(number).get_text()
+                pages.append(text)
+                chars += len(text)
+                if chars >= max_chars:
+                    break
+        return count, pages, False
+    except _CPUExpired:
+        return -1, pages, True
+    except PDFError:
+        raise
+    except Exception as e:
+        raise PDFError(f"Failed to extract text from PDF: {str(e)}")
+    finally:
+        if timer:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+
+
+def _serve(conn):
+    """Worker process main loop: one (args) task in, one (ok, result or exception) out"""
+    _warm()
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        try:
+            conn.send((True, _extract_range(*task)))
+        except Exception as e:
+            conn.send((False, e if isinstance(e, PDFError) else PDFError(str(e))))
+
+
+# ---- server side ----
+
+class PDFResult:
+    """Extracted text plus how it was produced"""
+
+    __slots__ = ("text", "page_count", "pages_read", "truncated", "elapsed")
+
+    def __init__(self, text: str, page_count: int, pages_read: int, truncated: bool, elapsed: float):
+        self.text = text
+        self.page_count = page_count
+        self.pages_read = pages_read
+        self.truncated = truncated
+        self.elapsed = elapsed
+
+
+class _Worker:
+    """One warm worker process and the pipe it takes tasks from"""
+
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child,), name="llm-runtime-pdf", daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class PDFExtractor:
+    """
+    Warm PyMuPDF worker processes. extract() blocks until the text is ready
+    (call it from sync handlers and worker threads); aextract() waits without
+    blocking the caller's event loop.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        pages_per_task: int = 8,
+        max_pages: int = 50,
+        max_chars: int = 200_000,
+        cpu_timeout: float = 10.0,
+        timeout: float = 30.0,
+    ):
+        self.workers = max(1, workers or min(4, os.cpu_count() or 1))
+        self.pages_per_task = max(1, pages_per_task)
+        self.max_pages = max(1, max_pages)
+        self.max_chars = max(1, max_chars)
+        self.cpu_timeout = cpu_timeout
+        self.timeout = timeout or None
+        self._lock = threading.Lock()
+        # Idle workers and how many exist; checkout waits on the condition for one to free up
+        self._available = threading.Condition(self._lock)
+        self._idle: List[_Worker] = []
+        self._spawned = 0
+        self._context = None
+        # Threads that drive the parallel page ranges of a document (each waits on one worker)
+        self._ranges: Optional[futures.ThreadPoolExecutor] = None
+        self._latencies = collections.deque(maxlen=512)
+        self.counters = collections.Counter()
+
+    # ---- workers ----
+
+    def _mp_context(self):
+        if self._context is None:
+            # forkserver/spawn: the server has live threads (fetcher loop, LLM calls) that fork would copy mid-flight
+            methods = multiprocessing.get_all_start_methods()
+            self._context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        return self._context
+
+    def _checkout(self) -> _Worker:
+        """An idle worker, starting one if the pool isn't full; otherwise wait for one to be returned"""
+        with self._available:
+            while not self._idle and self._spawned >= self.workers:
+                self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._spawned += 1
+            context = self._mp_context()
+        try:
+            return _Worker(context)
+        except BaseException:
+            with self._available:
+                self._spawned -= 1
+                self._available.notify()
+            raise
+
+    def _checkin(self, worker: _Worker):
+        with self._available:
+            self._idle.append(worker)
+            self._available.notify()
+
+    def _discard(self, worker: _Worker):
+        """Kill one stuck or dead worker; a replacement starts on the next checkout"""
+        worker.kill()
+        with self._available:
+            self._spawned -= 1
+            self.counters["restarts"] += 1
+            self._available.notify()
+
+    def _run(self, source, start: int, stop: int, max_chars: int) -> Tuple[int, List[str], bool]:
+        """_extract_range() on a worker; the wall clock starts when the worker gets the task"""
+        worker = self._checkout()
+        try:
+            worker.conn.send((source, start, stop, max_chars, self.cpu_timeout))
+            if self.timeout and not worker.conn.poll(self.timeout):
+                self._discard(worker)
+                self._count("timeouts")
+                raise PDFTimeout(f"PDF extraction took longer than {self.timeout}s")
+            ok, result = worker.conn.recv()
+        except (EOFError, OSError):
+            self._discard(worker)
+            self._count("errors")
+            raise PDFError("PDF worker process died during extraction")
+        except PDFTimeout:
+            raise
+        except BaseException:
+            # Interrupted mid-task: the worker's state is unknown
+            self._discard(worker)
+            raise
+        self._checkin(worker)
+        if not ok:
+            self._count("errors")
+            raise result
+        if result[2]:
+            self._count("timeouts")
+            raise PDFTimeout(f"PDF extraction used more than {self.cpu_timeout}s of CPU")
+        return result
+
+    def _range_executor(self) -> futures.ThreadPoolExecutor:
+        with self._lock:
+            if self._ranges is None:
+                self._ranges = futures.ThreadPoolExecutor(self.workers, thread_name_prefix="llm-runtime-pdf")
+            return self._ranges
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def start(self):
+        """Start the workers now instead of on the first PDF"""
+        started = [self._checkout() for _ in range(self.workers)]
+        for worker in started:
+            self._checkin(worker)
+
+    # ---- extraction ----
+
+    def extract(self, path: Optional[str] = None, data: Optional[bytes] = None,
+                max_pages: Optional[int] = None, max_chars: Optional[int] = None) -> PDFResult:
+        """Text of a PDF file or buffer, up to the page and character limits"""
+        if (path is None) == (data is None):
+            raise ValueError("Pass exactly one of path or data")
+        source = path if path is not None else bytes(data)
+        max_pages = min(max_pages or self.max_pages, self.max_pages)
+        max_chars = min(max_chars or self.max_chars, self.max_chars)
+        started = time.monotonic()
+        self._count("documents")
+        # The first range also tells us how many pages there are
+        page_count, pages, _ = self._run(source, 0, min(self.pages_per_task, max_pages), max_chars)
+        texts = list(pages)
+        chars = sum(len(text) for text in texts)
+        end = min(page_count, max_pages)
+        if chars < max_chars and len(texts) < end:
+            self._count("parallel_documents")
+            executor = self._range_executor()
+            pending = [
+                executor.submit(self._run, source, start, min(start + self.pages_per_task, end), max_chars - chars)
+                for start in range(len(texts), end, self.pages_per_task)
+            ]
+            try:
+                for future in pending:
+                    _, pages, _ = future.result()
+                    texts.extend(pages)
+                    chars += sum(len(text) for text in pages)
+                    if chars >= max_chars:
+                        break
+            finally:
+                for future in pending:
+                    future.cancel()
+        text = "\f".join(texts)
+        truncated = len(text) > max_chars or len(texts) < page_count
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self.counters["pages"] += len(texts)
+            self.counters["truncated"] += truncated
+            self._latencies.append(elapsed)
+        return PDFResult(text[:max_chars], page_count, len(texts), truncated, elapsed)
+
+    async def aextract(self, path: Optional[str] = None, data: Optional[bytes] = None,
+                       max_pages: Optional[int] = None, max_chars: Optional[int] = None) -> PDFResult:
+        """extract() without blocking the caller's event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.extract(path, data, max_pages, max_chars))
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._spawned -= len(idle)
+            ranges, self._ranges = self._ranges, None
+        for worker in idle:
+            worker.stop()
+        if ranges is not None:
+            ranges.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            latencies = list(self._latencies)
+            busy = self._spawned - len(self._idle)
+        return {
+            "workers": self.workers,
+            "busy_workers": busy,
+            "pages_per_task": self.pages_per_task,
+            "max_pages": self.max_pages,
+            "max_chars": self.max_chars,
+            "cpu_timeout_s": self.cpu_timeout,
+            "timeout_s": self.timeout,
+            "counters": counters,
+            "latency_s": {p: round(percentile(latencies, q), 4) for p, q in (("p50", 50), ("p95", 95), ("p99", 99))},
+        }
+
+
+def pdf_extractor_from_env() -> PDFExtractor:
+    """Build a PDFExtractor from the PDF_* variables"""
+    workers = os.getenv("PDF_WORKERS")
+    return PDFExtractor(
+        workers=int(workers) if workers else None,
+        pages_per_task=int(os.getenv("PDF_PAGES_PER_TASK", 8)),
+        max_pages=int(os.getenv("PDF_MAX_PAGES", 50)),
+        max_chars=int(os.getenv("PDF_MAX_CHARS", 200_000)),
+        cpu_timeout=float(os.getenv("PDF_CPU_TIMEOUT", 10)),
+        timeout=float(os.getenv("PDF_TIMEOUT", 30)),
+    )
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_pdf_extractor() -> PDFExtractor:
+    """Process-wide PDF extractor, created once from the environment"""
+    with _shared_lock:
+        if "extractor" not in _shared:
+            _shared["extractor"] = pdf_extractor_from_env()
+        return _shared["extractor"]
@@ -0,0 +1,291 @@
+"""
+LLM backends behind LLMRuntime.
+
+    gemini          GeminiProvider   real API through the pooled google-genai clients (default)
+    stub            StubProvider     deterministic local stand-in, no network, no quota
+    replay:<path>   StubProvider     answers from a recorded cassette (stub output on a miss)
+    record:<path>   RecordingProvider calls Gemini and appends every response to a cassette
+
+Chosen with LLM_PROVIDER. The stub injects faults so the rest of the stack can
+be load-tested offline:
+    LLM_STUB_LATENCY         fixed:<s> | uniform:<lo>:<hi> | lognormal:<median>:<sigma>  (default fixed:0)
+    LLM_STUB_429_RATE        probability of a RESOURCE_EXHAUSTED error (default 0)
+    LLM_STUB_TRUNCATE_RATE   probability of cutting the output short (default 0)
+    LLM_STUB_SEED            seed for all random choices (default 0)
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from .clients import get_model
+from .keys import request_key
+
+
+class Provider:
+    """Returns a model handle with generate_content / generate_content_stream for a key + model"""
+
+    name = "provider"
+
+    def model(self, api_key: str, model_name: str):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {"name": self.name}
+
+
+class GeminiProvider(Provider):
+    name = "gemini"
+
+    def model(self, api_key: str, model_name: str):
+        return get_model(model_name, api_key)
+
+
+class StubResponse:
+    """Minimal response object: .text and .parsed like the SDK's"""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    @property
+    def parsed(self):
+        try:
+            return json.loads(self.text)
+        except ValueError:
+            return None
+
+
+class StubRateLimitError(Exception):
+    """Injected 429, recognised by is_rate_limit_error()"""
+
+    code = 429
+
+    def __init__(self):
+        super().__init__("429 RESOURCE_EXHAUSTED (injected by StubProvider)")
+
+
+class LatencyModel:
+    """Samples call latency in seconds from fixed / uniform / lognormal distributions"""
+
+    def __init__(self, spec: str = "fixed:0"):
+        parts = spec.split(":")
+        self.kind = parts[0]
+        self.params = [float(p) for p in parts[1:]]
+        if self.kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        self.spec = spec
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.params[0] if self.params else 0.0
+        if self.kind == "uniform":
+            return rng.uniform(self.params[0], self.params[1])
+        median, sigma = self.params
+        return rng.lognormvariate(math.log(median), sigma)
+
+
+class Cassette:
+    """JSONL file of recorded responses keyed by request_key()"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry["text"]
+
+    def get(self, key: str) -> Optional[str]:
+        return self._entries.get(key)
+
+    def record(self, key: str, model_name: str, text: str):
+        with self._lock:
+            self._entries[key] = text
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "model": model_name, "text": text, "recorded_at": time.time()}) + "\n")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def default_stub_text(model_name: str, contents, key: str) -> str:
+    """Deterministic placeholder output for requests that have no recording"""
+    return json.dumps({"stub": True, "model": model_name, "request": key[:16]})
+
+
+class _StubModel:
+    def __init__(self, provider: "StubProvider", api_key: str, model_name: str):
+        self.provider = provider
+        self.api_key = api_key
+        self.model_name = model_name
+
+    def generate_content(self, contents, config: Optional[dict] = None):
+        text, latency = self.provider._respond(self.api_key, self.model_name, contents, config)
+        time.sleep(latency)
+        return StubResponse(text)
+
+    def generate_content_stream(self, contents, config: Optional[dict] = None):
+        text, latency = self.provider._respond(self.api_key, self.model_name, contents, config)
+        return self.provider._chunks(text, latency)
+
+
+class StubProvider(Provider):
+    """
+    Offline stand-in for Gemini. Responses come from a cassette when one is
+    loaded, otherwise from `responder`; latency, 429s and truncation are
+    injected from a seeded RNG so runs are reproducible.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        cassette: Optional[Cassette] = None,
+        latency: Optional[LatencyModel] = None,
+        rate_limit_rate: float = 0.0,
+        truncate_rate: float = 0.0,
+        seed: int = 0,
+        responder: Callable[[str, object, str], str] = default_stub_text,
+        chunk_chars: int = 64,
+    ):
+        self.cassette = cassette
+        self.latency = latency or LatencyModel()
+        self.rate_limit_rate = rate_limit_rate
+        self.truncate_rate = truncate_rate
+        self.seed = seed
+        self.responder = responder
+        self.chunk_chars = chunk_chars
+        self._lock = threading.Lock()
+        self._attempts: Dict[Tuple[str, str], int] = {}
+        self.calls = 0
+        self.replayed = 0
+        self.rate_limited = 0
+        self.truncated = 0
+
+    def _rng(self, key: str, api_key: str) -> random.Random:
+        # Seeded per (request, key, attempt) so concurrency doesn't change the outcome
+        with self._lock:
+            attempt = self._attempts.get((key, api_key), 0)
+            self._attempts[(key, api_key)] = attempt + 1
+            self.calls += 1
+        seed = hashlib.sha256(f"{self.seed}:{key}:{api_key}:{attempt}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(seed[:8], "big"))
+
+    def _respond(self, api_key: str, model_name: str, contents, config: Optional[dict]):
+        key = request_key(model_name, contents, config)
+        rng = self._rng(key, api_key)
+        latency = self.latency.sample(rng)
+        if rng.random() < self.rate_limit_rate:
+            self.rate_limited += 1
+            time.sleep(min(latency, 0.05))
+            raise StubRateLimitError()
+        text = self.cassette.get(key) if self.cassette is not None else None
+        if text is None:
+            text = self.responder(model_name, contents, key)
+        else:
+            self.replayed += 1
+        if text and rng.random() < self.truncate_rate:
+            self.truncated += 1
+            text = text[: rng.randint(0, len(text) - 1)]
+        return text, latency
+
+    def _chunks(self, text: str, latency: float) -> Iterator[StubResponse]:
+        pieces = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or [""]
+        # A fifth of the latency before the first token, the rest spread across chunks
+        time.sleep(latency * 0.2)
+        per_chunk = latency * 0.8 / len(pieces)
+        for piece in pieces:
+            yield StubResponse(piece)
+            time.sleep(per_chunk)
+
+    def model(self, api_key: str, model_name: str):
+        return _StubModel(self, api_key, model_name)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "replayed": self.replayed,
+            "rate_limited": self.rate_limited,
+            "truncated": self.truncated,
+            "latency": self.latency.spec,
+        }
+
+
+class _RecordingModel:
+    def __init__(self, inner, cassette: Cassette, model_name: str):
+        self.inner = inner
+        self.cassette = cassette
+        self.model_name = model_name
+
+    def generate_content(self, contents, config: Optional[dict] = None):
+        response = self.inner.generate_content(contents, config)
+        text = getattr(response, "text", None)
+        if text:
+            self.cassette.record(request_key(self.model_name, contents, config), self.model_name, text)
+        return response
+
+    def generate_content_stream(self, contents, config: Optional[dict] = None):
+        parts = []
+        for chunk in self.inner.generate_content_stream(contents, config):
+            if chunk.text:
+                parts.append(chunk.text)
+            yield chunk
+        if parts:
+            self.cassette.record(request_key(self.model_name, contents, config), self.model_name, "".join(parts))
+
+
+class RecordingProvider(Provider):
+    """Passes calls through to another provider and appends each response to a cassette"""
+
+    name = "record"
+
+    def __init__(self, inner: Provider, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+
+    def model(self, api_key: str, model_name: str):
+        return _RecordingModel(self.inner.model(api_key, model_name), self.cassette, model_name)
+
+    def stats(self) -> dict:
+        return {"name": self.name, "cassette": self.cassette.path, "recorded": len(self.cassette)}
+
+
+def provider_from_env() -> Provider:
+    """Build the provider named by LLM_PROVIDER (default: gemini)"""
+    spec = os.getenv("LLM_PROVIDER", "gemini").strip()
+    if spec in ("", "gemini"):
+        return GeminiProvider()
+    if spec.startswith("record:"):
+        return RecordingProvider(GeminiProvider(), Cassette(spec[len("record:"):]))
+    if spec == "stub" or spec.startswith("replay:"):
+        return StubProvider(
+            cassette=Cassette(spec[len("replay:"):]) if spec.startswith("replay:") else None,
+            latency=LatencyModel(os.getenv("LLM_STUB_LATENCY", "fixed:0")),
+            rate_limit_rate=float(os.getenv("LLM_STUB_429_RATE", 0)),
+            truncate_rate=float(os.getenv("LLM_STUB_TRUNCATE_RATE", 0)),
+            seed=int(os.getenv("LLM_STUB_SEED", 0)),
+        )
+    raise ValueError(f"Unsupported LLM_PROVIDER: {spec}")
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_provider() -> Provider:
+    """Process-wide provider, created once from the environment"""
+    with _shared_lock:
+        if "provider" not in _shared:
+            _shared["provider"] = provider_from_env()
+        return _shared["provider"]
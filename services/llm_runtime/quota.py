@@ -0,0 +1,193 @@
+"""
+Shared per-key quota so every service and uvicorn worker draws from one budget.
+
+A backend stores one token bucket per API key (identified by a hash of the key,
+never the key itself). KeyScheduler asks it for a token before granting a key;
+local buckets still apply weights and 429 backoff per process.
+
+    memory                      -> MemoryQuota (single process, the default)
+    sqlite:////shared/quota.db  -> SQLiteQuota (processes/containers sharing a volume)
+    http://quota:8010           -> HTTPQuota   (talks to quota_server.py)
+"""
+import hashlib
+import http.client
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger("llm_runtime.quota")
+
+
+def bucket_id(api_key: str) -> str:
+    """Stable, non-reversible bucket name for an API key"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def _refill_and_take(tokens: Optional[float], updated: float, now: float, rate: float, capacity: float) -> Tuple[float, float]:
+    """Token-bucket step shared by all backends; returns (new_tokens, delay)"""
+    if tokens is None:
+        tokens = capacity
+    else:
+        tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class QuotaBackend:
+    """Interface for shared token buckets"""
+
+    # take()/drain() do I/O (file lock, HTTP): the scheduler calls them without its lock
+    # held and, from coroutines, in a worker thread
+    blocking = True
+
+    def take(self, bucket: str, rate: float, capacity: float) -> float:
+        """Atomically refill and take one token; 0.0 if granted, else seconds until one is available"""
+        raise NotImplementedError
+
+    def drain(self, bucket: str):
+        """Empty a bucket (after a 429) so every process backs off"""
+        raise NotImplementedError
+
+
+class MemoryQuota(QuotaBackend):
+    """In-process buckets; also what quota_server.py serves over HTTP"""
+
+    blocking = False
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, bucket: str, rate: float, capacity: float) -> float:
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(bucket, (None, now))
+            tokens, delay = _refill_and_take(tokens, updated, now, rate, capacity)
+            self._buckets[bucket] = (tokens, now)
+        return delay
+
+    def drain(self, bucket: str):
+        # Refill restarts from now, so the next take() can't credit the time before the 429
+        now = time.time()
+        with self._lock:
+            if bucket in self._buckets:
+                tokens, _ = self._buckets[bucket]
+                self._buckets[bucket] = (min(tokens, 0.0), now)
+
+
+class SQLiteQuota(QuotaBackend):
+    """Buckets in a SQLite file; BEGIN IMMEDIATE takes the file lock so updates are atomic across processes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS buckets (id TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def take(self, bucket: str, rate: float, capacity: float) -> float:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE id = ?", (bucket,)).fetchone()
+            tokens, delay = _refill_and_take(row[0] if row else None, row[1] if row else now, now, rate, capacity)
+            conn.execute("INSERT OR REPLACE INTO buckets (id, tokens, updated) VALUES (?, ?, ?)", (bucket, tokens, now))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return delay
+
+    def drain(self, bucket: str):
+        self._conn().execute("UPDATE buckets SET tokens = MIN(tokens, 0), updated = ? WHERE id = ?", (time.time(), bucket))
+
+
+class HTTPQuota(QuotaBackend):
+    """
+    Client for a networked quota service (see quota_server.py).
+
+    Keeps one keep-alive connection per thread. If the service is unreachable
+    the call fails open and the caller falls back to its local bucket.
+    """
+
+    def __init__(self, url: str, timeout: float = 2.0):
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.netloc:
+            raise ValueError(f"Invalid quota service URL: {url}")
+        self.scheme = parsed.scheme
+        self.netloc = parsed.netloc
+        self.prefix = parsed.path.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _post(self, path: str, payload: dict) -> dict:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            conn = cls(self.netloc, timeout=self.timeout)
+            self._local.conn = conn
+        body = json.dumps(payload)
+        try:
+            conn.request("POST", self.prefix + path, body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+        if response.status != 200:
+            raise OSError(f"quota service returned {response.status}")
+        return json.loads(data)
+
+    def take(self, bucket: str, rate: float, capacity: float) -> float:
+        try:
+            return float(self._post("/take", {"bucket": bucket, "rate": rate, "capacity": capacity})["delay"])
+        except (OSError, ValueError, KeyError, http.client.HTTPException) as e:
+            logger.warning("quota service unavailable, using local budget only: %s", e)
+            return 0.0
+
+    def drain(self, bucket: str):
+        try:
+            self._post("/drain", {"bucket": bucket})
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            logger.warning("quota service unavailable, drain skipped: %s", e)
+
+
+def quota_from_env(default: str = "memory") -> Optional[QuotaBackend]:
+    """Build the backend named by LLM_QUOTA_BACKEND; None means per-process buckets only"""
+    spec = os.getenv("LLM_QUOTA_BACKEND", default).strip()
+    if not spec or spec == "memory":
+        return None
+    if spec.startswith("sqlite:///"):
+        return SQLiteQuota(spec[len("sqlite:///"):])
+    if spec.startswith(("http://", "https://")):
+        return HTTPQuota(spec)
+    raise ValueError(f"Unsupported LLM_QUOTA_BACKEND: {spec}")
+
+
+_shared: Dict[str, Optional[QuotaBackend]] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_quota() -> Optional[QuotaBackend]:
+    """Process-wide backend from LLM_QUOTA_BACKEND, created once"""
+    with _shared_lock:
+        if "backend" not in _shared:
+            _shared["backend"] = quota_from_env()
+        return _shared["backend"]
@@ -0,0 +1,69 @@
+"""
+Minimal networked quota service for HTTPQuota.
+
+    python -m llm_runtime.quota_server --port 8010 [--db /shared/quota.db]
+
+Without --db the buckets live in memory, which is also how it is used as a
+local stand-in when exercising HTTPQuota.
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .quota import MemoryQuota, QuotaBackend, SQLiteQuota
+
+
+def make_handler(backend: QuotaBackend):
+    class QuotaHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive for HTTPQuota's per-thread connections
+
+        def _reply(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                data = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.endswith("/take"):
+                    delay = backend.take(data["bucket"], float(data["rate"]), float(data["capacity"]))
+                    self._reply(200, {"delay": delay})
+                elif self.path.endswith("/drain"):
+                    backend.drain(data["bucket"])
+                    self._reply(200, {"status": "drained"})
+                else:
+                    self._reply(404, {"error": "not found"})
+            except (KeyError, ValueError) as e:
+                self._reply(400, {"error": str(e)})
+
+        def do_GET(self):
+            self._reply(200, {"status": "healthy"})
+
+        def log_message(self, format, *args):
+            pass
+
+    return QuotaHandler
+
+
+def serve(host: str = "0.0.0.0", port: int = 8010, backend: QuotaBackend = None, background: bool = False) -> ThreadingHTTPServer:
+    """Start the quota service; with background=True it runs on a daemon thread and the server is returned"""
+    server = ThreadingHTTPServer((host, port), make_handler(backend or MemoryQuota()))
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    else:
+        server.serve_forever()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared Gemini key quota service")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--db", help="SQLite file to persist buckets (default: in memory)")
+    args = parser.parse_args()
+    serve(args.host, args.port, SQLiteQuota(args.db) if args.db else MemoryQuota())
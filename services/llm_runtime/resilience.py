@@ -0,0 +1,274 @@
+"""
+Deadlines, retries, hedging and circuit breakers for LLMRuntime calls.
+
+Configured from the environment:
+    LLM_DEADLINE              seconds a generate() call may take end to end (default 90; 0 = none)
+    LLM_MAX_ATTEMPTS          attempts per call, each on a different key when possible (default 3)
+    LLM_RETRY_BASE_DELAY      first backoff in seconds, doubled per retry with full jitter (default 0.5)
+    LLM_RETRY_MAX_DELAY       backoff cap in seconds (default 8)
+    LLM_HEDGE=on              fire a second call on another idle key once the first is slower than p95
+    LLM_HEDGE_MIN_DELAY       never hedge earlier than this many seconds (default 1)
+    LLM_BREAKER_THRESHOLD     consecutive failures that open a key/model breaker (default 5)
+    LLM_BREAKER_RESET         seconds a breaker stays open before letting one probe through (default 30)
+"""
+import collections
+import os
+import random
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set
+
+from .clients import key_id
+from .scheduler import NoKeyAvailable, is_rate_limit_error, percentile
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call did not finish before its deadline"""
+
+
+class CircuitOpen(RuntimeError):
+    """Raised when every key, or the model itself, is behind an open breaker"""
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    """HTTP status carried by an SDK/HTTP exception, if any"""
+    for attr in ("code", "status_code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Worth another attempt: 429, auth (the next key may work), 5xx, timeouts and connection errors"""
+    if isinstance(exc, (DeadlineExceeded, CircuitOpen, NoKeyAvailable)):
+        return False
+    code = status_code(exc)
+    if code is not None and 400 <= code < 500:
+        return code in (401, 403, 408, 429)
+    return True
+
+
+def is_key_error(exc: BaseException) -> bool:
+    """Failures that say something about the key rather than the model"""
+    return is_rate_limit_error(exc) or status_code(exc) in (401, 403)
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `threshold` consecutive failures; open -> half-open
+    after `reset_timeout`, when a single probe call is let through. The probe's
+    outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probe = False
+        self._lock = threading.Lock()
+
+    def _refresh(self, now: float):
+        if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            self._probe = False
+
+    def available(self) -> bool:
+        """Could a call go through right now (does not claim the half-open probe)"""
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self.state == "closed" or (self.state == "half_open" and not self._probe)
+
+    def allow(self) -> bool:
+        """Claim permission for one call"""
+        with self._lock:
+            self._refresh(time.monotonic())
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probe:
+                self._probe = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.opens += 1
+            self._probe = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refresh(time.monotonic())
+            return {"state": self.state, "failures": self.failures, "opens": self.opens}
+
+
+class Resilience:
+    """Per-runtime retry/hedge policy, breakers per key and per model, and their counters"""
+
+    def __init__(
+        self,
+        deadline: Optional[float] = 90,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8,
+        hedge: bool = False,
+        hedge_min_delay: float = 1.0,
+        hedge_min_samples: int = 20,
+        breaker_threshold: int = 5,
+        breaker_reset: float = 30,
+    ):
+        self.deadline = deadline or None
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self._lock = threading.Lock()
+        self._key_breakers: Dict[str, CircuitBreaker] = {}
+        self._model_breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, collections.deque] = {}
+        self.counters = collections.Counter()
+
+    def _breaker(self, table: Dict[str, CircuitBreaker], name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = table.get(name)
+            if breaker is None:
+                breaker = table[name] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+            return breaker
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    # ---- deadlines ----
+
+    def start(self) -> Optional[float]:
+        """Absolute monotonic deadline for a call starting now"""
+        return None if self.deadline is None else time.monotonic() + self.deadline
+
+    @staticmethod
+    def remaining(deadline: Optional[float], cap: Optional[float] = None) -> Optional[float]:
+        """Seconds left before `deadline` (capped), raising DeadlineExceeded once it has passed"""
+        if deadline is None:
+            return cap
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise DeadlineExceeded("LLM call exceeded its deadline")
+        return left if cap is None else min(left, cap)
+
+    # ---- breakers ----
+
+    def gate(self, model_name: str, api_keys: Iterable[str]) -> Set[str]:
+        """Keys to avoid because their breaker is open; CircuitOpen if the model or every key is open"""
+        if not self._breaker(self._model_breakers, model_name).available():
+            self.count("breaker_rejections")
+            raise CircuitOpen(f"Circuit breaker open for model {model_name}")
+        api_keys = list(api_keys)
+        blocked = {key for key in api_keys if not self._breaker(self._key_breakers, key).available()}
+        if blocked and len(blocked) == len(api_keys):
+            self.count("breaker_rejections")
+            raise CircuitOpen("All API keys are behind an open circuit breaker")
+        return blocked
+
+    def admit(self, model_name: str, api_key: str):
+        """Claim the model and key breakers for one attempt"""
+        if not self._breaker(self._model_breakers, model_name).allow():
+            self.count("breaker_rejections")
+            raise CircuitOpen(f"Circuit breaker open for model {model_name}")
+        # The key breaker only gates; an open key was already excluded when scheduling
+        self._breaker(self._key_breakers, api_key).allow()
+
+    def record(self, model_name: str, api_key: str, elapsed: float, exc: Optional[BaseException] = None):
+        """Feed one attempt's outcome into the breakers and the model's latency window"""
+        key_breaker = self._breaker(self._key_breakers, api_key)
+        model_breaker = self._breaker(self._model_breakers, model_name)
+        if exc is None:
+            key_breaker.success()
+            model_breaker.success()
+            with self._lock:
+                self._latencies.setdefault(model_name, collections.deque(maxlen=256)).append(elapsed)
+            return
+        self.count("failures")
+        if is_key_error(exc):
+            key_breaker.failure()
+            model_breaker.success()  # the model answered, just not for this key
+        elif is_retryable(exc):
+            key_breaker.failure()
+            model_breaker.failure()
+        else:
+            model_breaker.success()  # a bad request is the caller's problem, not an outage
+
+    # ---- retries and hedging ----
+
+    def should_retry(self, exc: BaseException, attempt: int, deadline: Optional[float]) -> bool:
+        if attempt >= self.max_attempts or not is_retryable(exc):
+            return False
+        return deadline is None or deadline > time.monotonic()
+
+    def backoff(self, attempt: int, deadline: Optional[float]) -> float:
+        """Full-jitter exponential delay before retry `attempt` (1-based), never past the deadline"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if deadline is not None:
+            delay = min(delay, max(0.0, deadline - time.monotonic()))
+        return delay
+
+    def hedge_delay(self, model_name: str) -> Optional[float]:
+        """Seconds to wait before hedging (recent p95 of this model), or None when hedging is off"""
+        if not self.hedge:
+            return None
+        with self._lock:
+            samples = list(self._latencies.get(model_name, ()))
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, percentile(samples, 95))
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = {model: list(window) for model, window in self._latencies.items()}
+            counters = dict(self.counters)
+            key_breakers = dict(self._key_breakers)
+            model_breakers = dict(self._model_breakers)
+        return {
+            "deadline_s": self.deadline,
+            "max_attempts": self.max_attempts,
+            "hedging": self.hedge,
+            "counters": counters,
+            "latency_s": {
+                model: {"p50": round(percentile(window, 50), 4), "p95": round(percentile(window, 95), 4),
+                        "p99": round(percentile(window, 99), 4)}
+                for model, window in latencies.items()
+            },
+            "breakers": {
+                "keys": {key_id(key): b.stats() for key, b in key_breakers.items()},
+                "models": {model: b.stats() for model, b in model_breakers.items()},
+            },
+        }
+
+
+def resilience_from_env() -> Resilience:
+    """Build a Resilience policy from the LLM_DEADLINE / LLM_RETRY_* / LLM_HEDGE* / LLM_BREAKER_* variables"""
+    return Resilience(
+        deadline=float(os.getenv("LLM_DEADLINE", 90)),
+        max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", 3)),
+        base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", 0.5)),
+        max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", 8)),
+        hedge=os.getenv("LLM_HEDGE", "off").lower() in ("on", "1", "true", "yes"),
+        hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", 1)),
+        breaker_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", 5)),
+        breaker_reset=float(os.getenv("LLM_BREAKER_RESET", 30)),
+    )
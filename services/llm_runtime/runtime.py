@@ -0,0 +1,456 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent import futures
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from .budget import PromptBudget
+from .cache import ResponseCache, shared_cache
+from .cascade import RouteStats, route_models
+from .keys import request_key
+from .providers import Provider, shared_provider
+from .quota import QuotaBackend, shared_quota
+from .resilience import CircuitOpen, DeadlineExceeded, Resilience, resilience_from_env
+from .scheduler import KeyScheduler, NoKeyAvailable
+from .singleflight import SingleFlight
+
+logger = logging.getLogger("llm_runtime")
+
+# Every runtime created in this process, by name (for the stats endpoint)
+runtimes: Dict[str, "LLMRuntime"] = {}
+
+# Upstream calls run here so a caller can stop waiting at its deadline (the SDK call itself can't be interrupted)
+_call_pool = futures.ThreadPoolExecutor(max_workers=int(os.getenv("LLM_CALL_THREADS", 64)), thread_name_prefix="llm-call")
+# next() default that marks the end of a response stream
+_END = object()
+
+
+class LLMRuntime:
+    """
+    One generate() entry point per service: schedule a key, call the pooled
+    model for that key, and report the outcome back to the scheduler.
+    Repeat requests are answered from the tiered response cache and
+    concurrent duplicates of an in-flight request wait for that request.
+
+    Keys are drawn from the shared quota backend (LLM_QUOTA_BACKEND) and calls
+    go to the backend named by LLM_PROVIDER unless either is passed explicitly.
+    Every call has a deadline, is retried on another key with jittered backoff,
+    can be hedged, and is gated by per-key and per-model circuit breakers
+    (see resilience.py).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        api_keys: List[str],
+        rate_per_minute: float = 15,
+        burst: Optional[float] = None,
+        weights: Optional[List[float]] = None,
+        acquire_timeout: Optional[float] = 120,
+        quota: Optional[QuotaBackend] = None,
+        cache: Optional[ResponseCache] = None,
+        provider: Optional[Provider] = None,
+        resilience: Optional[Resilience] = None,
+    ):
+        self.name = name
+        self.scheduler = KeyScheduler(
+            api_keys,
+            rate_per_minute,
+            burst=burst,
+            weights=weights,
+            quota=quota if quota is not None else shared_quota(),
+        )
+        self.acquire_timeout = acquire_timeout
+        self.flights = SingleFlight()
+        self.cache = cache if cache is not None else shared_cache()
+        self.provider = provider if provider is not None else shared_provider()
+        self.resilience = resilience if resilience is not None else resilience_from_env()
+        self.routes = RouteStats()
+        self.budget = PromptBudget()
+        runtimes[name] = self
+
+    def _call(self, lease, model_name: str, contents, config: Optional[dict]):
+        """One upstream attempt on a leased key; the outcome feeds the scheduler and the breakers"""
+        model = self.provider.model(lease.api_key, model_name)
+        started = time.monotonic()
+        try:
+            response = model.generate_content(contents, config)
+        except Exception as e:
+            self.scheduler.report(lease.api_key, e)
+            self.resilience.record(model_name, lease.api_key, time.monotonic() - started, e)
+            raise
+        self.scheduler.report(lease.api_key)
+        self.resilience.record(model_name, lease.api_key, time.monotonic() - started)
+        return response
+
+    def _hedge_exclude(self, model_name: str, tried: Set[str]) -> Optional[Set[str]]:
+        """Keys a hedge must avoid, or None if no untried, healthy key is left"""
+        try:
+            exclude = tried | self.resilience.gate(model_name, self.scheduler.api_keys)
+        except CircuitOpen:
+            return None
+        return exclude if len(exclude) < len(self.scheduler.api_keys) else None
+
+    def _settle(self, done, hedge, errors: List[BaseException]):
+        """First successful future in `done`, or None (failures are collected in `errors`)"""
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    self.resilience.count("hedge_wins")
+                return future
+            errors.append(future.exception())
+        return None
+
+    def _generate(self, model_name: str, contents, config: Optional[dict]):
+        policy = self.resilience
+        deadline = policy.start()
+        tried: Set[str] = set()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                exclude = tried | policy.gate(model_name, self.scheduler.api_keys)
+                lease = self.scheduler.acquire_sync(policy.remaining(deadline, self.acquire_timeout), exclude)
+                logger.debug("%s: %s got key %d after %.3fs in queue", self.name, model_name, lease.index, lease.queue_wait)
+                tried.add(lease.api_key)
+                policy.admit(model_name, lease.api_key)
+                return self._attempt(lease, model_name, contents, config, deadline, tried)
+            except Exception as e:
+                if not policy.should_retry(e, attempt, deadline):
+                    raise
+                policy.count("retries")
+                logger.info("%s: %s attempt %d failed (%s), retrying on another key", self.name, model_name, attempt, e)
+                time.sleep(policy.backoff(attempt, deadline))
+
+    def _attempt(self, lease, model_name: str, contents, config: Optional[dict], deadline, tried: Set[str]):
+        """Run one attempt in the call pool, hedging onto an idle key if it outlives the model's p95"""
+        policy = self.resilience
+        policy.count("attempts")
+        pending = {_call_pool.submit(self._call, lease, model_name, contents, config)}
+        hedge = None
+        hedge_after = policy.hedge_delay(model_name)
+        if hedge_after is not None:
+            done, _ = futures.wait(pending, timeout=policy.remaining(deadline, hedge_after))
+            exclude = None if done else self._hedge_exclude(model_name, tried)
+            if exclude is not None:
+                try:
+                    hedge_lease = self.scheduler.acquire_sync(0, exclude)  # spare capacity only, never queue
+                    tried.add(hedge_lease.api_key)
+                    policy.admit(model_name, hedge_lease.api_key)
+                    hedge = _call_pool.submit(self._call, hedge_lease, model_name, contents, config)
+                    pending.add(hedge)
+                    policy.count("hedges")
+                except (NoKeyAvailable, CircuitOpen):
+                    pass
+        errors: List[BaseException] = []
+        while pending:
+            done, pending = futures.wait(pending, timeout=policy.remaining(deadline), return_when=futures.FIRST_COMPLETED)
+            if not done:
+                policy.count("deadline_exceeded")
+                raise DeadlineExceeded(f"{model_name} call exceeded its {policy.deadline}s deadline")
+            winner = self._settle(done, hedge, errors)
+            if winner is not None:
+                return winner.result()
+        raise errors[0]
+
+    async def _agenerate(self, model_name: str, contents, config: Optional[dict]):
+        policy = self.resilience
+        deadline = policy.start()
+        tried: Set[str] = set()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                exclude = tried | policy.gate(model_name, self.scheduler.api_keys)
+                lease = await self.scheduler.acquire(policy.remaining(deadline, self.acquire_timeout), exclude)
+                logger.debug("%s: %s got key %d after %.3fs in queue", self.name, model_name, lease.index, lease.queue_wait)
+                tried.add(lease.api_key)
+                policy.admit(model_name, lease.api_key)
+                return await self._aattempt(lease, model_name, contents, config, deadline, tried)
+            except Exception as e:
+                if not policy.should_retry(e, attempt, deadline):
+                    raise
+                policy.count("retries")
+                logger.info("%s: %s attempt %d failed (%s), retrying on another key", self.name, model_name, attempt, e)
+                await asyncio.sleep(policy.backoff(attempt, deadline))
+
+    async def _aattempt(self, lease, model_name: str, contents, config: Optional[dict], deadline, tried: Set[str]):
+        """_attempt() for the event loop: the call runs in the call pool and is awaited with the deadline"""
+        policy = self.resilience
+        policy.count("attempts")
+        pending = {asyncio.wrap_future(_call_pool.submit(self._call, lease, model_name, contents, config))}
+        hedge = None
+        hedge_after = policy.hedge_delay(model_name)
+        if hedge_after is not None:
+            done, _ = await asyncio.wait(pending, timeout=policy.remaining(deadline, hedge_after))
+            exclude = None if done else self._hedge_exclude(model_name, tried)
+            if exclude is not None:
+                try:
+                    hedge_lease = await self.scheduler.acquire(0, exclude)  # spare capacity only, never queue
+                    tried.add(hedge_lease.api_key)
+                    policy.admit(model_name, hedge_lease.api_key)
+                    hedge = asyncio.wrap_future(_call_pool.submit(self._call, hedge_lease, model_name, contents, config))
+                    pending.add(hedge)
+                    policy.count("hedges")
+                except (NoKeyAvailable, CircuitOpen):
+                    pass
+        errors: List[BaseException] = []
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=policy.remaining(deadline), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                policy.count("deadline_exceeded")
+                raise DeadlineExceeded(f"{model_name} call exceeded its {policy.deadline}s deadline")
+            winner = self._settle(done, hedge, errors)
+            if winner is not None:
+                return winner.result()
+        raise errors[0]
+
+    def _cache_get(self, key: str):
+        if self.cache is None:
+            return None
+        return self.cache.get(key)
+
+    def _cache_put(self, key: str, response):
+        if self.cache is None:
+            return
+        try:
+            text = response.text
+        except (AttributeError, ValueError):
+            return  # blocked / empty candidates have no text to cache
+        if text:
+            self.cache.set(key, text)
+
+    def generate(
+        self,
+        model_name: str,
+        contents,
+        config: Optional[dict] = None,
+        coalesce: bool = True,
+        use_cache: bool = True,
+    ):
+        """
+        Blocking generate_content for sync handlers (FastAPI runs them in a threadpool).
+
+        Repeat requests (same model, normalized prompt and config) are served
+        from the response cache, and identical concurrent requests share one
+        upstream call. Either can be switched off per call.
+        """
+        key = request_key(model_name, contents, config)
+        if use_cache:
+            hit = self._cache_get(key)
+            if hit is not None:
+                return hit
+
+        def call():
+            response = self._generate(model_name, contents, config)
+            if use_cache:
+                self._cache_put(key, response)
+            return response
+
+        return self.flights.do(key, call) if coalesce else call()
+
+    async def agenerate(
+        self,
+        model_name: str,
+        contents,
+        config: Optional[dict] = None,
+        coalesce: bool = True,
+        use_cache: bool = True,
+    ):
+        """generate() for async handlers: waits for a key and runs the call off the event loop"""
+        key = request_key(model_name, contents, config)
+        if use_cache:
+            hit = self._cache_get(key)
+            if hit is not None:
+                return hit
+
+        async def call():
+            response = await self._agenerate(model_name, contents, config)
+            if use_cache:
+                self._cache_put(key, response)
+            return response
+
+        return await (self.flights.ado(key, call) if coalesce else call())
+
+    async def amap(self, fn: Callable[[Any], Awaitable[Any]], items: Iterable[Any], limit: Optional[int] = None) -> List[Any]:
+        """
+        Run fn(item) for every item concurrently, at most `limit` at a time (default: the
+        scheduler's burst capacity), and return results in input order. A failing item
+        yields its exception in place of a result instead of failing the whole batch.
+        """
+        gate = asyncio.Semaphore(limit or self.scheduler.capacity())
+
+        async def run(item):
+            async with gate:
+                return await fn(item)
+
+        return await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
+
+    def _stage(self, model_name: str, contents, config: Optional[dict], validate: Callable[[str], Any]):
+        """
+        validate() of one cascade stage's output. A cached answer is reused, but a fresh
+        one is cached only after it validates, so a rejected output is never replayed.
+        """
+        key = request_key(model_name, contents, config)
+        hit = self._cache_get(key)
+        if hit is not None:
+            return validate(hit.text)
+        text = self.generate(model_name, contents, config, use_cache=False).text
+        result = validate(text)
+        if text and self.cache is not None:
+            self.cache.set(key, text)
+        return result
+
+    async def _astage(self, model_name: str, contents, config: Optional[dict], validate: Callable[[str], Any]):
+        """_stage() for async handlers"""
+        key = request_key(model_name, contents, config)
+        hit = self._cache_get(key)
+        if hit is not None:
+            return validate(hit.text)
+        text = (await self.agenerate(model_name, contents, config, use_cache=False)).text
+        result = validate(text)
+        if text and self.cache is not None:
+            self.cache.set(key, text)
+        return result
+
+    def cascade(
+        self,
+        route: str,
+        contents,
+        validate: Callable[[str], Any],
+        config: Optional[dict] = None,
+        models: Optional[List[str]] = None,
+    ):
+        """
+        generate() through a route's models, fastest first, returning validate(response.text)
+        from the first stage that passes. A failed call or a ValidationError escalates to the
+        next model; the last model's error is raised. Only outputs that pass validate() are
+        written to the response cache.
+        """
+        models = list(models) if models else route_models(route)
+        started = time.monotonic()
+        for stage, model_name in enumerate(models):
+            stage_started = time.monotonic()
+            try:
+                result = self._stage(model_name, contents, config, validate)
+            except Exception as e:
+                if stage == len(models) - 1:
+                    self.routes.failed(route, stage, time.monotonic() - started)
+                    raise
+                self.routes.escalation(route, model_name, e)
+                logger.info("%s: %s escalating from %s (%s)", self.name, route, model_name, e)
+                continue
+            self.routes.served(route, model_name, stage, time.monotonic() - started, stage_started - started)
+            return result
+
+    async def acascade(
+        self,
+        route: str,
+        contents,
+        validate: Callable[[str], Any],
+        config: Optional[dict] = None,
+        models: Optional[List[str]] = None,
+    ):
+        """cascade() for async handlers"""
+        models = list(models) if models else route_models(route)
+        started = time.monotonic()
+        for stage, model_name in enumerate(models):
+            stage_started = time.monotonic()
+            try:
+                result = await self._astage(model_name, contents, config, validate)
+            except Exception as e:
+                if stage == len(models) - 1:
+                    self.routes.failed(route, stage, time.monotonic() - started)
+                    raise
+                self.routes.escalation(route, model_name, e)
+                logger.info("%s: %s escalating from %s (%s)", self.name, route, model_name, e)
+                continue
+            self.routes.served(route, model_name, stage, time.monotonic() - started, stage_started - started)
+            return result
+
+    def _read(self, future: futures.Future, model_name: str, deadline):
+        """Result of one stream read running in the call pool, waited on no longer than the deadline"""
+        policy = self.resilience
+        try:
+            return future.result(timeout=policy.remaining(deadline))
+        except futures.TimeoutError:
+            policy.count("deadline_exceeded")
+            raise DeadlineExceeded(f"{model_name} stream exceeded its {policy.deadline}s deadline")
+
+    def _chunks(self, model, model_name: str, contents, config: Optional[dict], deadline) -> Iterator:
+        """The model's response stream with opening it and every chunk read bounded by the call's deadline"""
+        chunks = self._read(_call_pool.submit(lambda: iter(model.generate_content_stream(contents, config))), model_name, deadline)
+        while True:
+            chunk = self._read(_call_pool.submit(next, chunks, _END), model_name, deadline)
+            if chunk is _END:
+                return
+            yield chunk
+
+    def stream(self, model_name: str, contents, config: Optional[dict] = None, use_cache: bool = True) -> Iterator[str]:
+        """
+        Yield response text chunks as the model streams them (sync generator).
+
+        A cached response is replayed as a single chunk; a completed stream is
+        written to the cache under the same key as generate() would use. The
+        call's deadline covers the whole stream: a read that stalls past it
+        raises DeadlineExceeded instead of blocking the caller.
+        """
+        key = request_key(model_name, contents, config)
+        if use_cache:
+            hit = self._cache_get(key)
+            if hit is not None:
+                yield hit.text
+                return
+        policy = self.resilience
+        deadline = policy.start()
+        tried: Set[str] = set()
+        attempt = 0
+        while True:
+            attempt += 1
+            exclude = tried | policy.gate(model_name, self.scheduler.api_keys)
+            lease = self.scheduler.acquire_sync(policy.remaining(deadline, self.acquire_timeout), exclude)
+            logger.debug("%s: %s (stream) got key %d after %.3fs in queue", self.name, model_name, lease.index, lease.queue_wait)
+            tried.add(lease.api_key)
+            policy.admit(model_name, lease.api_key)
+            model = self.provider.model(lease.api_key, model_name)
+            parts = []
+            started = time.monotonic()
+            try:
+                for chunk in self._chunks(model, model_name, contents, config, deadline):
+                    text = chunk.text
+                    if text:
+                        parts.append(text)
+                        yield text
+            except Exception as e:
+                self.scheduler.report(lease.api_key, e)
+                policy.record(model_name, lease.api_key, time.monotonic() - started, e)
+                # Once text has been yielded the caller has seen it, so only retry before the first chunk
+                if parts or not policy.should_retry(e, attempt, deadline):
+                    raise
+                policy.count("retries")
+                time.sleep(policy.backoff(attempt, deadline))
+                continue
+            self.scheduler.report(lease.api_key)
+            policy.record(model_name, lease.api_key, time.monotonic() - started)
+            break
+        if use_cache and parts and self.cache is not None:
+            self.cache.set(key, "".join(parts))
+
+    def stats(self) -> dict:
+        return {
+            "scheduler": self.scheduler.stats(),
+            "coalescing": self.flights.stats(),
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "provider": self.provider.stats(),
+            "resilience": self.resilience.stats(),
+            "routes": self.routes.stats(),
+            "prompt_budget": self.budget.stats(),
+        }
+
+
+def runtime_stats() -> dict:
+    """Stats for every runtime in this process"""
+    return {name: rt.stats() for name, rt in runtimes.items()}
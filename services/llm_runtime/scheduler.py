@@ -0,0 +1,341 @@
+import asyncio
+import collections
+import logging
+import threading
+import time
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+from .quota import QuotaBackend, bucket_id
+
+logger = logging.getLogger("llm_runtime.scheduler")
+
+
+class NoKeyAvailable(TimeoutError):
+    """Raised when no API key could be acquired before the timeout"""
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """True if an SDK/HTTP exception is a 429 / RESOURCE_EXHAUSTED response"""
+    for attr in ("code", "status_code", "status"):
+        if getattr(exc, attr, None) == 429:
+            return True
+    text = str(exc)
+    return "429" in text or "RESOURCE_EXHAUSTED" in text
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of a small sample (0.0 for an empty one)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class TokenBucket:
+    """Continuously refilling token bucket for a single API key"""
+
+    def __init__(self, rate_per_minute: float, burst: float, weight: float = 1.0):
+        self.base_rate = rate_per_minute * weight / 60.0  # tokens per second
+        self.rate = self.base_rate
+        self.capacity = max(1.0, burst * weight)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until one whole token is available (call after refill)"""
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def shrink(self, factor: float, floor: float):
+        """Cut the refill rate after a 429 and drop any banked burst"""
+        self.rate = max(self.base_rate * floor, self.rate * factor)
+        self.tokens = min(self.tokens, 0.0)
+
+    def recover(self, step: float):
+        """Move the refill rate back towards its configured value after a success"""
+        self.rate = min(self.base_rate, self.rate + self.base_rate * step)
+
+
+class KeyLease:
+    """An API key granted by the scheduler, plus how long the caller queued for it"""
+
+    __slots__ = ("api_key", "index", "queue_wait")
+
+    def __init__(self, api_key: str, index: int, queue_wait: float):
+        self.api_key = api_key
+        self.index = index
+        self.queue_wait = queue_wait
+
+
+class _Waiter:
+    __slots__ = ("enqueued", "wake", "exclude")
+
+    def __init__(self, exclude: Optional[Set[int]] = None):
+        self.enqueued = time.monotonic()
+        self.wake = None
+        self.exclude = exclude
+
+
+class KeyScheduler:
+    """
+    Hands out API keys from per-key token buckets in strict FIFO order.
+
+    Both coroutines (acquire) and worker threads (acquire_sync) wait in the same
+    queue. Only the head of the queue sleeps on the refill clock; everyone else
+    sleeps until the waiter ahead of them is served, so nobody busy-polls and a
+    burst is drained in arrival order. report() feeds 429s back into the bucket
+    of the key that produced them.
+
+    With a quota backend, a key is only granted when both the local bucket and
+    the shared bucket for that key have a token, so every process using the
+    same key draws from one budget. The shared bucket is asked without the
+    scheduler's lock held, and from coroutines in a worker thread, so a slow
+    SQLite or HTTP quota never stalls the event loop or the other waiters' wakeups.
+    """
+
+    def __init__(
+        self,
+        api_keys: List[str],
+        rate_per_minute: float = 15,
+        burst: Optional[float] = None,
+        weights: Optional[List[float]] = None,
+        backoff_factor: float = 0.5,
+        min_rate_fraction: float = 0.1,
+        recovery_step: float = 0.1,
+        quota: Optional[QuotaBackend] = None,
+    ):
+        if not api_keys:
+            raise ValueError("KeyScheduler needs at least one API key")
+        if weights is not None and len(weights) != len(api_keys):
+            raise ValueError("weights must have one entry per API key")
+        self.api_keys = list(api_keys)
+        self.rate_per_minute = rate_per_minute
+        if burst is None:
+            # A third of the per-minute budget keeps any 60s window close to the quota
+            burst = max(1, rate_per_minute // 3)
+        weights = weights or [1.0] * len(api_keys)
+        self._buckets = [TokenBucket(rate_per_minute, burst, w) for w in weights]
+        self._index = {key: i for i, key in enumerate(self.api_keys)}
+        self.backoff_factor = backoff_factor
+        self.min_rate_fraction = min_rate_fraction
+        self.recovery_step = recovery_step
+        self.quota = quota
+        self._bucket_ids = [bucket_id(key) for key in self.api_keys]
+
+        self._lock = threading.Lock()
+        self._queue = collections.deque()
+        self._waits = collections.deque(maxlen=1024)
+        self._granted = [0] * len(api_keys)
+        self._rate_limited = [0] * len(api_keys)
+
+    # ---- internal, caller holds self._lock ----
+
+    def _candidates(self, now: float, exclude: Optional[Set[int]] = None) -> List[int]:
+        """Keys with a local token, fullest first"""
+        ready = []
+        for i, bucket in enumerate(self._buckets):
+            bucket.refill(now)
+            if bucket.tokens >= 1 and not (exclude and i in exclude):
+                ready.append(i)
+        ready.sort(key=lambda i: self._buckets[i].tokens / self._buckets[i].capacity, reverse=True)
+        return ready
+
+    def _local(self, waiter: _Waiter) -> Optional[Tuple[List[int], List[float]]]:
+        """
+        For the head of the queue: keys with a local token (fullest first) and the refill
+        delays of the others; None for everyone else
+        """
+        if self._queue[0] is not waiter:
+            return None
+        now = time.monotonic()
+        candidates = self._candidates(now, waiter.exclude)
+        delays = [
+            bucket.delay() for i, bucket in enumerate(self._buckets)
+            if bucket.tokens < 1 and not (waiter.exclude and i in waiter.exclude)
+        ]
+        return candidates, delays
+
+    def _grant(self, waiter: _Waiter, i: int) -> KeyLease:
+        now = time.monotonic()
+        self._buckets[i].refill(now)
+        self._buckets[i].tokens -= 1
+        self._queue.remove(waiter)
+        wait = now - waiter.enqueued
+        self._waits.append(wait)
+        self._granted[i] += 1
+        self._wake_head()
+        return KeyLease(self.api_keys[i], i, wait)
+
+    # ---- internal, called without self._lock (may do shared-quota I/O) ----
+
+    def _shared(self, candidates: List[int], delays: List[float]) -> Tuple[Optional[int], Optional[float]]:
+        """(first candidate the shared quota also has a token for, None) or (None, seconds to sleep)"""
+        for i in candidates:
+            if self.quota is None:
+                return i, None
+            bucket = self._buckets[i]
+            shared_delay = self.quota.take(self._bucket_ids[i], bucket.rate, bucket.capacity)
+            if shared_delay <= 0:
+                return i, None
+            delays.append(shared_delay)
+        return None, min(delays) if delays else None
+
+    def _wake_head(self):
+        if self._queue and self._queue[0].wake is not None:
+            self._queue[0].wake()
+
+    def _abandon(self, waiter: _Waiter):
+        with self._lock:
+            was_head = bool(self._queue) and self._queue[0] is waiter
+            try:
+                self._queue.remove(waiter)
+            except ValueError:
+                return
+            if was_head:
+                self._wake_head()
+
+    def _exclusion(self, exclude: Optional[Iterable[str]]) -> Optional[Set[int]]:
+        # Soft: excluding every key would starve the caller, so it is ignored then
+        if not exclude:
+            return None
+        indices = {self._index[key] for key in exclude if key in self._index}
+        return indices if len(indices) < len(self.api_keys) else None
+
+    # ---- public API ----
+
+    async def acquire(self, timeout: Optional[float] = None, exclude: Optional[Iterable[str]] = None) -> KeyLease:
+        """Wait (without blocking the event loop) for the next key in FIFO order, avoiding `exclude` if possible"""
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(self._exclusion(exclude))
+        deadline = None if timeout is None else waiter.enqueued + timeout
+        with self._lock:
+            self._queue.append(waiter)
+        try:
+            while True:
+                fut = loop.create_future()
+                with self._lock:
+                    local = self._local(waiter)
+                    waiter.wake = lambda fut=fut: loop.call_soon_threadsafe(_resolve, fut)
+                delay = None
+                if local is not None:
+                    if self.quota is not None and self.quota.blocking:
+                        # Only the head gets here, so the queue keeps its order while it waits on I/O
+                        granted, delay = await loop.run_in_executor(None, self._shared, *local)
+                    else:
+                        granted, delay = self._shared(*local)
+                    if granted is not None:
+                        with self._lock:
+                            return self._grant(waiter, granted)
+                sleep_for = _sleep_for(delay, deadline)
+                try:
+                    await asyncio.wait_for(fut, sleep_for)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    def acquire_sync(self, timeout: Optional[float] = None, exclude: Optional[Iterable[str]] = None) -> KeyLease:
+        """Blocking variant of acquire() for handlers that run in a worker thread"""
+        waiter = _Waiter(self._exclusion(exclude))
+        event = threading.Event()
+        waiter.wake = event.set
+        deadline = None if timeout is None else waiter.enqueued + timeout
+        with self._lock:
+            self._queue.append(waiter)
+        try:
+            while True:
+                with self._lock:
+                    local = self._local(waiter)
+                    event.clear()
+                delay = None
+                if local is not None:
+                    granted, delay = self._shared(*local)
+                    if granted is not None:
+                        with self._lock:
+                            return self._grant(waiter, granted)
+                event.wait(_sleep_for(delay, deadline))
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    def report(self, api_key: str, exc: Optional[BaseException] = None):
+        """Feed a call outcome back: 429s shrink the key's budget, successes restore it"""
+        i = self._index.get(api_key)
+        if i is None:
+            return
+        with self._lock:
+            if exc is None:
+                self._buckets[i].recover(self.recovery_step)
+                return
+            if not is_rate_limit_error(exc):
+                return
+            self._buckets[i].shrink(self.backoff_factor, self.min_rate_fraction)
+            self._rate_limited[i] += 1
+        if self.quota is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None and self.quota.blocking:
+            # Called from a coroutine: drain in a worker thread instead of on the event loop
+            loop.run_in_executor(None, self._drain, i)
+        else:
+            self._drain(i)
+
+    def _drain(self, i: int):
+        try:
+            self.quota.drain(self._bucket_ids[i])
+        except Exception as e:
+            logger.warning("shared quota drain failed for key ...%s: %s", self.api_keys[i][-4:], e)
+
+    def capacity(self) -> int:
+        """Calls the keys can start right away at full burst (a sensible fan-out limit)"""
+        return max(1, int(sum(bucket.capacity for bucket in self._buckets)))
+
+    def stats(self) -> dict:
+        """Queue depth, queue-wait distribution and per-key budget"""
+        with self._lock:
+            now = time.monotonic()
+            waits = list(self._waits)
+            keys = []
+            for i, bucket in enumerate(self._buckets):
+                bucket.refill(now)
+                keys.append({
+                    "key": f"...{self.api_keys[i][-4:]}",
+                    "rate_per_minute": round(bucket.rate * 60, 2),
+                    "tokens": round(bucket.tokens, 2),
+                    "granted": self._granted[i],
+                    "rate_limited": self._rate_limited[i],
+                })
+            return {
+                "queue_depth": len(self._queue),
+                "queue_wait_seconds": {
+                    "p50": round(percentile(waits, 50), 4),
+                    "p95": round(percentile(waits, 95), 4),
+                    "max": round(max(waits), 4) if waits else 0.0,
+                },
+                "keys": keys,
+            }
+
+
+def _resolve(fut):
+    if not fut.done():
+        fut.set_result(None)
+
+
+def _sleep_for(delay: Optional[float], deadline: Optional[float]) -> Optional[float]:
+    """Combine the refill delay with the caller's deadline; raises once the deadline passes"""
+    if deadline is None:
+        return delay
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise NoKeyAvailable("Timed out waiting for an available API key")
+    return remaining if delay is None else min(delay, remaining)
@@ -0,0 +1,575 @@
+"""
+Local resume <-> JD scoring: a match score without an LLM call.
+
+Both sides are reduced to a Profile (cached by content digest):
+    skills      canonical skill names (SKILL_TAXONOMY folds "k8s", "Kubernetes"
+                and "kubernetes" into one), from the parsed skill lists and
+                from skills mentioned anywhere in the text
+    years       years of experience (resume: stated, or summed from date
+                ranges; JD: the minimum asked for)
+    education   degree level, 0 (school) .. 4 (doctorate)
+    terms       term counts of the whole document
+
+MatchScorer scores one JD against one or many resumes in a single vectorized
+pass: resume counts of the JD's terms become a sparse (SciPy CSR) matrix,
+and the text score is their BM25 score against the JD, normalized so that a
+resume covering every JD term well scores 1. IDF and the average document
+length are fixed (a background built offline with idf_background(), or
+built-in defaults), never taken from the resumes being scored, so a pair gets
+the same score in every worker, over time, and inside a /rank pool. Skill coverage is a sparse indicator matrix times the JD's
+required skills; experience and education are NumPy comparisons. The score
+is a weighted sum of the four sub-scores, 0-100.
+
+Weights can be overridden with MATCH_WEIGHTS, a JSON object of
+sub-score -> weight, e.g. MATCH_WEIGHTS='{"skills": 0.6, "text": 0.1}'.
+MATCH_IDF_PATH names a background JSON written by idf_background().
+"""
+import collections
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Union
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # only the services that score need them
+    np = sparse = None
+
+from .cache import LRUCache
+from .keys import content_key
+from .scheduler import percentile
+from .segment import section_text, segments_for
+
+# Canonical skill -> aliases (lower-case)
+SKILL_TAXONOMY: Dict[str, tuple] = {
+    "python": ("python3", "python 3", "py"),
+    "java": ("java se", "java ee", "j2ee"),
+    "javascript": ("js", "ecmascript", "es6", "vanilla js"),
+    "typescript": ("ts",),
+    "c": ("c language", "ansi c"),
+    "c++": ("cpp", "c plus plus"),
+    "c#": ("csharp", "c sharp"),
+    "go": ("golang",),
+    "rust": (),
+    "ruby": (),
+    "php": (),
+    "kotlin": (),
+    "swift": (),
+    "scala": (),
+    "r": ("r language", "r programming"),
+    "matlab": (),
+    "bash": ("shell scripting", "shell", "unix shell"),
+    "sql": ("structured query language",),
+    "nosql": ("no-sql",),
+    "postgresql": ("postgres", "psql", "postgre sql"),
+    "mysql": ("my sql",),
+    "sqlite": (),
+    "mongodb": ("mongo", "mongo db"),
+    "redis": (),
+    "cassandra": ("apache cassandra",),
+    "elasticsearch": ("elastic search", "elastic", "opensearch"),
+    "dynamodb": ("dynamo db",),
+    "oracle": ("oracle db", "oracle database"),
+    "hadoop": ("apache hadoop", "hdfs"),
+    "spark": ("apache spark", "pyspark"),
+    "hive": ("apache hive",),
+    "airflow": ("apache airflow",),
+    "kafka": ("apache kafka",),
+    "etl": ("elt", "data pipelines", "data pipeline"),
+    "machine learning": ("ml",),
+    "deep learning": ("dl", "deeplearning"),
+    "nlp": ("natural language processing",),
+    "computer vision": ("cv", "opencv"),
+    "tensorflow": ("tf", "tensor flow"),
+    "keras": (),
+    "pytorch": ("torch",),
+    "scikit-learn": ("sklearn", "scikit learn", "scikit"),
+    "xgboost": (),
+    "pandas": (),
+    "numpy": (),
+    "llm": ("llms", "large language models", "generative ai", "genai"),
+    "docker": ("containers", "containerization"),
+    "kubernetes": ("k8s", "eks", "gke", "aks"),
+    "aws": ("amazon web services", "ec2", "s3", "lambda"),
+    "azure": ("microsoft azure",),
+    "gcp": ("google cloud", "google cloud platform"),
+    "terraform": (),
+    "ansible": (),
+    "jenkins": (),
+    "ci/cd": ("cicd", "ci cd", "continuous integration", "continuous delivery", "github actions", "gitlab ci"),
+    "git": ("github", "gitlab", "version control"),
+    "linux": ("unix",),
+    "react": ("react.js", "reactjs"),
+    "angular": ("angular.js", "angularjs"),
+    "vue": ("vue.js", "vuejs"),
+    "node.js": ("node", "nodejs"),
+    "express": ("express.js", "expressjs"),
+    "django": (),
+    "flask": (),
+    "fastapi": ("fast api",),
+    "spring": ("spring boot", "springboot"),
+    "html": ("html5",),
+    "css": ("css3", "sass", "scss", "tailwind"),
+    "rest api": ("rest", "restful", "rest apis", "restful apis", "api development"),
+    "graphql": (),
+    "grpc": (),
+    "microservices": ("micro services", "microservice"),
+    "distributed systems": (),
+    "system design": (),
+    "data structures": ("dsa", "data structures and algorithms", "algorithms"),
+    "oop": ("object oriented programming", "object-oriented programming", "ood"),
+    "testing": ("unit testing", "pytest", "junit", "selenium", "tdd", "test automation"),
+    "agile": ("scrum", "kanban"),
+    "tableau": (),
+    "power bi": ("powerbi",),
+    "excel": ("ms excel", "microsoft excel"),
+    "android": (),
+    "ios": (),
+    "flutter": (),
+    "react native": (),
+    "prometheus": (),
+    "grafana": (),
+    "communication": ("communication skills",),
+    "leadership": ("team leadership", "people management"),
+}
+# Aliases that are ordinary words in lower case; found in free text only when capitalised
+_AMBIGUOUS = frozenset({"go", "r", "c", "rust", "swift", "spring", "express", "node", "shell", "elastic",
+                        "lambda", "torch", "rest", "tf", "ts", "js", "cv", "dl", "ml", "py", "scala", "hive",
+                        "spark", "flask", "agile", "excel", "oracle", "git", "ios", "containers"})
+
+# Alias (and canonical name) -> canonical name
+_ALIASES: Dict[str, str] = {name: canonical for canonical, names in SKILL_TAXONOMY.items() for name in (canonical,) + names}
+_MAX_ALIAS_WORDS = max(len(name.split()) for name in _ALIASES)
+# Canonical skills that terms() can produce (single words)
+_SKILL_TERMS = frozenset(name for name in SKILL_TAXONOMY if " " not in name)
+
+_TOKEN_RE = re.compile(r"[A-Za-z][A-Za-z0-9+#./-]*[A-Za-z0-9+#]|[A-Za-z]|\d+(?:\.\d+)?")
+_STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or our the to was were will with you your we
+this that these those their they i me my he she his her who which what when where how all any can
+experience years year work worked working using used use including strong good knowledge ability
+""".split())
+
+_MONTHS = {m: i for i, m in enumerate(("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+_MONTH = r"(?:(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s*)?"
+_DATE_RANGE = re.compile(
+    _MONTH + r"((?:19|20)\d{2})\s*(?:-|–|—|to|until)\s*" + _MONTH + r"((?:19|20)\d{2}|present|current|now|till date|date)",
+    re.I,
+)
+_YEARS = re.compile(r"(\d{1,2}(?:\.\d)?)\s*(?:\+|plus)?\s*(?:-\s*\d{1,2}\s*)?(?:years?|yrs?)", re.I)
+
+# Degree level -> how it is written (short forms need their dots: "B.E." is a degree, "be" is a verb)
+EDUCATION_LEVELS = (
+    (4, re.compile(r"\b(ph\.?\s?d|doctorate|doctoral)\b", re.I)),
+    (3, re.compile(r"\b(master'?s?|m\.\s?tech|mtech|m\.\s?e\.|m\.\s?sc?\.?|msc|mba|mca|ms(?= in )|post\s?graduate)", re.I)),
+    (2, re.compile(r"\b(bachelor'?s?|b\.\s?tech|btech|b\.\s?e\.|b\.\s?sc?\.?|bsc|bca|bs(?= in )|undergraduate)", re.I)),
+    (1, re.compile(r"\b(diploma|associate'?s?)\b", re.I)),
+    (0, re.compile(r"\b(high school|higher secondary|12th|hsc|ssc)\b", re.I)),
+)
+
+SUBSCORES = ("skills", "experience", "education", "text")
+DEFAULT_WEIGHTS: Dict[str, float] = {"skills": 0.5, "experience": 0.2, "education": 0.1, "text": 0.2}
+# Sub-score when the JD asks for something the resume doesn't state (no dates, no degree)
+UNKNOWN = 0.5
+# BM25 length normalization: terms in a typical resume (parsed JSON or extracted text)
+DEFAULT_AVG_LENGTH = 300.0
+# Without a background, a skill term counts this much more in the text score than any other word
+SKILL_TERM_IDF = 2.0
+
+
+def _alias_key(name: str) -> str:
+    return " ".join(name.lower().strip(" .,;:()[]'\"").split())
+
+
+def normalize_skill(name: str) -> str:
+    """Canonical name of a skill; unknown skills are returned lower-cased so they still match exactly"""
+    key = _alias_key(name)
+    if key in _ALIASES:
+        return _ALIASES[key]
+    # "Python (Django, Flask)", "Docker/Kubernetes": the head is the skill
+    head = _alias_key(re.split(r"[(/,]", key, 1)[0])
+    return _ALIASES.get(head, key)
+
+
+def find_skills(text: str) -> FrozenSet[str]:
+    """Canonical skills mentioned anywhere in free text"""
+    words = []
+    for token in _TOKEN_RE.findall(text or ""):
+        parts = [token] if token.lower() in _ALIASES else [p for p in re.split(r"[/-]", token) if p]
+        words.extend(p.rstrip(".") for p in parts)
+    lower = [w.lower() for w in words]
+    found = set()
+    for n in range(1, _MAX_ALIAS_WORDS + 1):
+        for i in range(len(lower) - n + 1):
+            phrase = " ".join(lower[i:i + n])
+            canonical = _ALIASES.get(phrase)
+            if canonical is None:
+                continue
+            if n == 1 and phrase in _AMBIGUOUS and words[i].islower():
+                continue
+            found.add(canonical)
+    return frozenset(found)
+
+
+def terms(text: str) -> collections.Counter:
+    """Term counts for the text score (lower-cased, skill aliases folded, stopwords dropped)"""
+    counts = collections.Counter()
+    for token in _TOKEN_RE.findall(text or ""):
+        token = token.lower().rstrip(".")
+        if token in _STOPWORDS or token[0].isdigit() or (len(token) == 1 and token not in _ALIASES):
+            continue
+        counts[_ALIASES.get(token, token)] += 1
+    return counts
+
+
+def experience_years(text: str, now: Optional[float] = None) -> Optional[float]:
+    """Years of experience: the larger of any stated "N years" and the union of date ranges"""
+    text = text or ""
+    stated = [float(m.group(1)) for m in _YEARS.finditer(text)]
+    today = time.localtime(now)
+    spans = []
+    for m in _DATE_RANGE.finditer(text):
+        start_month, start_year, end_month, end = m.groups()
+        start = int(start_year) * 12 + (_MONTHS[start_month[:3].lower()] if start_month else 1) - 1
+        if end[0].isdigit():
+            stop = int(end) * 12 + (_MONTHS[end_month[:3].lower()] if end_month else 12)
+        else:
+            stop = today.tm_year * 12 + today.tm_mon
+        if stop > start:
+            spans.append((start, stop))
+    months = 0
+    cursor = None
+    for start, stop in sorted(spans):
+        if cursor is not None and start < cursor:
+            start = cursor
+        if stop > start:
+            months += stop - start
+            cursor = stop
+    from_dates = months / 12 if spans else None
+    candidates = [y for y in stated + ([from_dates] if from_dates is not None else []) if y <= 50]
+    return round(max(candidates), 1) if candidates else None
+
+
+def required_years(text: str) -> Optional[float]:
+    """Minimum years a JD asks for ("3-5 years" -> 3, "5+ yrs" -> 5)"""
+    found = [float(m.group(1)) for m in _YEARS.finditer(text or "")]
+    return min(found) if found else None
+
+
+def education_level(text: str, lowest: bool = False) -> Optional[int]:
+    """Highest degree level mentioned (or the lowest, for a JD's "Bachelor's or Master's")"""
+    levels = [level for level, pattern in EDUCATION_LEVELS if pattern.search(text or "")]
+    if not levels:
+        return None
+    return min(levels) if lowest else max(levels)
+
+
+class Profile:
+    """What the scorer needs from one resume or JD"""
+
+    __slots__ = ("skills", "years", "education", "terms", "length")
+
+    def __init__(self, skills: Iterable[str], years: Optional[float], education: Optional[int], terms: Dict[str, int]):
+        self.skills = frozenset(skills)
+        self.years = years
+        self.education = education
+        self.terms = dict(terms)
+        self.length = sum(self.terms.values())
+
+    def to_dict(self) -> dict:
+        return {"skills": sorted(self.skills), "years": self.years, "education": self.education, "length": self.length}
+
+    def size(self) -> int:
+        return 64 * (len(self.skills) + len(self.terms)) + 128
+
+
+def _flatten(value) -> str:
+    """All the text in a parsed JSON value (values only, not field names), one item per line"""
+    if isinstance(value, dict):
+        return "\n".join(_flatten(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return "\n".join(_flatten(v) for v in value)
+    return "" if value is None else str(value)
+
+
+def _field(data: dict, *names: str):
+    """First present field, matching names case- and separator-insensitively"""
+    keys = {re.sub(r"[\s_-]+", " ", k.lower()).strip(): k for k in data}
+    for name in names:
+        if name in keys:
+            return data[keys[name]]
+    return None
+
+
+def _skill_list(value) -> List[str]:
+    if isinstance(value, str):
+        value = re.split(r"[,;|\n•]", value)
+    if isinstance(value, dict):
+        value = [item for v in value.values() for item in (v if isinstance(v, list) else [v])]
+    return [normalize_skill(str(v)) for v in value or () if str(v).strip()]
+
+
+def resume_profile(resume: Union[dict, str]) -> Profile:
+    """Profile of a parsed resume (resume_data JSON) or of raw resume text"""
+    if isinstance(resume, dict):
+        text = _flatten(resume)
+        listed = _skill_list(_field(resume, "technical skills", "skills"))
+        employment = _flatten(_field(resume, "employment details", "experience", "work experience"))
+        education = _flatten(_field(resume, "education"))
+        return Profile(set(listed) | find_skills(text), experience_years(employment), education_level(education), terms(text))
+    sections = segments_for(resume)
+    employment = section_text(resume, sections, ("experience",)) or resume
+    education = section_text(resume, sections, ("education",)) or resume
+    return Profile(find_skills(resume), experience_years(employment), education_level(education), terms(resume))
+
+
+def jd_profile(jd: Union[dict, str]) -> Profile:
+    """Profile of a parsed JD (jd_data JSON) or of raw JD text; years and education are the minimum asked"""
+    if isinstance(jd, dict):
+        text = _flatten(jd)
+        listed = _skill_list(_field(jd, "required skills", "skills"))
+        skills = listed or find_skills(text)
+        experience = _flatten(_field(jd, "required experience", "experience"))
+        education = _flatten(_field(jd, "required education", "education"))
+        return Profile(skills, required_years(experience), education_level(education, lowest=True), terms(text))
+    return Profile(find_skills(jd), required_years(jd), education_level(jd, lowest=True), terms(jd))
+
+
+def _round(value) -> Optional[float]:
+    return None if value != value else round(float(value), 3)
+
+
+class MatchScore:
+    """Score (0-100), the four sub-scores (0-1, None when not applicable), and which required skills were found"""
+
+    __slots__ = ("score", "subscores", "matched_skills", "missing_skills")
+
+    def __init__(self, score: float, subscores: Dict[str, float], matched_skills: List[str], missing_skills: List[str]):
+        self.score = score
+        self.subscores = subscores
+        self.matched_skills = matched_skills
+        self.missing_skills = missing_skills
+
+    def to_dict(self) -> dict:
+        return {
+            "score": self.score,
+            "subscores": self.subscores,
+            "matched_skills": self.matched_skills,
+            "missing_skills": self.missing_skills,
+            "scorer": "local",
+        }
+
+
+class MatchScorer:
+    """
+    Vectorized scoring of one JD against any number of resumes. Profiles are
+    cached by the digest of the parsed JSON or text they came from.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None, k1: float = 1.2, b: float = 0.75,
+                 cache: Optional[LRUCache] = None, background: Optional[dict] = None):
+        if np is None:
+            raise RuntimeError("numpy and scipy are required for local match scoring")
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        unknown = set(weights) - set(SUBSCORES)
+        if unknown:
+            raise ValueError(f"Unknown match weights: {sorted(unknown)}")
+        total = sum(weights.values())
+        if total <= 0:
+            raise ValueError("Match weights must add up to more than 0")
+        self.weights = {k: weights[k] / total for k in SUBSCORES}
+        self.k1 = k1
+        self.b = b
+        self.profiles = cache or LRUCache(max_bytes=64 * 1024 * 1024, ttl=86400)
+        self._lock = threading.Lock()
+        # Fixed IDF background ({"documents", "df", "avg_length"}); never updated while serving
+        self.background = background
+        self.avg_length = float((background or {}).get("avg_length") or DEFAULT_AVG_LENGTH)
+        self._latencies = collections.deque(maxlen=512)
+        self.counters = collections.Counter()
+
+    # ---- profiles ----
+
+    def profile(self, value: Union[dict, str, Profile], kind: str = "resume") -> Profile:
+        """Profile of a resume or JD (kind "jd"), from the cache when seen before"""
+        if isinstance(value, Profile):
+            return value
+        raw = value if isinstance(value, str) else json.dumps(value, sort_keys=True, default=str)
+        key = f"{kind}:{content_key(raw)}"
+        profile = self.profiles.get(key)
+        if profile is None:
+            profile = jd_profile(value) if kind == "jd" else resume_profile(value)
+            self.profiles.set(key, profile, size=profile.size())
+        return profile
+
+    # ---- scoring ----
+
+    def score(self, resume: Union[dict, str, Profile], jd: Union[dict, str, Profile]) -> MatchScore:
+        """Score one resume against one JD"""
+        return self.score_many(jd, [resume])[0]
+
+    def score_many(self, jd: Union[dict, str, Profile], resumes: Sequence[Union[dict, str, Profile]]) -> List[MatchScore]:
+        """Scores of every resume against one JD, in the order given"""
+        started = time.perf_counter()
+        requirement = self.profile(jd, "jd")
+        profiles = [self.profile(resume) for resume in resumes]
+        scores, subscores = self.score_matrix(requirement, profiles)
+        required = sorted(requirement.skills)
+        results = []
+        for i, profile in enumerate(profiles):
+            matched = [s for s in required if s in profile.skills]
+            results.append(MatchScore(
+                round(float(scores[i]), 1),
+                {name: _round(subscores[name][i]) for name in SUBSCORES},
+                matched,
+                [s for s in required if s not in profile.skills],
+            ))
+        self._record(len(profiles), time.perf_counter() - started)
+        return results
+
+    def score_matrix(self, requirement: Profile, profiles: Sequence[Profile]):
+        """(scores, {sub-score: array}) for profiles against a JD profile, as NumPy arrays"""
+        n = len(profiles)
+        if n == 0:
+            empty = np.zeros(0)
+            return empty, {name: empty for name in SUBSCORES}
+        subscores = {
+            "skills": self._skill_coverage(requirement, profiles),
+            "experience": self._experience(requirement, profiles),
+            "education": self._education(requirement, profiles),
+            "text": self._text_similarity(requirement, profiles),
+        }
+        weights = dict(self.weights)
+        if not requirement.skills:
+            # Nothing to cover: the text score carries the skill weight
+            weights["text"] += weights.pop("skills")
+            subscores["skills"] = np.full(n, np.nan)
+        scores = sum(weights[name] * subscores[name] for name in weights) * 100
+        return np.clip(scores, 0, 100), subscores
+
+    def _skill_coverage(self, requirement: Profile, profiles: Sequence[Profile]) -> np.ndarray:
+        required = {skill: j for j, skill in enumerate(sorted(requirement.skills))}
+        if not required:
+            return np.zeros(len(profiles))
+        rows, cols = [], []
+        for i, profile in enumerate(profiles):
+            for skill in profile.skills:
+                j = required.get(skill)
+                if j is not None:
+                    rows.append(i)
+                    cols.append(j)
+        has = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(profiles), len(required)))
+        return np.asarray(has @ np.ones(len(required))).ravel() / len(required)
+
+    @staticmethod
+    def _experience(requirement: Profile, profiles: Sequence[Profile]) -> np.ndarray:
+        years = np.array([np.nan if p.years is None else p.years for p in profiles], dtype=float)
+        if not requirement.years:
+            return np.ones(len(profiles))
+        return np.where(np.isnan(years), UNKNOWN, np.clip(np.nan_to_num(years) / requirement.years, 0, 1))
+
+    @staticmethod
+    def _education(requirement: Profile, profiles: Sequence[Profile]) -> np.ndarray:
+        levels = np.array([np.nan if p.education is None else p.education for p in profiles], dtype=float)
+        if requirement.education is None:
+            return np.ones(len(profiles))
+        gap = requirement.education - np.nan_to_num(levels)
+        return np.where(np.isnan(levels), UNKNOWN, np.select([gap <= 0, gap == 1], [1.0, 0.5], 0.0))
+
+    def _text_similarity(self, requirement: Profile, profiles: Sequence[Profile]) -> np.ndarray:
+        """Normalized BM25 of each resume for the JD's terms: 1.0 when every JD term is well covered"""
+        n = len(profiles)
+        vocabulary = {term: j for j, term in enumerate(requirement.terms)}
+        if not vocabulary:
+            return np.zeros(n)
+        indptr, indices, counts = [0], [], []
+        for profile in profiles:
+            for term, count in profile.terms.items():
+                j = vocabulary.get(term)
+                if j is not None:
+                    indices.append(j)
+                    counts.append(count)
+            indptr.append(len(indices))
+        tf = sparse.csr_matrix((np.array(counts, dtype=float), np.array(indices, dtype=np.int64), np.array(indptr)),
+                               shape=(n, len(vocabulary)))
+        idf = self.idf(vocabulary)
+        # Length normalized against a constant, so a resume's score doesn't depend on who else is in the batch
+        lengths = np.array([p.length for p in profiles], dtype=float)
+        norm = self.k1 * (1 - self.b + self.b * lengths / self.avg_length)
+        # BM25 term saturation, capped at 1 per term (one mention in an average-length resume)
+        tf.data = np.minimum(1.0, tf.data * (self.k1 + 1) / (tf.data + np.repeat(norm, np.diff(tf.indptr))))
+        return np.asarray(tf @ idf).ravel() / idf.sum()
+
+    def idf(self, vocabulary: Iterable[str]) -> np.ndarray:
+        """Smoothed IDF of each term from the fixed background (built-in: skills SKILL_TERM_IDF, other words 1)"""
+        if self.background is None:
+            return np.array([SKILL_TERM_IDF if term in _SKILL_TERMS else 1.0 for term in vocabulary])
+        df = self.background.get("df", {})
+        documents = self.background.get("documents", 0)
+        return np.array([np.log((documents + 1) / (df.get(term, 0) + 1)) + 1 for term in vocabulary])
+
+    # ---- stats ----
+
+    def _record(self, n: int, elapsed: float):
+        with self._lock:
+            self.counters["calls"] += 1
+            self.counters["resumes_scored"] += n
+            self._latencies.append(elapsed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            latencies = list(self._latencies)
+        return {
+            "weights": self.weights,
+            "counters": counters,
+            "idf_documents": (self.background or {}).get("documents", 0),
+            "avg_length": self.avg_length,
+            "profiles": self.profiles.stats(),
+            "latency_ms": {p: round(percentile(latencies, q) * 1000, 3) for p, q in (("p50", 50), ("p95", 95), ("p99", 99))},
+        }
+
+
+def idf_background(resumes: Iterable[Union[dict, str]], path: Optional[str] = None) -> dict:
+    """
+    Document frequencies and average length of a sample of resumes (parsed JSON or text),
+    written to `path` as JSON when given; point MATCH_IDF_PATH at it
+    """
+    df = collections.Counter()
+    documents = length = 0
+    for resume in resumes:
+        profile = resume_profile(resume)
+        df.update(profile.terms.keys())
+        documents += 1
+        length += profile.length
+    background = {"documents": documents, "df": dict(df), "avg_length": length / documents if documents else None}
+    if path:
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(background, fh)
+    return background
+
+
+def scorer_from_env() -> MatchScorer:
+    """Build a MatchScorer from MATCH_WEIGHTS and MATCH_IDF_PATH"""
+    weights = os.getenv("MATCH_WEIGHTS")
+    path = os.getenv("MATCH_IDF_PATH")
+    background = None
+    if path:
+        with open(path, encoding="utf-8") as fh:
+            background = json.load(fh)
+    return MatchScorer(json.loads(weights) if weights else None, background=background)
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_scorer() -> MatchScorer:
+    """Process-wide match scorer, created once from the environment"""
+    with _shared_lock:
+        if "scorer" not in _shared:
+            _shared["scorer"] = scorer_from_env()
+        return _shared["scorer"]
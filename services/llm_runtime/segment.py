@@ -0,0 +1,180 @@
+"""
+Rule-based resume segmentation.
+
+segment() splits resume text into typed sections with character offsets:
+
+    contact, summary, experience, projects, skills, education, certifications, other
+
+Headings are recognised from a synonym table ("Work History", "TECHNICAL
+SKILLS:", "Academic Background", ...) and, failing that, from short all-caps
+lines; text before the first heading is the contact block. It is a single pass
+over the lines with no model calls, so it runs on every document when it
+enters the store and the result is kept with it.
+
+Consumers then take only what they need: focus(text, types) keeps the listed
+section types (falling back to the whole text when the resume has no
+recognisable structure), and technical_highlights() scans only experience,
+projects and skills lines.
+"""
+import re
+from typing import Dict, Iterable, List, Optional
+
+from .cache import LRUCache
+from .keys import content_key
+
+SECTION_TYPES = ("contact", "summary", "experience", "projects", "skills", "education", "certifications", "other")
+# Everything a resume parser needs (interests, references, declarations etc. are not)
+PARSE_SECTIONS = SECTION_TYPES[:-1]
+
+SYNONYMS: Dict[str, tuple] = {
+    "contact": ("contact", "contact information", "contact details", "personal details", "personal information"),
+    "summary": ("summary", "professional summary", "profile", "professional profile", "objective", "career objective",
+                "about", "about me", "overview"),
+    "experience": ("experience", "work experience", "professional experience", "employment", "employment history",
+                   "work history", "career history", "internships", "internship", "internship experience",
+                   "relevant experience", "positions of responsibility"),
+    "projects": ("projects", "personal projects", "academic projects", "key projects", "selected projects",
+                 "side projects", "open source", "open source contributions"),
+    "skills": ("skills", "technical skills", "core competencies", "key skills", "technologies", "tech stack",
+               "tools", "tools and technologies", "technical expertise", "programming languages", "skills and tools"),
+    "education": ("education", "academic background", "academics", "academic qualifications", "qualifications",
+                  "educational qualifications", "coursework", "relevant coursework"),
+    "certifications": ("certifications", "certificates", "licenses", "licenses and certifications", "courses",
+                       "awards", "achievements", "honors", "honours", "publications"),
+    "other": ("interests", "hobbies", "languages", "references", "declaration", "activities",
+              "extracurricular activities", "volunteering", "volunteer experience", "additional information"),
+}
+# Heading (lower-case, punctuation stripped, "&" spelled "and") -> section type
+HEADINGS: Dict[str, str] = {name: kind for kind, names in SYNONYMS.items() for name in names}
+
+# Headings we don't know but that look like one still start a new (other) section
+_LOOSE_HEADING = re.compile(r"^[A-Z][A-Z &/,-]{2,38}:?$")
+# JSON keys and the like are never headings (a serialized resume is not segmented)
+_NOT_HEADING = re.compile(r"[\"{}\[\]<>=|]")
+_CONTACT_HINT = re.compile(r"@|\+?\d[\d ()-]{7,}\d|linkedin\.com|github\.com", re.I)
+
+
+class Section:
+    """One typed span of the text: text[start:end]"""
+
+    __slots__ = ("type", "heading", "start", "end")
+
+    def __init__(self, type: str, heading: str, start: int, end: int):
+        self.type = type
+        self.heading = heading
+        self.start = start
+        self.end = end
+
+    def to_dict(self) -> dict:
+        return {"type": self.type, "heading": self.heading, "start": self.start, "end": self.end}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Section":
+        return cls(data["type"], data.get("heading", ""), data["start"], data["end"])
+
+    def __repr__(self):
+        return f"Section({self.type!r}, {self.heading!r}, {self.start}, {self.end})"
+
+
+def heading_type(line: str) -> Optional[str]:
+    """Section type if the line is a heading"""
+    if _NOT_HEADING.search(line):
+        return None
+    name = re.sub(r"[^a-z& ]+", " ", line.lower()).replace("&", "and")
+    name = " ".join(name.split())
+    if not name or len(name) > 40:
+        return None
+    if name in HEADINGS:
+        return HEADINGS[name]
+    stripped = line.strip()
+    if _LOOSE_HEADING.match(stripped) and len(name.split()) <= 4:
+        return "other"
+    return None
+
+
+def segment(text: str) -> List[Section]:
+    """Typed sections of a resume in document order, covering text[0:len(text)]"""
+    sections: List[Section] = []
+    current_type, current_heading, current_start = "contact", "", 0
+    offset = 0
+    first_line = True
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        kind = heading_type(stripped) if stripped else None
+        # The first line of a resume is usually the candidate's name, even in capitals
+        if kind == "other" and first_line:
+            kind = None
+        if kind is not None:
+            if offset > current_start:
+                sections.append(Section(current_type, current_heading, current_start, offset))
+            current_type, current_heading, current_start = kind, stripped.rstrip(":"), offset
+        if stripped:
+            first_line = False
+        offset += len(line)
+    if offset > current_start:
+        sections.append(Section(current_type, current_heading, current_start, offset))
+    return [s for s in sections if text[s.start:s.end].strip()]
+
+
+def recognised(sections: Iterable[Section]) -> bool:
+    """True when segmentation found real structure (at least two known non-contact sections)"""
+    types = {s.type for s in sections} - {"contact", "other"}
+    return len(types) >= 2
+
+
+def section_text(text: str, sections: Iterable[Section], types: Iterable[str]) -> str:
+    """Text of the sections of the given types, in document order"""
+    wanted = set(types)
+    return "\n".join(text[s.start:s.end].strip() for s in sections if s.type in wanted)
+
+
+_segments = LRUCache(max_bytes=8 * 1024 * 1024, ttl=86400)
+
+
+def remember(text: str, sections: List[Section]):
+    """Seed the segment cache (the document store does this for every document it extracts)"""
+    _segments.set(content_key(text), sections, size=64 * len(sections) + 64)
+
+
+def segments_for(text: str) -> List[Section]:
+    """segment(), cached by the text's digest"""
+    key = content_key(text)
+    sections = _segments.get(key)
+    if sections is None:
+        sections = segment(text)
+        _segments.set(key, sections, size=64 * len(sections) + 64)
+    return sections
+
+
+def focus(text: str, types: Iterable[str]) -> str:
+    """Only the listed section types of a resume, or all of it when it has no recognisable sections"""
+    if not text:
+        return text
+    sections = segments_for(text)
+    if not recognised(sections):
+        return text
+    return section_text(text, sections, types) or text
+
+
+def technical_highlights(text: str, keywords: Iterable[str], exclude: Iterable[str] = (), limit: int = 5) -> List[str]:
+    """Lines from experience, projects and skills that mention a keyword (and none of `exclude`)"""
+    sections = segments_for(text)
+    if recognised(sections):
+        text = section_text(text, sections, ("experience", "projects", "skills"))
+    keywords = tuple(keywords)
+    exclude = tuple(exclude)
+    highlights = []
+    for line in text.splitlines():
+        line = line.strip("• ").strip()
+        if not line or _CONTACT_HINT.search(line) or heading_type(line):
+            continue
+        lw = line.lower()
+        if any(k in lw for k in keywords) and not any(nt in lw for nt in exclude):
+            highlights.append(line)
+            if len(highlights) == limit:
+                break
+    return highlights
+
+
+def segment_stats() -> dict:
+    return _segments.stats()
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Tuple
+
+
+class _Call:
+    __slots__ = ("future", "followers")
+
+    def __init__(self):
+        self.future = Future()
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller (the leader)
+    does the work, everyone who arrives while it is in flight waits for the
+    same result. Sync (threads) and async callers can share one flight.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def _join(self, key: str) -> Tuple[_Call, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.followers += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            self.leaders += 1
+            return call, True
+
+    def _settle(self, key: str, call: _Call, result=None, exc: BaseException = None):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        if exc is not None:
+            call.future.set_exception(exc)
+        else:
+            call.future.set_result(result)
+
+    def do(self, key: str, fn: Callable):
+        """Run fn() once per key at a time; concurrent callers block for the leader's result"""
+        call, leader = self._join(key)
+        if not leader:
+            return call.future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._settle(key, call, exc=e)
+            raise
+        self._settle(key, call, result=result)
+        return result
+
+    async def ado(self, key: str, coro_fn: Callable[[], Awaitable]):
+        """Async do(): the leader's work runs as its own task, so one cancelled caller doesn't cancel the rest"""
+        call, leader = self._join(key)
+        if leader:
+            task = asyncio.ensure_future(coro_fn())
+            task.add_done_callback(lambda t: self._finish(key, call, t))
+        return await asyncio.shield(asyncio.wrap_future(call.future))
+
+    def _finish(self, key: str, call: _Call, task: asyncio.Task):
+        if task.cancelled():
+            self._settle(key, call, exc=asyncio.CancelledError())
+        elif task.exception() is not None:
+            self._settle(key, call, exc=task.exception())
+        else:
+            self._settle(key, call, result=task.result())
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = len(self._calls)
+        return {"in_flight": in_flight, "leaders": self.leaders, "coalesced": self.followers}
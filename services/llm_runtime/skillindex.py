@@ -0,0 +1,618 @@
+"""
+Boolean candidate search over parsed resumes.
+
+SkillIndex maps every normalized skill (scoring.normalize_skill, so "k8s" and
+"Kubernetes" are one term) and seniority word from job titles ("junior",
+"senior", "lead", ...) to a compressed bitmap of candidate IDs, and keeps each
+candidate's years of experience. Queries combine terms with AND / OR / NOT,
+parentheses and years>=N:
+
+    python AND kafka AND NOT junior
+    (react OR vue) AND "machine learning" AND years>=3
+
+Bitmaps are roaring-style: IDs are split by their high 16 bits into
+containers, each either a sorted uint16 array (up to 4096 IDs) or a 65536-bit
+bitmap, and set operations run container by container in NumPy.
+
+Storage is a directory: candidates.sqlite holds one row per candidate (key,
+terms, years, change sequence) and is the source of truth, shared by every
+process; index.bin is a snapshot of all bitmaps, memory-mapped and read
+lazily per term, so startup reads only its header. Rows changed since the
+snapshot are replayed on open and before each search, and the snapshot is
+rewritten every SKILL_INDEX_COMPACT_EVERY changes.
+
+Configured from the environment:
+    SKILL_INDEX_PATH            directory (default: <tmp>/skill-index)
+    SKILL_INDEX_COMPACT_EVERY   changes between snapshots (default 50000)
+"""
+import collections
+import json
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # only the services that search need it
+    np = None
+
+from .scheduler import percentile
+from .scoring import normalize_skill, resume_profile
+from .segment import section_text, segments_for
+
+# ---- compressed bitmaps ----
+
+ARRAY_MAX = 4096
+BITMAP_WORDS = 1024  # 65536 bits per container
+
+
+def _is_bitmap(container) -> bool:
+    return container.dtype == np.uint64
+
+
+def _popcount(container) -> int:
+    if not _is_bitmap(container):
+        return len(container)
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(container).sum())
+    return int(np.unpackbits(container.view(np.uint8)).sum())
+
+
+def _to_bitmap(container):
+    if _is_bitmap(container):
+        return container
+    bits = np.zeros(BITMAP_WORDS, dtype=np.uint64)
+    np.bitwise_or.at(bits, container >> 6, np.left_shift(np.uint64(1), (container & 63).astype(np.uint64)))
+    return bits
+
+
+def _to_array(bits):
+    return np.flatnonzero(np.unpackbits(bits.view(np.uint8), bitorder="little")).astype(np.uint16)
+
+
+def _test(bits, values):
+    """Which of values are set in a bitmap container"""
+    return ((bits[values >> 6] >> (values & 63).astype(np.uint64)) & np.uint64(1)) != 0
+
+
+def _compact(container):
+    """Smallest representation of a container, or None when it is empty"""
+    count = _popcount(container)
+    if count == 0:
+        return None
+    if _is_bitmap(container):
+        return _to_array(container) if count <= ARRAY_MAX else container
+    return _to_bitmap(container) if count > ARRAY_MAX else container
+
+
+def _and(a, b):
+    if _is_bitmap(a) and _is_bitmap(b):
+        return a & b
+    if _is_bitmap(a):
+        a, b = b, a
+    if _is_bitmap(b):
+        return a[_test(b, a)]
+    return np.intersect1d(a, b, assume_unique=True)
+
+
+def _or(a, b):
+    if _is_bitmap(a) or _is_bitmap(b):
+        return _to_bitmap(a) | _to_bitmap(b)
+    return np.union1d(a, b).astype(np.uint16)
+
+
+def _andnot(a, b):
+    if _is_bitmap(a):
+        return a & ~_to_bitmap(b)
+    if _is_bitmap(b):
+        return a[~_test(b, a)]
+    return np.setdiff1d(a, b, assume_unique=True)
+
+
+class Bitmap:
+    """Immutable compressed set of uint32 IDs; operations return new bitmaps"""
+
+    __slots__ = ("containers",)
+
+    def __init__(self, containers: Optional[Dict[int, "np.ndarray"]] = None):
+        self.containers = containers or {}
+
+    @classmethod
+    def from_ids(cls, ids) -> "Bitmap":
+        ids = np.unique(np.asarray(ids, dtype=np.uint32))
+        containers = {}
+        if len(ids):
+            for chunk in np.split(ids, np.flatnonzero(np.diff(ids >> 16)) + 1):
+                containers[int(chunk[0] >> 16)] = _compact((chunk & 0xFFFF).astype(np.uint16))
+        return cls(containers)
+
+    @classmethod
+    def from_mask(cls, mask) -> "Bitmap":
+        """IDs where a boolean array is true, packed 65536 at a time without listing them"""
+        mask = np.asarray(mask, dtype=bool)
+        padded = np.zeros(-(-len(mask) // 65536) * 65536, dtype=bool)
+        padded[:len(mask)] = mask
+        words = np.packbits(padded, bitorder="little").view("<u8").reshape(-1, BITMAP_WORDS)
+        containers = {}
+        for key in np.flatnonzero(words.any(axis=1)):
+            container = _compact(words[key].copy())
+            if container is not None:
+                containers[int(key)] = container
+        return cls(containers)
+
+    def to_ids(self) -> "np.ndarray":
+        parts = []
+        for key in sorted(self.containers):
+            container = self.containers[key]
+            low = _to_array(container) if _is_bitmap(container) else container
+            parts.append((np.uint32(key) << np.uint32(16)) | low.astype(np.uint32))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint32)
+
+    def __len__(self) -> int:
+        return sum(_popcount(c) for c in self.containers.values())
+
+    def __bool__(self) -> bool:
+        return bool(self.containers)
+
+    def __contains__(self, id: int) -> bool:
+        container = self.containers.get(id >> 16)
+        if container is None:
+            return False
+        low = np.uint16(id & 0xFFFF)
+        if _is_bitmap(container):
+            return bool(_test(container, np.array([low]))[0])
+        i = np.searchsorted(container, low)
+        return i < len(container) and container[i] == low
+
+    def _combine(self, other: "Bitmap", op, keys) -> "Bitmap":
+        containers = {}
+        for key in keys:
+            a, b = self.containers.get(key), other.containers.get(key)
+            if a is None:  # OR only
+                result = b
+            elif b is None:  # OR, or nothing to subtract
+                result = a
+            else:
+                result = _compact(op(a, b))
+            if result is not None:
+                containers[key] = result
+        return Bitmap(containers)
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        return self._combine(other, _and, self.containers.keys() & other.containers.keys())
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        return self._combine(other, _or, self.containers.keys() | other.containers.keys())
+
+    def __sub__(self, other: "Bitmap") -> "Bitmap":
+        return self._combine(other, _andnot, self.containers.keys())
+
+    def nbytes(self) -> int:
+        return sum(c.nbytes for c in self.containers.values())
+
+
+# ---- snapshot file ----
+
+_MAGIC = b"SKIDX001"
+_FOOTER = struct.Struct("<QQ8s")  # header offset, header length, magic
+_DIRECTORY = [("key", "<u4"), ("kind", "<u4"), ("count", "<u8"), ("offset", "<u8")]
+
+
+class _SnapshotWriter:
+    def __init__(self, fh):
+        self.fh = fh
+        self.pos = 0
+        self.write_bytes(_MAGIC)
+
+    def write_bytes(self, data: bytes) -> int:
+        pad = -self.pos % 8
+        if pad:
+            self.fh.write(b"\0" * pad)
+            self.pos += pad
+        offset = self.pos
+        self.fh.write(data)
+        self.pos += len(data)
+        return offset
+
+    def write_bitmap(self, bitmap: Bitmap) -> List[int]:
+        """[directory offset, containers]"""
+        directory = np.zeros(len(bitmap.containers), dtype=_DIRECTORY)
+        for i, key in enumerate(sorted(bitmap.containers)):
+            container = bitmap.containers[key]
+            kind = int(_is_bitmap(container))
+            data = container.astype("<u8" if kind else "<u2").tobytes()
+            directory[i] = (key, kind, len(container), self.write_bytes(data))
+        return [self.write_bytes(directory.tobytes()), len(directory)]
+
+
+def _read_bitmap(buffer, offset: int, count: int) -> Bitmap:
+    directory = np.frombuffer(buffer, dtype=_DIRECTORY, count=count, offset=offset)
+    containers = {}
+    for key, kind, length, data in directory:
+        containers[int(key)] = np.frombuffer(buffer, dtype="<u8" if kind else "<u2", count=int(length), offset=int(data))
+    return Bitmap(containers)
+
+
+# ---- queries ----
+
+_QUERY_TOKEN = re.compile(r'\(|\)|"[^"]*"|years?\s*>=\s*\d+(?:\.\d+)?|[^\s()"]+', re.I)
+_YEARS_ATOM = re.compile(r"years?\s*>=\s*(\d+(?:\.\d+)?)", re.I)
+_OPERATORS = ("AND", "OR", "NOT")
+
+# Seniority words indexed from job titles
+TITLE_TERMS = ("intern", "trainee", "fresher", "junior", "associate", "mid", "senior", "staff", "principal",
+               "lead", "manager", "director", "head", "architect", "consultant")
+_TITLE_TERM = re.compile(r"\b(" + "|".join(TITLE_TERMS) + r")\b", re.I)
+_TITLE_FIELDS = ("title", "role", "position", "designation", "job title")
+
+
+class QueryError(ValueError):
+    """A search query that doesn't parse"""
+
+
+def parse_query(query: str):
+    """
+    Query string -> nested tuples: ("and", a, b), ("or", a, b), ("not", a),
+    ("term", name) or ("years", n). Adjacent words without an operator are one
+    multi-word term ("machine learning"). Operators match in any case ("python and
+    kafka"), so a term containing one of those words has to be quoted.
+    """
+    tokens = [t.upper() if t.upper() in _OPERATORS else t for t in _QUERY_TOKEN.findall(query or "")]
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def expression():
+        node = conjunction()
+        while peek() == "OR":
+            take()
+            node = ("or", node, conjunction())
+        return node
+
+    def conjunction():
+        node = factor()
+        while peek() == "AND":
+            take()
+            node = ("and", node, factor())
+        return node
+
+    def factor():
+        token = peek()
+        if token is None:
+            raise QueryError("Query ended where a term was expected")
+        if token == "NOT":
+            take()
+            return ("not", factor())
+        if token == "(":
+            take()
+            node = expression()
+            if peek() != ")":
+                raise QueryError("Missing closing parenthesis")
+            take()
+            return node
+        if token in _OPERATORS or token == ")":
+            raise QueryError(f"Unexpected {token!r}")
+        match = _YEARS_ATOM.fullmatch(token)
+        if match:
+            take()
+            return ("years", float(match.group(1)))
+        if token.startswith('"'):
+            take()
+            return ("term", token.strip('"'))
+        words = [take()]
+        while peek() is not None and peek() not in _OPERATORS and peek() not in ("(", ")") and not peek().startswith('"'):
+            words.append(take())
+        return ("term", " ".join(words))
+
+    node = expression()
+    if position != len(tokens):
+        raise QueryError(f"Unexpected {tokens[position]!r}")
+    return node
+
+
+def resume_terms(resume: Union[dict, str]) -> Tuple[List[str], Optional[float]]:
+    """(index terms, years of experience) of a parsed resume or resume text"""
+    profile = resume_profile(resume)
+    titles = ""
+    if isinstance(resume, dict):
+        employment = next((v for k, v in resume.items() if k.lower() in ("employment details", "experience", "work experience")), None)
+        for job in employment if isinstance(employment, list) else [employment]:
+            if isinstance(job, dict):
+                titles += " ".join(str(v) for k, v in job.items() if k.lower() in _TITLE_FIELDS) + "\n"
+            elif isinstance(job, str):
+                titles += job.splitlines()[0] + "\n" if job.strip() else ""
+    else:
+        titles = section_text(resume, segments_for(resume), ("experience",)) or resume
+    seniority = {m.group(1).lower() for m in _TITLE_TERM.finditer(titles)}
+    return sorted(profile.skills | seniority), profile.years
+
+
+class SearchResult:
+    """Matching candidate keys for one page, the total count, and how long the search took"""
+
+    __slots__ = ("total", "candidates", "elapsed")
+
+    def __init__(self, total: int, candidates: List[dict], elapsed: float):
+        self.total = total
+        self.candidates = candidates
+        self.elapsed = elapsed
+
+    def to_dict(self) -> dict:
+        return {"total": self.total, "candidates": self.candidates, "elapsed_ms": round(self.elapsed * 1000, 3)}
+
+
+class SkillIndex:
+    """Skill -> candidate bitmaps backed by a SQLite change log and a memory-mapped snapshot"""
+
+    def __init__(self, path: str, compact_every: int = 50_000):
+        if np is None:
+            raise RuntimeError("numpy is required for the skill index")
+        self.path = path
+        self.compact_every = compact_every
+        os.makedirs(path, exist_ok=True)
+        self.db_path = os.path.join(path, "candidates.sqlite")
+        self.snapshot_path = os.path.join(path, "index.bin")
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._terms: Dict[str, Bitmap] = {}
+        self._directory: Dict[str, List[int]] = {}
+        self._buffer = None
+        self.live = Bitmap()
+        self.years = np.full(0, np.nan, dtype=np.float32)
+        self._seq = 0
+        self._snapshot_seq = 0
+        self._pending = 0  # changes applied since the snapshot
+        self._latencies = collections.deque(maxlen=512)
+        self.counters = collections.Counter()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS candidates ("
+            " id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, terms TEXT, years REAL,"
+            " seq INTEGER NOT NULL, updated REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS candidates_seq ON candidates (seq)")
+        self._open_snapshot()
+        self.refresh()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---- snapshot ----
+
+    def _open_snapshot(self):
+        """Map index.bin and read its header; term bitmaps are read on first use"""
+        with self._lock:
+            self._terms = {}
+            self._directory = {}
+            self.live = Bitmap()
+            self.years = np.full(0, np.nan, dtype=np.float32)
+            self._seq = self._snapshot_seq = 0
+            self._pending = 0
+            try:
+                with open(self.snapshot_path, "rb") as fh:
+                    buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except (FileNotFoundError, ValueError):
+                return
+            header_offset, header_length, magic = _FOOTER.unpack_from(buffer, len(buffer) - _FOOTER.size)
+            if magic != _MAGIC:
+                return
+            header = json.loads(bytes(buffer[header_offset:header_offset + header_length]))
+            self._buffer = buffer
+            self._directory = header["terms"]
+            self.live = _read_bitmap(buffer, *header["live"])
+            offset, count = header["years"]
+            self.years = np.frombuffer(buffer, dtype="<f4", count=count, offset=offset).copy()
+            self._seq = self._snapshot_seq = header["seq"]
+
+    def _term(self, term: str) -> Bitmap:
+        bitmap = self._terms.get(term)
+        if bitmap is None:
+            entry = self._directory.get(term)
+            bitmap = _read_bitmap(self._buffer, *entry) if entry else Bitmap()
+            self._terms[term] = bitmap
+        return bitmap
+
+    def compact(self):
+        """Write every bitmap to a new snapshot and map it"""
+        with self._lock:
+            self.refresh()
+            terms = {term: self._term(term) for term in set(self._directory) | set(self._terms)}
+            tmp = f"{self.snapshot_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as fh:
+                writer = _SnapshotWriter(fh)
+                header = {
+                    "seq": self._seq,
+                    "live": writer.write_bitmap(self.live),
+                    "years": [writer.write_bytes(self.years.astype("<f4").tobytes()), len(self.years)],
+                    "terms": {term: writer.write_bitmap(bitmap) for term, bitmap in terms.items() if bitmap},
+                }
+                data = json.dumps(header).encode("utf-8")
+                offset = writer.write_bytes(data)
+                fh.write(_FOOTER.pack(offset, len(data), _MAGIC))
+            os.replace(tmp, self.snapshot_path)
+            self.counters["compactions"] += 1
+            self._open_snapshot()
+            self.refresh()
+
+    # ---- updates ----
+
+    def refresh(self):
+        """Apply candidate rows changed since this process last looked (by any process)"""
+        rows = self._conn().execute(
+            "SELECT id, terms, years, seq FROM candidates WHERE seq > ? ORDER BY seq", (self._seq,)
+        ).fetchall()
+        if rows:
+            self._apply(rows)
+
+    def _apply(self, rows: List[tuple]):
+        with self._lock:
+            rows = [row for row in rows if row[3] > self._seq]
+            if not rows:
+                return
+            changed = [row[0] for row in rows if row[0] in self.live]
+            if changed:
+                # Re-indexed or removed: take the old IDs out of every term first
+                stale = Bitmap.from_ids(changed)
+                for term in set(self._directory) | set(self._terms):
+                    bitmap = self._term(term)
+                    if bitmap & stale:
+                        self._terms[term] = bitmap - stale
+                self.live = self.live - stale
+            added = collections.defaultdict(list)
+            alive = []
+            top = max(row[0] for row in rows)
+            if top >= len(self.years):
+                years = np.full(max(top + 1, 2 * len(self.years)), np.nan, dtype=np.float32)
+                years[:len(self.years)] = self.years
+                self.years = years
+            for id, terms, years, seq in rows:
+                if terms is None:
+                    continue
+                alive.append(id)
+                self.years[id] = np.nan if years is None else years
+                for term in json.loads(terms):
+                    added[term].append(id)
+            for term, ids in added.items():
+                self._terms[term] = self._term(term) | Bitmap.from_ids(ids)
+            if alive:
+                self.live = self.live | Bitmap.from_ids(alive)
+            self._seq = max(row[3] for row in rows)
+            self._pending += len(rows)
+            self.counters["changes_applied"] += len(rows)
+
+    def _write(self, entries: Iterable[Tuple[str, Optional[List[str]], Optional[float]]]):
+        """Upsert (key, terms, years) rows; terms None marks the candidate removed"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM candidates").fetchone()[0]
+            for key, terms, years in entries:
+                seq += 1
+                conn.execute(
+                    "INSERT INTO candidates (key, terms, years, seq, updated) VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET terms = excluded.terms, years = excluded.years,"
+                    " seq = excluded.seq, updated = excluded.updated",
+                    (key, None if terms is None else json.dumps(terms), years, seq, now),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.refresh()
+        if self._pending >= self.compact_every:
+            self.compact()
+
+    def add(self, key: str, resume: Union[dict, str]):
+        """Index (or re-index) one candidate from a parsed resume or resume text"""
+        self.add_many([(key, resume)])
+
+    def add_many(self, items: Iterable[Tuple[str, Union[dict, str]]]):
+        """Index many candidates in one transaction"""
+        entries = []
+        for key, resume in items:
+            terms, years = resume_terms(resume)
+            entries.append((key, terms, years))
+        if entries:
+            self._write(entries)
+            self.counters["indexed"] += len(entries)
+
+    def remove(self, key: str):
+        self._write([(key, None, None)])
+
+    # ---- search ----
+
+    def _evaluate(self, node) -> Bitmap:
+        kind = node[0]
+        if kind == "and":
+            return self._evaluate(node[1]) & self._evaluate(node[2])
+        if kind == "or":
+            return self._evaluate(node[1]) | self._evaluate(node[2])
+        if kind == "not":
+            return self.live - self._evaluate(node[1])
+        if kind == "years":
+            return Bitmap.from_mask(self.years >= node[1]) & self.live
+        term = node[1].lower()
+        return self._term(term if term in TITLE_TERMS else normalize_skill(term))
+
+    def search(self, query: str, min_years: Optional[float] = None, limit: int = 50, offset: int = 0) -> SearchResult:
+        """Candidates matching a boolean query, in ID (indexing) order"""
+        started = time.perf_counter()
+        tree = parse_query(query)
+        self.refresh()
+        with self._lock:
+            ids = self._evaluate(tree).to_ids()
+            if min_years is not None:
+                ids = ids[self.years[ids] >= min_years]
+            page = ids[offset:offset + limit]
+            years = self.years[page] if len(page) else []
+        keys = {}
+        if len(page):
+            marks = ",".join("?" * len(page))
+            keys = dict(self._conn().execute(f"SELECT id, key FROM candidates WHERE id IN ({marks})",
+                                             [int(id) for id in page]).fetchall())
+        candidates = [
+            {"key": keys.get(int(id)), "years": None if np.isnan(y) else round(float(y), 1)}
+            for id, y in zip(page, years)
+        ]
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.counters["searches"] += 1
+            self._latencies.append(elapsed)
+        return SearchResult(len(ids), candidates, elapsed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            latencies = list(self._latencies)
+            loaded = sum(b.nbytes() for b in self._terms.values())
+            return {
+                "path": self.path,
+                "candidates": len(self.live),
+                "terms": len(set(self._directory) | set(self._terms)),
+                "terms_loaded": len(self._terms),
+                "loaded_bytes": loaded,
+                "seq": self._seq,
+                "snapshot_seq": self._snapshot_seq,
+                "pending_changes": self._pending,
+                "counters": counters,
+                "latency_ms": {p: round(percentile(latencies, q) * 1000, 3) for p, q in (("p50", 50), ("p95", 95), ("p99", 99))},
+            }
+
+
+def skill_index_from_env() -> SkillIndex:
+    """Build a SkillIndex from the SKILL_INDEX_* variables"""
+    return SkillIndex(
+        os.getenv("SKILL_INDEX_PATH", os.path.join(tempfile.gettempdir(), "skill-index")),
+        compact_every=int(os.getenv("SKILL_INDEX_COMPACT_EVERY", 50_000)),
+    )
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_skill_index() -> SkillIndex:
+    """Process-wide skill index, created once from the environment"""
+    with _shared_lock:
+        if "index" not in _shared:
+            _shared["index"] = skill_index_from_env()
+        return _shared["index"]
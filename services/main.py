@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
+from llm_runtime import runtime_stats, segment_stats, shared_docstore, shared_fetcher, shared_pdf_extractor, shared_skill_index
 
 # Import routers from each service
 from evaluation_service.main import router as evaluation_router
@@ -28,11 +29,36 @@ app.include_router(evaluation_router, prefix="/evaluate", tags=["evaluation"])
 app.include_router(test_generation_router, prefix="/generate-test", tags=["test-generation"])
 app.include_router(resume_jd_matcher_router, prefix="/resume-jd", tags=["resume-jd-matcher"])
 
+@app.on_event("startup")
+def warm_pdf_workers():
+    """Start the PDF extraction processes before the first upload arrives"""
+    shared_pdf_extractor().start()
+
+@app.on_event("shutdown")
+def stop_pdf_workers():
+    shared_pdf_extractor().close()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint for the unified service"""
     return {"status": "healthy"}
 
+@app.get("/llm-stats")
+async def llm_stats():
+    """Key scheduler state for every router's LLM runtime"""
+    return runtime_stats()
+
+@app.get("/ingest-stats")
+async def ingest_stats():
+    """URL fetcher, PDF extraction pool, document store, resume segment cache and skill index stats"""
+    return {
+        "fetcher": shared_fetcher().stats(),
+        "pdf": shared_pdf_extractor().stats(),
+        "documents": shared_docstore().stats(),
+        "segments": segment_stats(),
+        "skill_index": shared_skill_index().stats(),
+    }
+
 @app.get("/")
 @app.head("/")
 async def root():
@@ -44,11 +70,16 @@ async def root():
         "endpoints": {
             "POST /evaluate/evaluate": "Evaluate technical assessments",
             "POST /generate-test/generate-test": "Generate mock test questions",
+            "POST /generate-test/generate-test/stream": "Generate mock test questions as server-sent events",
             "GET /generate-test/config": "Get test configuration options",
-            "POST /resume-jd/parse-and-match": "Parse resume+JD URLs and get match score (single API call)",
+            "POST /resume-jd/parse-and-match": "Parse resume+JD URLs and get match score (cached parse/match stages)",
             "POST /resume-jd/resume": "Parse resume from URL",
             "POST /resume-jd/jd": "Parse job description from URL", 
-            "POST /resume-jd/match": "Match resume and JD",
+            "POST /resume-jd/match": "Match resume and JD (local score; explain=true adds LLM strengths and gaps)",
+            "POST /resume-jd/search": "Boolean skill search over parsed resumes (python AND kafka AND NOT junior)",
+            "POST /resume-jd/rank": "Rank cached or listed resumes against one JD (top_k explained by the LLM)",
+            "GET /llm-stats": "LLM key scheduler stats",
+            "GET /ingest-stats": "URL fetcher, PDF extraction and document store stats",
             "GET /health": "Health check"
         }
     }
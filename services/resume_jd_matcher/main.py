@@ -1,9 +1,21 @@
 from fastapi import FastAPI, APIRouter, HTTPException
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from typing import List, Optional
 import os
-import google.generativeai as genai
-from .matcher_utils import fetch_content_from_url, parse_and_match_resume_jd, resume_cache, jd_cache
+from llm_runtime import QueryError
+from .matcher_utils import (
+    ajd_data,
+    amatch_score,
+    aresume_data,
+    cached_resumes,
+    fetch_document,
+    fetch_documents,
+    parse_and_match_documents,
+    rank_resumes,
+    resume_candidates,
+    search_candidates,
+)
 
 router = APIRouter()
 
@@ -13,6 +25,7 @@ load_dotenv()
 class MatchRequest(BaseModel):
     resume_json: dict
     jd_json: dict
+    explain: bool = False  # also ask the LLM for strengths and gaps
 
 class URLRequest(BaseModel):
     url: str
@@ -21,6 +34,20 @@ class ParseAndMatchRequest(BaseModel):
     resume_url: str
     jd_url: str
 
+class SearchRequest(BaseModel):
+    query: str  # e.g. python AND kafka AND NOT junior
+    min_years: Optional[float] = None
+    limit: int = 50
+    offset: int = 0
+
+class RankRequest(BaseModel):
+    jd_url: Optional[str] = None
+    jd_json: Optional[dict] = None
+    resume_urls: Optional[List[str]] = None  # default: every cached resume parse
+    top_k: int = 10  # how many of the best matches the LLM explains
+    page: int = 1
+    page_size: int = 50
+
 @router.get("/")
 def home():
     return {"status": "service running"}
@@ -29,16 +56,14 @@ def home():
 async def parse_and_match_urls(request: ParseAndMatchRequest):
     """
     Parse resume and JD from URLs and calculate match percentage in a single API call
+    (parse resume, parse JD and match run as separately cached stages)
     """
     try:
-        # Fetch content from URLs
-        resume_text = fetch_content_from_url(request.resume_url)
-        jd_text = fetch_content_from_url(request.jd_url)
+        # Fetch both documents concurrently (or reuse them from the document store)
+        resume_doc, jd_doc = await fetch_documents(request.resume_url, request.jd_url)
         
-        # Single API call to parse both and calculate match
-        result = parse_and_match_resume_jd(resume_text, jd_text)
-        
-        return result
+        # Stages already cached (e.g. by /resume or /jd) are not parsed again
+        return await parse_and_match_documents(resume_doc, jd_doc)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing URLs: {str(e)}")
@@ -47,16 +72,9 @@ async def parse_and_match_urls(request: ParseAndMatchRequest):
 async def parse_resume_url(request: URLRequest):
     """Parse resume from URL and return structured JSON"""
     try:
-        cache_key = f"resume:{hash(request.url)}"
-        if cache_key in resume_cache:
-            return resume_cache[cache_key]
-        
-        text = fetch_content_from_url(request.url)
-        # Use the combined function but only return resume data
-        result = parse_and_match_resume_jd(text, "")
-        resume_data = result.get("resume_data", {})
-        resume_cache[cache_key] = resume_data
-        return resume_data
+        # Keyed by the file's digest, so the same resume behind another URL is parsed once
+        doc = await fetch_document(request.url)
+        return await aresume_data(doc)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error parsing resume URL: {str(e)}")
 
@@ -64,32 +82,46 @@ async def parse_resume_url(request: URLRequest):
 async def parse_jd_url(request: URLRequest):
     """Parse job description from URL and return structured JSON"""
     try:
-        cache_key = f"jd:{hash(request.url)}"
-        if cache_key in jd_cache:
-            return jd_cache[cache_key]
-        
-        text = fetch_content_from_url(request.url)
-        # Use the combined function but only return JD data
-        result = parse_and_match_resume_jd("", text)
-        jd_data = result.get("jd_data", {})
-        jd_cache[cache_key] = jd_data
-        return jd_data
+        doc = await fetch_document(request.url)
+        return await ajd_data(doc)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error parsing job description URL: {str(e)}")
 
 @router.post("/match")
 async def match_resume_jd(request: MatchRequest):
-    """Compare resume and JD JSON to get compatibility score"""
+    """Compare resume and JD JSON to get compatibility score (scored locally; explain=true adds strengths and gaps)"""
     try:
-        # Convert JSON back to text for the combined function
-        import json
-        resume_text = json.dumps(request.resume_json, indent=2)
-        jd_text = json.dumps(request.jd_json, indent=2)
-        
-        result = parse_and_match_resume_jd(resume_text, jd_text)
-        return result.get("match_result", {})
+        return await amatch_score(request.resume_json, request.jd_json, request.explain)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error matching resume and JD: {str(e)}")
 
+@router.post("/rank")
+async def rank_resumes_for_jd(request: RankRequest):
+    """
+    Rank an applicant pool against one JD: the JD is parsed once, every resume is scored
+    locally, and only the top_k are sent to the LLM for strengths and gaps
+    """
+    if (request.jd_url is None) == (request.jd_json is None):
+        raise HTTPException(status_code=400, detail="Pass exactly one of jd_url or jd_json")
+    try:
+        jd = request.jd_json if request.jd_json is not None else await ajd_data(await fetch_document(request.jd_url))
+        if request.resume_urls:
+            candidates = resume_candidates(request.resume_urls, await fetch_documents(*request.resume_urls))
+        else:
+            candidates = cached_resumes()
+        return await rank_resumes(jd, candidates, request.top_k, request.page, request.page_size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error ranking resumes: {str(e)}")
+
+@router.post("/search")
+async def search_resumes(request: SearchRequest):
+    """Boolean skill search over parsed resumes (AND / OR / NOT, parentheses, years>=N); no LLM call"""
+    try:
+        return search_candidates(request.query, request.min_years, min(max(request.limit, 1), 500), max(request.offset, 0))
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid query: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching resumes: {str(e)}")
+
 app = FastAPI(title="Resume-JD Matcher Service", version="1.0.0")
 app.include_router(router, prefix="/matcher")
@@ -1,180 +1,359 @@
-import requests
+import asyncio
 import re
 import json
-import google.generativeai as genai
+import logging
 import os
-from urllib.parse import urlparse
+import time
+from typing import List, Tuple, Union
+from llm_runtime import (
+    Contacts,
+    Document,
+    LLMRuntime,
+    LRUCache,
+    PARSE_SECTIONS,
+    ValidationError,
+    content_key,
+    extract_contacts,
+    focus,
+    json_object,
+    require_keys,
+    shared_docstore,
+    shared_scorer,
+    shared_skill_index,
+    with_contacts,
+)
 
-resume_cache = {}
-jd_cache = {}
+logger = logging.getLogger(__name__)
 
-def get_gemini_model():
-    """Get Gemini model with configured API key"""
-    api_key = os.getenv("GEMINI_API_KEY_3")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY_3 not configured")
-    genai.configure(api_key=api_key)
-    return genai.GenerativeModel("gemini-2.0-flash-exp")
+# Parsed documents by content digest (bounded, expire after a day); the resume cache is
+# also the applicant pool /rank scores, so it has room for several thousand parses
+resume_cache = LRUCache(max_bytes=64 * 1024 * 1024, ttl=86400)
+jd_cache = LRUCache(max_bytes=16 * 1024 * 1024, ttl=86400)
+# LLM strengths/gaps by (resume, JD) content
+explanation_cache = LRUCache(max_bytes=16 * 1024 * 1024, ttl=86400)
 
-def fetch_content_from_url(url: str) -> str:
-    """Fetch content from URL (supports various formats)"""
+# /rank limits: LLM explanations per ranking, rows per page
+MAX_TOP_K = 50
+MAX_PAGE_SIZE = 500
+
+_llm = None
+
+def get_llm() -> LLMRuntime:
+    """Get the matcher's LLM runtime (created on first use)"""
+    global _llm
+    if _llm is None:
+        api_key = os.getenv("GEMINI_API_KEY_3")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY_3 not configured")
+        _llm = LLMRuntime("resume-jd-matcher", [api_key])
+    return _llm
+
+async def fetch_document(url: str) -> Document:
+    """Document behind a URL (PDF, HTML or text), from the shared document store when already extracted"""
     try:
-        # Validate URL
-        parsed_url = urlparse(url)
-        if not parsed_url.scheme or not parsed_url.netloc:
-            raise ValueError("Invalid URL format")
-        
-        # Set headers to mimic a browser request
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        # Check content type
-        content_type = response.headers.get('content-type', '').lower()
-        
-        if 'application/pdf' in content_type:
-            # Handle PDF URLs
-            return extract_text_from_pdf_url(response.content)
-        elif 'text/html' in content_type:
-            # Handle HTML pages (like LinkedIn profiles, GitHub profiles, etc.)
-            return extract_text_from_html(response.text)
-        elif 'text/plain' in content_type:
-            # Handle plain text URLs
-            return response.text
-        else:
-            # Try to decode as text for other content types
-            return response.text
-            
-    except requests.RequestException as e:
-        raise ValueError(f"Failed to fetch content from URL: {str(e)}")
+        return await shared_docstore().load(url)
     except Exception as e:
         raise ValueError(f"Error processing URL content: {str(e)}")
 
-def extract_text_from_pdf_url(pdf_content: bytes) -> str:
-    """Extract text from PDF content downloaded from URL"""
+async def fetch_documents(*urls: str) -> list:
+    """fetch_document() for several URLs concurrently; documents are returned in the order given"""
     try:
-        import fitz  # PyMuPDF
-        doc = fitz.open(stream=pdf_content, filetype="pdf")
-        return "".join(page.get_text() for page in doc)
-    except ImportError:
-        raise ValueError("PyMuPDF not available for PDF processing")
+        return await shared_docstore().load_all(urls)
     except Exception as e:
-        raise ValueError(f"Failed to extract text from PDF: {str(e)}")
+        raise ValueError(f"Error processing URL content: {str(e)}")
+
+# ---- stage 1: parse resume ----
+
+# Fields the model extracts (key -> what to ask for); email, phone, GitHub and LinkedIn
+# come from extract_contacts()
+RESUME_FIELDS = {
+    "Employment Details": "Employment Details",
+    "Technical Skills": "Technical Skills",
+    "Soft Skills": "Soft Skills",
+    "Education": "Education (Degree, Institution, Year, CGPA)",
+}
+
+def _resume_prompt(text: str, contacts: Contacts) -> str:
+    inputs, _ = get_llm().budget.fit("resume-jd-matcher/parse-resume", resume=focus(text, PARSE_SECTIONS))
+    fields = RESUME_FIELDS
+    if contacts.name is None:
+        # No line near the top looked like a name, so the model is asked for it
+        fields = {"Full Name": "Full Name", **fields}
+    wanted = "\n".join(f"   - {label}" for label in fields.values())
+    schema = ",\n".join(f'    "{name}": ' + ('"..."' if name == "Full Name" else "[...]") for name in fields)
+    return f"""
+You are an AI specialized in resume analysis. Parse the resume and extract:
+{wanted}
+
+Return STRICT JSON in this exact format:
+{{
+{schema}
+}}
+
+RESUME TEXT:
+{inputs['resume']}
+"""
+
+def _require_lists(data: dict, *keys: str) -> dict:
+    """Escalate unless every key holds a list (an empty one is a valid answer: a resume may have no education)"""
+    wrong = [key for key in keys if not isinstance(data.get(key), list)]
+    if wrong:
+        raise ValidationError(f"Expected lists for: {', '.join(wrong)}")
+    return data
+
+def validate_resume(text: str) -> dict:
+    """Escalate unless the parse has skills and education lists"""
+    return _require_lists(json_object(text), "Technical Skills", "Education")
 
-def extract_text_from_html(html_content: str) -> str:
-    """Extract text from HTML content"""
+def _index_resume(key: str, data: dict):
+    """Make a parse searchable by skill (/search); a SQLite write, now and then a snapshot rewrite"""
     try:
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Get text content
-        text = soup.get_text()
-        
-        # Clean up whitespace
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
-        
-        return text
-    except ImportError:
-        # Fallback: simple regex-based HTML tag removal
-        import re
-        text = re.sub(r'<[^>]+>', '', html_content)
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
+        shared_skill_index().add(key, data)
     except Exception as e:
-        raise ValueError(f"Failed to extract text from HTML: {str(e)}")
+        logger.warning("Could not index resume %s: %s", key, e)
 
-def parse_and_match_resume_jd(resume_text: str, jd_text: str) -> dict:
-    """
-    Single API call to parse resume, parse JD, and calculate match percentage
-    """
-    prompt = f"""
-You are an AI specialized in resume and job description analysis. Perform the following tasks in a single response:
-
-1. Parse the resume and extract:
-   - Full Name
-   - Email
-   - GitHub
-   - LinkedIn
-   - Employment Details
-   - Technical Skills
-   - Soft Skills
-   - Education (Degree, Institution, Year, CGPA)
-
-2. Parse the job description and extract:
+def parse_resume(text: str, key: str = None) -> dict:
+    """Parsed resume, memoized by key (the document digest) or by the text's digest"""
+    key = key or content_key(text)
+    cached = resume_cache.get(f"resume:{key}")
+    if cached is not None:
+        return cached
+    contacts = extract_contacts(text)
+    parsed = get_llm().cascade("resume-jd-matcher/parse-resume", _resume_prompt(text, contacts), validate_resume)
+    data = with_contacts(parsed, contacts)
+    resume_cache.set(f"resume:{key}", data)
+    _index_resume(key, data)
+    return data
+
+async def aparse_resume(text: str, key: str = None) -> dict:
+    """parse_resume() for async handlers"""
+    key = key or content_key(text)
+    cached = resume_cache.get(f"resume:{key}")
+    if cached is not None:
+        return cached
+    contacts = extract_contacts(text)
+    parsed = await get_llm().acascade("resume-jd-matcher/parse-resume", _resume_prompt(text, contacts), validate_resume)
+    data = with_contacts(parsed, contacts)
+    resume_cache.set(f"resume:{key}", data)
+    # Indexed in a worker thread; the response doesn't wait for it
+    asyncio.get_running_loop().run_in_executor(None, _index_resume, key, data)
+    return data
+
+# ---- stage 2: parse JD ----
+
+def _jd_prompt(text: str) -> str:
+    inputs, _ = get_llm().budget.fit("resume-jd-matcher/parse-jd", jd=text)
+    return f"""
+You are an AI specialized in job description analysis. Parse the job description and extract:
    - Required Skills
    - Required Experience
    - Required Education
 
-3. Compare the resume and job description to calculate:
-   - Match score (0-100)
-   - Strengths (areas where candidate matches well)
-   - Gaps (areas where candidate lacks required skills/experience)
+Return STRICT JSON in this exact format:
+{{
+    "Required Skills": [...],
+    "Required Experience": "...",
+    "Required Education": "..."
+}}
+
+JOB DESCRIPTION TEXT:
+{inputs['jd']}
+"""
+
+def validate_jd(text: str) -> dict:
+    """Escalate unless the parse has a required-skills list"""
+    return _require_lists(json_object(text), "Required Skills")
+
+def parse_jd(text: str, key: str = None) -> dict:
+    """Parsed job description, memoized by key (the document digest) or by the text's digest"""
+    key = key or content_key(text)
+    cached = jd_cache.get(f"jd:{key}")
+    if cached is not None:
+        return cached
+    data = get_llm().cascade("resume-jd-matcher/parse-jd", _jd_prompt(text), validate_jd)
+    jd_cache.set(f"jd:{key}", data)
+    return data
+
+async def aparse_jd(text: str, key: str = None) -> dict:
+    """parse_jd() for async handlers"""
+    key = key or content_key(text)
+    cached = jd_cache.get(f"jd:{key}")
+    if cached is not None:
+        return cached
+    data = await get_llm().acascade("resume-jd-matcher/parse-jd", _jd_prompt(text), validate_jd)
+    jd_cache.set(f"jd:{key}", data)
+    return data
 
-Return your response as STRICT JSON in this exact format:
+def resume_data(doc: Document) -> dict:
+    """Parsed resume for a document, cached by its digest"""
+    return parse_resume(doc.text, doc.digest)
+
+def jd_data(doc: Document) -> dict:
+    """Parsed job description for a document, cached by its digest"""
+    return parse_jd(doc.text, doc.digest)
+
+async def aresume_data(doc: Document) -> dict:
+    return await aparse_resume(doc.text, doc.digest)
+
+async def ajd_data(doc: Document) -> dict:
+    return await aparse_jd(doc.text, doc.digest)
+
+# ---- stage 3: match structured data ----
+
+async def parse_and_match_documents(resume_doc: Document, jd_doc: Document) -> dict:
+    """
+    The three stages composed: both documents are parsed concurrently (or taken from the
+    parse caches), then matched; a pair seen before costs no LLM call at all
+    """
+    resume_json, jd_json = await asyncio.gather(aresume_data(resume_doc), ajd_data(jd_doc))
+    return {"resume_data": resume_json, "jd_data": jd_json, "match_result": await amatch_score(resume_json, jd_json, explain=True)}
+
+def parse_and_match_resume_jd(resume_text: str, jd_text: str) -> dict:
+    """
+    parse_and_match_documents() for text: parse resume, parse JD and match, each stage memoized
+    """
+    resume_json = parse_resume(resume_text)
+    jd_json = parse_jd(jd_text)
+    return {"resume_data": resume_json, "jd_data": jd_json, "match_result": match_score(resume_json, jd_json, explain=True)}
+
+def match_score(resume_json: dict, jd_json: dict, explain: bool = False) -> dict:
+    """
+    Local match score (no LLM call); with explain, the LLM also writes strengths and gaps
+    """
+    result = shared_scorer().score(resume_json, jd_json).to_dict()
+    if explain:
+        result.update(explain_match(resume_json, jd_json, result))
+    return result
+
+async def amatch_score(resume_json: dict, jd_json: dict, explain: bool = False) -> dict:
+    """match_score() for async handlers (the explanation is awaited, not waited on)"""
+    result = shared_scorer().score(resume_json, jd_json).to_dict()
+    if explain:
+        result.update(await aexplain_match(resume_json, jd_json, result))
+    return result
+
+def _explain_prompt(resume: Union[dict, str], jd_json: dict, local: dict) -> str:
+    resume_text = resume if isinstance(resume, str) else json.dumps(resume, indent=2)
+    inputs, _ = get_llm().budget.fit("resume-jd-matcher/explain", resume=resume_text, jd=json.dumps(jd_json, indent=2))
+    return f"""
+You are an AI specialized in resume and job description analysis. The candidate has already been scored
+{local['score']}/100 against the job. Skills found: {', '.join(local['matched_skills']) or 'none'}.
+Required skills missing: {', '.join(local['missing_skills']) or 'none'}.
+
+Explain the match. Return STRICT JSON in this exact format:
 {{
-    "resume_data": {{
-        "Full Name": "...",
-        "Email": "...",
-        "GitHub": "...",
-        "LinkedIn": "...",
-        "Employment Details": [...],
-        "Technical Skills": [...],
-        "Soft Skills": [...],
-        "Education": [...]
-    }},
-    "jd_data": {{
-        "Required Skills": [...],
-        "Required Experience": "...",
-        "Required Education": "..."
-    }},
-    "match_result": {{
-        "score": 85,
-        "strengths": ["Strong Python experience", "Relevant project work"],
-        "gaps": ["Missing AWS experience", "No team leadership"]
-    }}
+    "strengths": ["Strong Python experience", "Relevant project work"],
+    "gaps": ["Missing AWS experience", "No team leadership"]
 }}
 
-RESUME TEXT:
-{resume_text}
+RESUME:
+{inputs['resume']}
 
-JOB DESCRIPTION TEXT:
-{jd_text}
+PARSED JOB DESCRIPTION:
+{inputs['jd']}
 """
-    
-    model = get_gemini_model()
-    resp = model.generate_content(prompt)
-    
-    # Extract JSON from response
-    obj = re.search(r"\{.*\}", resp.text, re.S)
-    if obj:
-        return json.loads(obj.group(0))
-    else:
-        raise ValueError("Failed to parse JSON response from Gemini")
+
+def _explanation_key(resume: Union[dict, str], jd_json: dict) -> str:
+    return "explain:" + content_key(json.dumps([resume, jd_json], sort_keys=True, default=str))
+
+def explain_match(resume: Union[dict, str], jd_json: dict, local: dict) -> dict:
+    """Strengths and gaps for an already scored resume/JD pair, cached per pair"""
+    cache_key = _explanation_key(resume, jd_json)
+    cached = explanation_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    result = get_llm().cascade("resume-jd-matcher/explain", _explain_prompt(resume, jd_json, local), validate_explanation)
+    explanation = {"strengths": result["strengths"], "gaps": result["gaps"]}
+    explanation_cache.set(cache_key, explanation)
+    return explanation
+
+async def aexplain_match(resume: Union[dict, str], jd_json: dict, local: dict) -> dict:
+    """explain_match() for async handlers"""
+    cache_key = _explanation_key(resume, jd_json)
+    cached = explanation_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    result = await get_llm().acascade("resume-jd-matcher/explain", _explain_prompt(resume, jd_json, local), validate_explanation)
+    explanation = {"strengths": result["strengths"], "gaps": result["gaps"]}
+    explanation_cache.set(cache_key, explanation)
+    return explanation
+
+def cached_resumes() -> List[Tuple[str, dict]]:
+    """(digest, parsed resume) for every resume parse in the cache"""
+    return [(key.split(":", 1)[1], value) for key, value in resume_cache.items("resume:")]
+
+def resume_candidates(urls: List[str], docs: List[Document]) -> List[Tuple[str, Union[dict, str]]]:
+    """(url, parsed resume) per document; resumes never parsed are scored on their text instead"""
+    candidates = []
+    for url, doc in zip(urls, docs):
+        parsed = resume_cache.get(f"resume:{doc.digest}")
+        candidates.append((url, parsed if parsed is not None else doc.text))
+    return candidates
+
+async def rank_resumes(jd_json: dict, candidates: List[Tuple[str, Union[dict, str]]],
+                       top_k: int = 10, page: int = 1, page_size: int = 50) -> dict:
+    """
+    Score every candidate against one JD locally, rank them, and return one page;
+    only the top_k overall (those on this page) are explained by the LLM
+    """
+    started = time.perf_counter()
+    top_k = max(0, min(top_k, MAX_TOP_K))
+    page = max(1, page)
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    scores = shared_scorer().score_many(jd_json, [resume for _, resume in candidates])
+    order = sorted(range(len(candidates)), key=lambda i: (-scores[i].score, candidates[i][0]))
+    first = (page - 1) * page_size
+    rows = []
+    for rank, i in enumerate(order[first:first + page_size], first + 1):
+        resume_id, resume = candidates[i]
+        row = {"rank": rank, "id": resume_id, "parsed": isinstance(resume, dict), **scores[i].to_dict()}
+        if isinstance(resume, dict):
+            row["name"] = resume.get("Full Name")
+        rows.append(row)
+    explain = [row for row in rows if row["rank"] <= top_k]
+    if explain:
+        explanations = await get_llm().amap(
+            lambda row: aexplain_match(candidates[order[row["rank"] - 1]][1], jd_json, row), explain
+        )
+        for row, explanation in zip(explain, explanations):
+            if isinstance(explanation, BaseException):
+                row["explanation_error"] = str(explanation)
+            else:
+                row.update(explanation)
+    return {
+        "total": len(candidates),
+        "page": page,
+        "page_size": page_size,
+        "pages": -(-len(candidates) // page_size),
+        "top_k": top_k,
+        "results": rows,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+def validate_explanation(text: str) -> dict:
+    """Escalate unless strengths and gaps are both lists"""
+    result = require_keys(json_object(text), "strengths", "gaps")
+    if not isinstance(result["strengths"], list) or not isinstance(result["gaps"], list):
+        raise ValidationError("strengths and gaps must be lists")
+    return result
+
+def search_candidates(query: str, min_years: float = None, limit: int = 50, offset: int = 0) -> dict:
+    """Boolean skill search over every indexed resume; names come from cached parses"""
+    result = shared_skill_index().search(query, min_years, limit, offset).to_dict()
+    for candidate in result["candidates"]:
+        parsed = resume_cache.get(f"resume:{candidate['key']}")
+        candidate["name"] = parsed.get("Full Name") if isinstance(parsed, dict) else None
+    return result
 
 # Legacy functions for backward compatibility (if needed)
 def extract_resume_json(text: str) -> dict:
-    """Legacy function - use parse_and_match_resume_jd instead"""
-    result = parse_and_match_resume_jd(text, "")
-    return result.get("resume_data", {})
+    """Legacy function - use parse_resume instead"""
+    return parse_resume(text)
 
 def extract_jd_json(text: str) -> dict:
-    """Legacy function - use parse_and_match_resume_jd instead"""
-    result = parse_and_match_resume_jd("", text)
-    return result.get("jd_data", {})
+    """Legacy function - use parse_jd instead"""
+    return parse_jd(text)
 
 def compare(resume_json: dict, jd_json: dict) -> dict:
-    """Legacy function - use parse_and_match_resume_jd instead"""
-    # Convert dicts back to text for the combined function
-    resume_text = json.dumps(resume_json, indent=2)
-    jd_text = json.dumps(jd_json, indent=2)
-    result = parse_and_match_resume_jd(resume_text, jd_text)
-    return result.get("match_result", {})
+    """Legacy function - use match_score instead"""
+    return match_score(resume_json, jd_json, explain=True)
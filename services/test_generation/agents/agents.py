@@ -1,21 +1,22 @@
 import os
 import json
 import re
-import google.generativeai as genai
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import random
 import time
 from dotenv import load_dotenv
+from llm_runtime import JSONArrayStream, LLMRuntime, ValidationError, focus, route_models, technical_highlights
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY_2")
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY_2 is not set in environment variables")
 
-def configure_gemini():
-    """Configure Gemini with current available key"""
-    genai.configure(api_key=GEMINI_API_KEY)
-    return genai.GenerativeModel('gemini-2.5-flash')
+llm = LLMRuntime("test-generation", [GEMINI_API_KEY])
+
+def route_for(tier: str) -> str:
+    """LLM route for a tier (models are listed fastest first, see llm_runtime.cascade)"""
+    return f"test-generation/{tier}"
 
 # Keywords from your deployed app
 TECH_KEYWORDS = {
@@ -42,14 +43,11 @@ NON_TECH_KEYWORDS = {
 }
 
 def extract_technical_highlights(resume_text: str) -> List[str]:
-    """Extract technical highlights from resume (same as your deployed app)"""
-    lines = [line.strip("• ").strip() for line in resume_text.splitlines() if line.strip()]
-    highlights = []
-    for line in lines:
-        lw = line.lower()
-        if any(k in lw for k in TECH_KEYWORDS) and not any(nt in lw for nt in NON_TECH_KEYWORDS):
-            highlights.append(line)
-    return highlights[:5]
+    """Extract technical highlights from the resume's experience, projects and skills sections"""
+    return technical_highlights(resume_text, TECH_KEYWORDS, NON_TECH_KEYWORDS)
+
+# Resume sections a test prompt needs (contact details, education, hobbies etc. are not)
+PROMPT_SECTIONS = ("summary", "experience", "projects", "skills", "certifications")
 
 # Test configuration based on duration
 TEST_CONFIG = {
@@ -95,16 +93,65 @@ def parse_json_response(response_text: str) -> Dict:
         obj = re.search(r"\{.*\}", raw, re.S)
         return json.loads(obj.group(0)) if obj else {}
 
+def question_set_validator(duration: int):
+    """Reject question sets that are short, empty or still contain the prompt's placeholders"""
+    config = get_test_config(duration)
+
+    def validate(text: str) -> Dict:
+        try:
+            data = parse_json_response(text)
+        except ValueError as e:
+            raise ValidationError(f"Unparseable question set: {e}")
+        if not isinstance(data, dict):
+            raise ValidationError("Question set is not a JSON object")
+        open_questions = data.get("open_questions") or []
+        mcq = data.get("mcq") or []
+        if len(open_questions) < config["open_questions"] or len(mcq) < config["mcq_questions"]:
+            raise ValidationError(
+                f"Expected {config['open_questions']} open / {config['mcq_questions']} MCQ, "
+                f"got {len(open_questions)} / {len(mcq)}"
+            )
+        for question in open_questions:
+            if not isinstance(question, str) or len(re.sub(r"^Q\d+:\s*", "", question).strip()) < 10:
+                raise ValidationError(f"Empty or placeholder open question: {question!r}")
+        for item in mcq:
+            if not isinstance(item, dict) or not item.get("question"):
+                raise ValidationError("MCQ without a question")
+            options = item.get("options")
+            if not isinstance(options, list) or len(options) < 4 or any("option1" in str(o) for o in options):
+                raise ValidationError(f"MCQ with missing or placeholder options: {item.get('question')!r}")
+        return data
+
+    return validate
+
+def generate_question_set(tier: str, prompt: str, duration: int) -> Dict:
+    """Fast model first; escalate to the larger one only if the question set fails validation"""
+    return llm.cascade(route_for(tier), prompt, question_set_validator(duration))
+
+def stream_questions(prompt: str, tier: str = "free") -> Iterator[Tuple[str, Any]]:
+    """Yield ("open_questions", str) and ("mcq", dict) items as soon as each one is complete in the streamed response"""
+    parser = JSONArrayStream(keys=("open_questions", "mcq"))
+    # Items are forwarded as they arrive, so streaming stays on the route's fast model
+    for chunk in llm.stream(route_models(route_for(tier))[0], prompt):
+        yield from parser.feed(chunk)
+    if parser.emitted == 0:
+        # Output wasn't streamable JSON (e.g. odd fencing); fall back to parsing it whole
+        data = parse_json_response(parser.text)
+        for key in ("open_questions", "mcq"):
+            for item in data.get(key, []):
+                yield key, item
+
 class FreeTierAgent:
     """Free tier - basic questions from resume only"""
     
     def __init__(self):
         self.tier = "free"
     
-    def generate_questions(self, resume_text: str, jd_text: str = None, duration: int = 30, difficulty: str = "intermediate") -> Dict:
-        """Generate basic questions based on duration and difficulty"""
+    def build_prompt(self, resume_text: str, jd_text: str = None, duration: int = 30, difficulty: str = "intermediate") -> str:
+        """Build the free tier prompt"""
         highlights = extract_technical_highlights(resume_text)
         highlights_str = "\n".join(f"- {h}" for h in highlights[:3])  # Limit to 3 for free tier
+        inputs, _ = llm.budget.fit(route_for(self.tier), resume=focus(resume_text, PROMPT_SECTIONS))
         
         # Get test configuration
         config = get_test_config(duration)
@@ -158,12 +205,14 @@ Only return this JSON. No extra text.
 {highlights_str}
 
 Resume Context:
-{resume_text[:1000]}...  
+{inputs['resume']}
 """
         
-        model = configure_gemini()
-        response = model.generate_content(prompt)
-        return parse_json_response(response.text)
+        return prompt
+
+    def generate_questions(self, resume_text: str, jd_text: str = None, duration: int = 30, difficulty: str = "intermediate") -> Dict:
+        """Generate basic questions based on duration and difficulty"""
+        return generate_question_set(self.tier, self.build_prompt(resume_text, jd_text, duration, difficulty), duration)
 
 class FreemiumTierAgent:
     """Freemium tier - uses stock industry JDs"""
@@ -171,10 +220,11 @@ class FreemiumTierAgent:
     def __init__(self):
         self.tier = "freemium"
     
-    def generate_questions(self, resume_text: str, jd_text: str, duration: int = 30, difficulty: str = "intermediate") -> Dict:
-        """Generate questions using stock industry JD"""
+    def build_prompt(self, resume_text: str, jd_text: str, duration: int = 30, difficulty: str = "intermediate") -> str:
+        """Build the freemium tier prompt"""
         highlights = extract_technical_highlights(resume_text)
         highlights_str = "\n".join(f"- {h}" for h in highlights)
+        inputs, _ = llm.budget.fit(route_for(self.tier), resume=focus(resume_text, PROMPT_SECTIONS), jd=jd_text)
         
         # Get test configuration
         config = get_test_config(duration)
@@ -238,10 +288,10 @@ Only return this JSON. No extra text.
 {highlights_str}
 
 — Job Description:
-{jd_text}
+{inputs['jd']}
 
 — Resume Context:
-{resume_text[:1500]}...
+{inputs['resume']}
 
 Requirements:
 1. Reference specific requirements from the job description
@@ -250,9 +300,11 @@ Requirements:
 4. Focus on practical application of skills
 """
         
-        model = configure_gemini()
-        response = model.generate_content(prompt)
-        return parse_json_response(response.text)
+        return prompt
+
+    def generate_questions(self, resume_text: str, jd_text: str, duration: int = 30, difficulty: str = "intermediate") -> Dict:
+        """Generate questions using stock industry JD"""
+        return generate_question_set(self.tier, self.build_prompt(resume_text, jd_text, duration, difficulty), duration)
 
 class PremiumTierAgent:
     """Premium tier - uses actual JD and comprehensive questions"""
@@ -260,10 +312,11 @@ class PremiumTierAgent:
     def __init__(self):
         self.tier = "premium"
     
-    def generate_questions(self, resume_text: str, jd_text: str, company_context: str = None, duration: int = 30, difficulty: str = "intermediate") -> Dict:
-        """Generate comprehensive questions using actual JD"""
+    def build_prompt(self, resume_text: str, jd_text: str, company_context: str = None, duration: int = 30, difficulty: str = "intermediate") -> str:
+        """Build the premium tier prompt"""
         highlights = extract_technical_highlights(resume_text)
         highlights_str = "\n".join(f"- {h}" for h in highlights)
+        inputs, _ = llm.budget.fit(route_for(self.tier), resume=focus(resume_text, PROMPT_SECTIONS), jd=jd_text)
         
         # Get test configuration
         config = get_test_config(duration)
@@ -329,10 +382,10 @@ Only return this JSON. No extra text.
 {highlights_str}
 
 Full Resume:
-{resume_text}
+{inputs['resume']}
 
 Job Description:
-{jd_text}
+{inputs['jd']}
 
 Company Context:
 {company_context or "Technology company"}
@@ -344,9 +397,11 @@ Requirements:
 4. Mix theoretical and practical questions
 """
         
-        model = configure_gemini()
-        response = model.generate_content(prompt)
-        return parse_json_response(response.text)
+        return prompt
+
+    def generate_questions(self, resume_text: str, jd_text: str, company_context: str = None, duration: int = 30, difficulty: str = "intermediate") -> Dict:
+        """Generate comprehensive questions using actual JD"""
+        return generate_question_set(self.tier, self.build_prompt(resume_text, jd_text, company_context, duration, difficulty), duration)
 
 # Simple tier selection function
 def get_agent(tier: str):
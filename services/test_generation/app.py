@@ -1,5 +1,13 @@
 # services/test_generation/app.py
+import os
+import sys
 from fastapi import FastAPI
+
+# Shared modules (llm_runtime) are imported as top-level packages from services/
+_SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _SERVICES_DIR not in sys.path:
+    sys.path.append(_SERVICES_DIR)
+
 from .main import router as test_gen_router  # <-- use relative import
 
 app = FastAPI(title="Test Generation Service", version="1.0")
@@ -1,23 +1,24 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
+import json
 import os
-import requests
-from .agents.agents import get_agent
+from llm_runtime import FetchError, route_models, shared_docstore
+from .agents.agents import get_agent, route_for, stream_questions
 
 router = APIRouter()
 
-def fetch_content_from_url(url: str) -> str:
-    """Fetch content from URL"""
+def fetch_contents_from_urls(urls: dict) -> dict:
+    """Fetch {name: url} concurrently (or reuse them from the shared document store) and return {name: text}"""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        return response.text
-    except Exception as e:
+        docs = shared_docstore().load_all_sync(urls.values())
+    except FetchError as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch content from URL: {str(e)}")
+    except ValueError as e:
+        # PDFs are extracted rather than decoded, so no binary ends up in the prompt
+        raise HTTPException(status_code=400, detail=f"Failed to read content from URL: {str(e)}")
+    return {name: doc.text for name, doc in zip(urls, docs)}
 
 class MockTestRequest(BaseModel):
     tier: str="free"  # "free", "freemium", "premium"
@@ -40,72 +41,76 @@ def health_check():
         "difficulties": ["novice", "intermediate", "actual", "challenge"]
     }
 
+def resolve_inputs(request: MockTestRequest):
+    """Validate the request and return (resume_content, jd_content)"""
+    # Validate tier
+    if request.tier not in ["free", "freemium", "premium"]:
+        raise HTTPException(status_code=400, detail="Invalid tier. Use: free, freemium, or premium")
+    
+    # Validate duration
+    if request.duration not in [30, 60]:
+        raise HTTPException(status_code=400, detail="Invalid duration. Use: 30 or 60 minutes")
+    
+    # Validate difficulty
+    if request.difficulty not in ["novice", "intermediate", "actual", "challenge"]:
+        raise HTTPException(status_code=400, detail="Invalid difficulty. Use: novice, intermediate, actual, or challenge")
+    
+    # Resume and JD URLs are downloaded together
+    urls = {}
+    if not request.resume_text and request.resume_url:
+        urls["resume"] = request.resume_url
+    if request.tier in ["freemium", "premium"] and not (request.job_description or request.jd_text) and request.jd_url:
+        urls["jd"] = request.jd_url
+    fetched = fetch_contents_from_urls(urls) if urls else {}
+    
+    # Get resume content (from text or URL)
+    if request.resume_text:
+        resume_content = request.resume_text
+    elif request.resume_url:
+        resume_content = fetched["resume"]
+    else:
+        raise HTTPException(status_code=400, detail="Either resume_text or resume_url must be provided")
+    
+    # Get JD content (for freemium and premium tiers)
+    jd_content = None
+    if request.tier in ["freemium", "premium"]:
+        if request.job_description:  # Add this - prioritize job_description from frontend
+            jd_content = request.job_description
+        elif request.jd_text:
+            jd_content = request.jd_text
+        elif request.jd_url:
+            jd_content = fetched["jd"]
+        else:
+            raise HTTPException(status_code=400, detail="Either jd_text or jd_url must be provided for freemium/premium tiers")
+    
+    return resume_content, jd_content
+
+def agent_args(request: MockTestRequest, resume_content: str, jd_content: Optional[str]) -> tuple:
+    """Positional arguments for the tier agent"""
+    if request.tier == "free":
+        # Free tier - resume only
+        return (resume_content,)
+    elif request.tier == "freemium":
+        # Freemium tier - requires JD
+        return (resume_content, jd_content)
+    # Premium tier - requires JD and optional company context
+    return (resume_content, jd_content, request.company_context)
+
 @router.post("/generate-test")
 def generate_mock_test(request: MockTestRequest):
     """Generate mock test questions based on tier, duration, and difficulty"""
     try:
-        # Validate tier
-        if request.tier not in ["free", "freemium", "premium"]:
-            raise HTTPException(status_code=400, detail="Invalid tier. Use: free, freemium, or premium")
-        
-        # Validate duration
-        if request.duration not in [30, 60]:
-            raise HTTPException(status_code=400, detail="Invalid duration. Use: 30 or 60 minutes")
-        
-        # Validate difficulty
-        if request.difficulty not in ["novice", "intermediate", "actual", "challenge"]:
-            raise HTTPException(status_code=400, detail="Invalid difficulty. Use: novice, intermediate, actual, or challenge")
-        
-        # Get resume content (from text or URL)
-        if request.resume_text:
-            resume_content = request.resume_text
-        elif request.resume_url:
-            resume_content = fetch_content_from_url(request.resume_url)
-        else:
-            raise HTTPException(status_code=400, detail="Either resume_text or resume_url must be provided")
-        
-        # Get JD content (for freemium and premium tiers)
-        jd_content = None
-        if request.tier in ["freemium", "premium"]:
-            if request.job_description:  # Add this - prioritize job_description from frontend
-                jd_content = request.job_description
-            elif request.jd_text:
-                jd_content = request.jd_text
-            elif request.jd_url:
-                jd_content = fetch_content_from_url(request.jd_url)
-            else:
-                raise HTTPException(status_code=400, detail="Either jd_text or jd_url must be provided for freemium/premium tiers")
+        resume_content, jd_content = resolve_inputs(request)
         
         # Get appropriate agent
         agent = get_agent(request.tier)
         
         # Generate questions based on tier, duration, and difficulty
-        if request.tier == "free":
-            # Free tier - resume only
-            questions = agent.generate_questions(
-                resume_content, 
-                duration=request.duration,
-                difficulty=request.difficulty
-            )
-        
-        elif request.tier == "freemium":
-            # Freemium tier - requires JD
-            questions = agent.generate_questions(
-                resume_content, 
-                jd_content,
-                duration=request.duration,
-                difficulty=request.difficulty
-            )
-        
-        else:  # premium
-            # Premium tier - requires JD and optional company context
-            questions = agent.generate_questions(
-                resume_content, 
-                jd_content,
-                request.company_context,
-                duration=request.duration,
-                difficulty=request.difficulty
-            )
+        questions = agent.generate_questions(
+            *agent_args(request, resume_content, jd_content),
+            duration=request.duration,
+            difficulty=request.difficulty
+        )
         
         return {
             "tier": request.tier,
@@ -119,27 +124,72 @@ def generate_mock_test(request: MockTestRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating questions: {str(e)}")
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/generate-test/stream")
+def stream_mock_test(request: MockTestRequest):
+    """
+    Same as /generate-test, but streamed as server-sent events:
+    "meta" first, then one "open_question" or "mcq" event per question as soon as
+    Gemini has finished writing it, then "done" (or "error").
+    """
+    try:
+        resume_content, jd_content = resolve_inputs(request)
+        agent = get_agent(request.tier)
+        prompt = agent.build_prompt(
+            *agent_args(request, resume_content, jd_content),
+            duration=request.duration,
+            difficulty=request.difficulty
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating questions: {str(e)}")
+    
+    def events():
+        yield sse_event("meta", {"tier": request.tier, "duration": request.duration, "difficulty": request.difficulty})
+        counts = {"open_questions": 0, "mcq": 0}
+        try:
+            for key, item in stream_questions(prompt, request.tier):
+                if key == "open_questions":
+                    yield sse_event("open_question", {"index": counts[key], "question": item})
+                else:
+                    yield sse_event("mcq", {"index": counts[key], **(item if isinstance(item, dict) else {"question": item})})
+                counts[key] += 1
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Error generating questions: {str(e)}"})
+            return
+        yield sse_event("done", {"total_questions": counts["open_questions"] + counts["mcq"], "status": "success"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/tiers")
 def get_tier_info():
     """Get information about available tiers"""
     return {
         "free": {
             "features": ["Basic questions", "Resume-based only"],
-            "model": "gemini-2.5-flash",
+            "models": route_models(route_for("free")),
             "requirements": ["resume_text"],
             "durations": [30, 60],
             "difficulties": ["novice", "intermediate", "actual", "challenge"]
         },
         "freemium": {
             "features": ["JD-based questions", "Intermediate complexity"],
-            "model": "gemini-2.5-flash",
+            "models": route_models(route_for("freemium")),
             "requirements": ["resume_text", "jd_text"],
             "durations": [30, 60],
             "difficulties": ["novice", "intermediate", "actual", "challenge"]
         },
         "premium": {
             "features": ["Advanced JD analysis", "Company context", "Expert complexity"],
-            "model": "gemini-2.5-pro",
+            "models": route_models(route_for("premium")),
             "requirements": ["resume_text", "jd_text", "company_context (optional)"],
             "durations": [30, 60],
             "difficulties": ["novice", "intermediate", "actual", "challenge"]
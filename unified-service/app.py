@@ -1,36 +1,41 @@
 from flask import Flask, request, jsonify
 from dotenv import load_dotenv
 import os
-import google.generativeai as genai
-from matcher_utils import extract_text_from_pdf, extract_resume_json, extract_jd_json, compare, resume_cache, jd_cache
+import sys
+
+# Shared LLM runtime lives in services/llm_runtime (copied next to app.py in the Docker image)
+_SERVICES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services")
+if os.path.isdir(_SERVICES_DIR) and _SERVICES_DIR not in sys.path:
+    sys.path.append(_SERVICES_DIR)
+
+from matcher_utils import load_document, extract_resume_json, extract_jd_json, score_match, resume_cache, jd_cache
 from generator_utils import pick_highlights, generate_questions
 
 load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 app = Flask(__name__)
 
 @app.post("/resume")
 def parse_resume():
     file = request.files["file"]
-    pdf_bytes = file.read()
-    cache_key = f"resume:{hash(pdf_bytes)}"
-    if cache_key in resume_cache:
-        return jsonify(resume_cache[cache_key])
-    text = extract_text_from_pdf(pdf_bytes)
-    data = extract_resume_json(text)
-    resume_cache[cache_key] = data
+    doc = load_document(file.read())
+    cache_key = f"resume:{doc.digest}"
+    cached = resume_cache.get(cache_key)
+    if cached is not None:
+        return jsonify(cached)
+    data = extract_resume_json(doc.text)
+    resume_cache.set(cache_key, data)
     return jsonify(data)
 
 @app.post("/jd")
 def parse_jd():
     file = request.files["file"]
-    pdf_bytes = file.read()
-    cache_key = f"jd:{hash(pdf_bytes)}"
-    if cache_key in jd_cache:
-        return jsonify(jd_cache[cache_key])
-    text = extract_text_from_pdf(pdf_bytes)
-    data = extract_jd_json(text)
-    jd_cache[cache_key] = data
+    doc = load_document(file.read())
+    cache_key = f"jd:{doc.digest}"
+    cached = jd_cache.get(cache_key)
+    if cached is not None:
+        return jsonify(cached)
+    data = extract_jd_json(doc.text)
+    jd_cache.set(cache_key, data)
     return jsonify(data)
 
 @app.post("/match")
@@ -38,7 +43,7 @@ def match():
     body = request.get_json()
     resume = body["resume_json"]
     jd = body["jd_json"]
-    result = compare(resume, jd)
+    result = score_match(resume, jd, bool(body.get("explain", False)))
     return jsonify(result)
 
 @app.post("/generate")
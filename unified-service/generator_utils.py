@@ -1,6 +1,6 @@
 import json
 import re
-import google.generativeai as genai
+from matcher_utils import get_llm
 
 TECH_KEYWORDS = {"python", "java", "c++", "sql", "tensorflow", "keras", "pytorch", "aws", "docker", "flask", "nlp", "transformer"}
 NON_TECH_KEYWORDS = {"communication", "team", "leadership", "management", "event"}
@@ -52,6 +52,6 @@ Resume:
 JD:
 {json.dumps(jd_json)}
 """
-    resp = genai.GenerativeModel("gemini-1.5-flash").generate_content(prompt)
+    resp = get_llm().generate("gemini-1.5-flash", prompt)
     obj = re.search(r"\{.*\}", resp.text, re.S)
     return json.loads(obj.group(0)) if obj else {}
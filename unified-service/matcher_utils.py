@@ -1,32 +1,58 @@
-import fitz  # PyMuPDF
-import re
 import json
-import google.generativeai as genai
+import os
+from llm_runtime import (
+    Document,
+    LLMRuntime,
+    LRUCache,
+    PARSE_SECTIONS,
+    ValidationError,
+    extract_contacts,
+    focus,
+    json_object,
+    shared_docstore,
+    shared_scorer,
+    with_contacts,
+)
 
-resume_cache = {}
-jd_cache = {}
+# Parsed documents by PDF digest (bounded, expire after a day)
+resume_cache = LRUCache(max_bytes=16 * 1024 * 1024, ttl=86400)
+jd_cache = LRUCache(max_bytes=16 * 1024 * 1024, ttl=86400)
+
+_llm = None
+
+def get_llm() -> LLMRuntime:
+    global _llm
+    if _llm is None:
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not configured")
+        _llm = LLMRuntime("unified-service", [api_key])
+    return _llm
 
 def extract_text_from_pdf(file_bytes: bytes) -> str:
-    doc = fitz.open(stream=file_bytes, filetype="pdf")
-    return "".join(page.get_text() for page in doc)
+    return load_document(file_bytes).text
+
+def load_document(file_bytes: bytes) -> Document:
+    # Extracted once per file (shared document store), in the PDF process pool
+    return shared_docstore().load_bytes(file_bytes)
 
 
 def extract_resume_json(text: str) -> dict:
-    prompt = """
+    # Email, phone, GitHub and LinkedIn (and the name, when a line near the top looks like one)
+    # are read from the text itself; the model only extracts the rest
+    contacts = extract_contacts(text)
+    fields = ["Employment Details", "Technical Skills", "Soft Skills", "Education (Degree, Institution, Year, CGPA)"]
+    if contacts.name is None:
+        fields.insert(0, "Full Name")
+    listing = "\n".join(f"      {i}. {field}" for i, field in enumerate(fields, 1))
+    prompt = f"""
     You are an AI specialised in parsing resumes. Extract:
-      1. Full Name
-      2. Email
-      3. GitHub
-      4. LinkedIn
-      5. Employment Details
-      6. Technical Skills
-      7. Soft Skills
-      8. Education (Degree, Institution, Year, CGPA)
+{listing}
     Return STRICT JSON.
     """
-    resp = genai.GenerativeModel("gemini-1.5-pro").generate_content(prompt + "\nResume:\n" + text)
-    obj = re.search(r"\{.*\}", resp.text, re.S)
-    return json.loads(obj.group(0)) if obj else {}
+    inputs, _ = get_llm().budget.fit("unified/parse-resume", resume=focus(text, PARSE_SECTIONS))
+    parsed = get_llm().cascade("unified/parse-resume", prompt + "\nResume:\n" + inputs["resume"], validate_resume)
+    return with_contacts(parsed, contacts)
 
 def extract_jd_json(text: str) -> dict:
     prompt = """
@@ -36,9 +62,8 @@ def extract_jd_json(text: str) -> dict:
       3. Required Education
     Return STRICT JSON.
     """
-    resp = genai.GenerativeModel("gemini-1.5-pro").generate_content(prompt + "\nJob Description:\n" + text)
-    obj = re.search(r"\{.*\}", resp.text, re.S)
-    return json.loads(obj.group(0)) if obj else {}
+    inputs, _ = get_llm().budget.fit("unified/parse-jd", jd=text)
+    return get_llm().cascade("unified/parse-jd", prompt + "\nJob Description:\n" + inputs["jd"], validate_jd)
 
 def compare(resume_json: dict, jd_json: dict) -> dict:
     prompt = f"""
@@ -53,6 +78,40 @@ def compare(resume_json: dict, jd_json: dict) -> dict:
     Job:
     {json.dumps(jd_json, indent=2)}
     """
-    resp = genai.GenerativeModel("gemini-1.5-pro").generate_content(prompt)
-    obj = re.search(r"\{.*\}", resp.text, re.S)
-    return json.loads(obj.group(0)) if obj else {}
+    return get_llm().cascade("unified/compare", prompt, validate_comparison)
+
+def score_match(resume_json: dict, jd_json: dict, explain: bool = False) -> dict:
+    """Local match score; with explain, strengths and gaps come from compare()"""
+    result = shared_scorer().score(resume_json, jd_json).to_dict()
+    if explain:
+        comparison = compare(resume_json, jd_json)
+        result["strengths"] = comparison.get("strengths", [])
+        result["gaps"] = comparison.get("gaps", [])
+    return result
+
+def _require_lists(data: dict, *keys: str) -> dict:
+    """Escalate unless every key holds a list (an empty one is a valid answer: a resume may have no education)"""
+    wrong = [key for key in keys if not isinstance(data.get(key), list)]
+    if wrong:
+        raise ValidationError(f"Expected lists for: {', '.join(wrong)}")
+    return data
+
+def validate_resume(text: str) -> dict:
+    """Escalate unless the parse has skills and education lists"""
+    data = _require_lists(json_object(text), "Technical Skills")
+    # The prompt asks for "Education (Degree, Institution, Year, CGPA)"; models key it either way
+    if not any(key.startswith("Education") and isinstance(value, list) for key, value in data.items()):
+        raise ValidationError("Expected a list for: Education")
+    return data
+
+def validate_jd(text: str) -> dict:
+    """Escalate unless the parse has a required-skills list"""
+    return _require_lists(json_object(text), "Required Skills")
+
+def validate_comparison(text: str) -> dict:
+    """Escalate unless the comparison has a 0-100 score"""
+    result = json_object(text)
+    score = result.get("score")
+    if not isinstance(score, (int, float)) or not 0 <= score <= 100:
+        raise ValidationError(f"Invalid match score: {score!r}")
+    return result
@@ -1,10 +1,8 @@
 import os
 import json
 import re
-import google.generativeai as genai
 from typing import Dict, List, Optional
-import random
-import time
+from llm_runtime import LLMRuntime
 
 # Multi-key rotation for rate limiting
 API_KEYS = [
@@ -19,37 +17,9 @@ API_KEYS = [key for key in API_KEYS if key is not None]
 if not API_KEYS:
     raise ValueError("No Gemini API keys found! Set GEMINI_API_KEY_1 through GEMINI_API_KEY_5")
 
-# Rate limiting tracking
-key_usage = {i: {"requests": 0, "last_reset": time.time()} for i in range(len(API_KEYS))}
-RATE_LIMIT = 15  
-RESET_INTERVAL = 60  
-
-def get_available_key():
-    """Get an available API key with rate limiting"""
-    current_time = time.time()
-    
-    # Reset counters if needed
-    for i, usage in key_usage.items():
-        if current_time - usage["last_reset"] >= RESET_INTERVAL:
-            usage["requests"] = 0
-            usage["last_reset"] = current_time
-    
-    # Find available key
-    for i, usage in key_usage.items():
-        if usage["requests"] < RATE_LIMIT:
-            usage["requests"] += 1
-            return API_KEYS[i]
-    
-    # If all keys are rate limited, wait and retry
-    print("All API keys rate limited, waiting...")
-    time.sleep(5)
-    return get_available_key()
-
-def configure_gemini():
-    """Configure Gemini with current available key"""
-    key = get_available_key()
-    genai.configure(api_key=key)
-    return genai.GenerativeModel('gemini-1.5-flash')
+# Token-bucket key scheduling (15 requests/minute per key)
+RATE_LIMIT = 15
+llm = LLMRuntime("user-test-service", API_KEYS, rate_per_minute=RATE_LIMIT)
 
 # Keywords from your deployed app
 TECH_KEYWORDS = {
@@ -107,6 +77,7 @@ class FreeTierAgent:
         """Generate basic questions (similar to your deployed app logic)"""
         highlights = extract_technical_highlights(resume_text)
         highlights_str = "\n".join(f"- {h}" for h in highlights[:3])  # Limit to 3 for free tier
+        inputs, _ = llm.budget.fit("user-test/free", resume=resume_text)
         
         prompt = f"""
 You are an expert technical interview coach. Generate 5 basic technical questions for this candidate:
@@ -142,11 +113,10 @@ Only return this JSON. No extra text.
 {highlights_str}
 
 Resume Context:
-{resume_text[:1000]}...  
+{inputs['resume']}
 """
         
-        model = configure_gemini()
-        response = model.generate_content(prompt)
+        response = llm.generate('gemini-1.5-flash', prompt)
         return parse_json_response(response.text)
 
 class FreemiumTierAgent:
@@ -159,6 +129,7 @@ class FreemiumTierAgent:
         """Generate questions using stock industry JD"""
         highlights = extract_technical_highlights(resume_text)
         highlights_str = "\n".join(f"- {h}" for h in highlights)
+        inputs, _ = llm.budget.fit("user-test/freemium", resume=resume_text, jd=jd_text)
         
         prompt = f"""
 You are an expert technical interview coach. Generate 10 questions for this candidate using the provided job description:
@@ -206,10 +177,10 @@ Only return this JSON. No extra text.
 {highlights_str}
 
 — Job Description:
-{jd_text}
+{inputs['jd']}
 
 — Resume Context:
-{resume_text[:1500]}...
+{inputs['resume']}
 
 Requirements:
 1. Reference specific requirements from the job description
@@ -218,8 +189,7 @@ Requirements:
 4. Focus on practical application of skills
 """
         
-        model = configure_gemini()
-        response = model.generate_content(prompt)
+        response = llm.generate('gemini-1.5-flash', prompt)
         return parse_json_response(response.text)
 
 class PremiumTierAgent:
@@ -232,6 +202,7 @@ class PremiumTierAgent:
         """Generate comprehensive questions using actual JD (same style as your deployed app)"""
         highlights = extract_technical_highlights(resume_text)
         highlights_str = "\n".join(f"- {h}" for h in highlights)
+        inputs, _ = llm.budget.fit("user-test/premium", resume=resume_text, jd=jd_text)
         
         prompt = f"""
 You are an expert technical interview coach. Given this resume and job description, generate 20 comprehensive questions:
@@ -281,10 +252,10 @@ Only return this JSON. No extra text.
 {highlights_str}
 
 Full Resume:
-{resume_text}
+{inputs['resume']}
 
 Job Description:
-{jd_text}
+{inputs['jd']}
 
 Company Context:
 {company_context or "Technology company"}
@@ -296,8 +267,7 @@ Requirements:
 4. Mix theoretical and practical questions
 """
         
-        model = configure_gemini()
-        response = model.generate_content(prompt)
+        response = llm.generate('gemini-1.5-flash', prompt)
         return parse_json_response(response.text)
 
 # Simple tier selection function
@@ -3,7 +3,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional
 import os
-from agents.agents import get_agent
+import sys
+
+# Shared LLM runtime lives in services/llm_runtime (copied next to app.py in the Docker image)
+_SERVICES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services")
+if os.path.isdir(_SERVICES_DIR) and _SERVICES_DIR not in sys.path:
+    sys.path.append(_SERVICES_DIR)
+
+from agents.agents import get_agent, llm
 
 app = FastAPI(title="Mock Test Service", version="1.0.0")
 
@@ -27,6 +34,11 @@ def health_check():
     """Health check endpoint"""
     return {"status": "service running", "tiers": ["free", "freemium", "premium"]}
 
+@app.get("/llm-stats")
+def llm_stats():
+    """Key scheduler state: queue depth, queue wait percentiles, per-key budget"""
+    return llm.stats()
+
 @app.post("/generate-test")
 def generate_mock_test(request: MockTestRequest):
     """Generate mock test questions based on tier"""